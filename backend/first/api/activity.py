@@ -0,0 +1,240 @@
+import atexit
+import ipaddress
+import logging
+import threading
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ActivityLog
+from . import signals
+
+logger = logging.getLogger(__name__)
+
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+
+class ActivityLogWriter:
+    """Bounded in-process buffer of ActivityLog rows, bulk-inserted in the background
+
+    ``record`` only appends to the buffer; a daemon thread inserts pending
+    entries once ``flush_size`` are waiting or every ``flush_interval``
+    seconds, so a request never waits on the log insert. ``stop`` (also run
+    at interpreter exit) writes whatever is still pending.
+    """
+
+    def __init__(self, capacity=10000, flush_size=500, flush_interval=2.0,
+                 overflow='drop_oldest', block_seconds=0.05):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'overflow must be one of {", ".join(OVERFLOW_POLICIES)}')
+        self.capacity = capacity
+        # A full buffer always triggers a flush
+        self.flush_size = min(flush_size, capacity)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self.buffer = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record(self, entry):
+        """Queue one entry (ActivityLog field values); False if it was dropped"""
+        with self.condition:
+            if len(self.buffer) >= self.capacity and self.overflow == 'block':
+                # Backpressure: hold the caller briefly while the writer drains
+                self.condition.notify_all()
+                self.condition.wait_for(lambda: len(self.buffer) < self.capacity, timeout=self.block_seconds)
+            if len(self.buffer) >= self.capacity:
+                self.dropped += 1
+                if self.overflow != 'drop_oldest':
+                    return False
+                self.buffer.popleft()
+            self.buffer.append(entry)
+            if len(self.buffer) >= self.flush_size:
+                self.condition.notify_all()
+            if self.thread is None and not self.stopping:
+                self._start()
+        return True
+
+    def _start(self):
+        self.thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def _drain(self):
+        batch = list(self.buffer)
+        self.buffer.clear()
+        # Wake callers blocked on a full buffer
+        self.condition.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self.stopping or len(self.buffer) >= self.flush_size, timeout=self.flush_interval,
+                )
+                if self.stopping:
+                    return
+                batch = self._drain()
+            self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                entries = ActivityLog.objects.bulk_create(
+                    [ActivityLog(**entry) for entry in batch], batch_size=self.flush_size,
+                )
+                signals.activity_logged.send(sender=ActivityLog, entries=entries)
+        except Exception:
+            logger.exception('Could not write %d activity log entries', len(batch))
+            with self.condition:
+                self.failed += len(batch)
+        else:
+            with self.condition:
+                self.written += len(batch)
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Write all pending entries from the calling thread"""
+        with self.condition:
+            batch = self._drain()
+        self._write(batch)
+
+    def stop(self):
+        """Stop the background thread and write what is still pending"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+            thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=max(self.flush_interval, 1) * 5)
+        self.flush()
+        atexit.unregister(self.stop)
+
+    def stats(self):
+        with self.condition:
+            return {'pending': len(self.buffer), 'written': self.written,
+                    'dropped': self.dropped, 'failed': self.failed}
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ActivityLogWriter(
+                    capacity=getattr(settings, 'ACTIVITY_LOG_BUFFER_SIZE', 10000),
+                    flush_size=getattr(settings, 'ACTIVITY_LOG_FLUSH_SIZE', 500),
+                    flush_interval=getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 2.0),
+                    overflow=getattr(settings, 'ACTIVITY_LOG_OVERFLOW', 'drop_oldest'),
+                    block_seconds=getattr(settings, 'ACTIVITY_LOG_BLOCK_SECONDS', 0.05),
+                )
+    return _writer
+
+
+@receiver(setting_changed)
+def reset_writer(setting, **kwargs):
+    global _writer
+    if setting.startswith('ACTIVITY_LOG_'):
+        with _writer_lock:
+            writer, _writer = _writer, None
+        if writer is not None:
+            writer.stop()
+
+
+def render_metrics():
+    """Writer counters in the Prometheus text format (appended to /api/metrics/)"""
+    if _writer is None:
+        return ''
+    stats = _writer.stats()
+    return (
+        '# HELP activity_log_pending Activity log entries waiting to be written\n'
+        '# TYPE activity_log_pending gauge\n'
+        f"activity_log_pending {stats['pending']}\n"
+        '# HELP activity_log_entries_total Activity log entries by outcome\n'
+        '# TYPE activity_log_entries_total counter\n'
+        + ''.join(f'activity_log_entries_total{{outcome="{outcome}"}} {stats[outcome]}\n'
+                  for outcome in ('written', 'dropped', 'failed'))
+    )
+
+
+def client_ip(request):
+    """Client address from REMOTE_ADDR, or the first hop of ACTIVITY_LOG_IP_HEADER"""
+    header = getattr(settings, 'ACTIVITY_LOG_IP_HEADER', None)
+    value = request.META.get(header, '') if header else ''
+    value = value.split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+
+def action_name(request):
+    """'<basename>.<action>' for DRF views (e.g. 'alert.bulk_resolve'), else None"""
+    match = getattr(request, 'resolver_match', None)
+    view = match.func if match is not None else None
+    if getattr(view, 'cls', None) is None:
+        return None
+    actions = getattr(view, 'actions', None)
+    action = actions.get(request.method.lower()) if actions else request.method.lower()
+    basename = view.initkwargs.get('basename')
+    return f'{basename}.{action}' if basename else action
+
+
+class ActivityLogMiddleware:
+    """Log mutating API requests to ActivityLog via the buffered writer"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method in MUTATING_METHODS:
+            self.record(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method in MUTATING_METHODS:
+            # request.user may still need a query, and the 'block' policy waits
+            await sync_to_async(self.record)(request, response)
+        return response
+
+    def record(self, request, response):
+        if not getattr(settings, 'ACTIVITY_LOG_ENABLED', True):
+            return
+        action = action_name(request)
+        if action is None:
+            return
+        user = getattr(request, 'user', None)
+        get_writer().record({
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'action': action[:255],
+            'description': f'{request.method} {request.path} -> {response.status_code}',
+            'ip_address': client_ip(request),
+            'timestamp': timezone.now(),
+        })
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     UserProfile, WaterZone, WaterUsage, Alert, Report,
-    SystemSettings, ActivityLog, Compliance
+    SystemSettings, ActivityLog, Compliance, HourlyUsageRollup, DailyUsageRollup,
+    ZoneAnomalyState
 )
 
 
@@ -18,9 +19,11 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 @admin.register(WaterZone)
 class WaterZoneAdmin(admin.ModelAdmin):
-    list_display = ['name', 'zone_type', 'is_active', 'created_at']
+    list_display = ['name', 'zone_type', 'parent', 'is_active', 'created_at']
     list_filter = ['zone_type', 'is_active', 'created_at']
+    list_select_related = ['parent']
     search_fields = ['name', 'description']
+    raw_id_fields = ['parent']
 
 
 @admin.register(WaterUsage)
@@ -31,6 +34,21 @@ class WaterUsageAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at']
 
 
+@admin.register(HourlyUsageRollup, DailyUsageRollup)
+class UsageRollupAdmin(admin.ModelAdmin):
+    list_display = ['zone', 'bucket', 'total_liters', 'min_liters', 'max_liters', 'reading_count']
+    list_filter = ['zone']
+    date_hierarchy = 'bucket'
+    readonly_fields = ['zone', 'bucket', 'total_liters', 'min_liters', 'max_liters', 'reading_count', 'quality_sum']
+
+
+@admin.register(ZoneAnomalyState)
+class ZoneAnomalyStateAdmin(admin.ModelAdmin):
+    list_display = ['zone', 'reading_count', 'ewma_mean', 'ewma_variance', 'last_reading_at', 'last_alert_at']
+    readonly_fields = ['zone', 'reading_count', 'ewma_mean', 'ewma_variance', 'quantile_sketch',
+                       'last_reading_at', 'last_alert_at']
+
+
 @admin.register(Alert)
 class AlertAdmin(admin.ModelAdmin):
     list_display = ['title', 'alert_type', 'status', 'severity', 'created_at']
@@ -0,0 +1,70 @@
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Alert, ALERT_STATUS_CHOICES, ALERT_TYPE_CHOICES
+from . import cache, live
+
+SEVERITIES = range(1, 6)
+OPEN_STATUSES = ('active', 'acknowledged')
+
+
+def alert_counts():
+    """Alert counts by status, type and severity in one conditional aggregation"""
+    aggregates = {'total': Count('id')}
+    for value, _ in ALERT_STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+    for value, _ in ALERT_TYPE_CHOICES:
+        aggregates[f'type_{value}'] = Count('id', filter=Q(alert_type=value))
+    for severity in SEVERITIES:
+        aggregates[f'severity_{severity}'] = Count('id', filter=Q(severity=severity))
+    row = Alert.objects.order_by().aggregate(**aggregates)
+
+    by_status = {value: row[f'status_{value}'] for value, _ in ALERT_STATUS_CHOICES}
+    return {
+        **by_status,
+        'total': row['total'],
+        'by_status': by_status,
+        'by_type': {value: row[f'type_{value}'] for value, _ in ALERT_TYPE_CHOICES},
+        'by_severity': {str(severity): row[f'severity_{severity}'] for severity in SEVERITIES},
+    }
+
+
+def cached_alert_counts():
+    return cache.cached('alert_counts', [cache.ALERTS], alert_counts)
+
+
+def _publish_bulk(updated, event):
+    """Publish one live event per zone of the ``updated`` alerts, with its count
+
+    Alerts without a zone share one event, which reaches every subscriber.
+    """
+    counts = updated.order_by().values_list('zone_id').annotate(count=Count('id'))
+    live.publish(*[
+        {'type': 'alert', 'event': event, 'zone': zone_id, 'count': count}
+        for zone_id, count in counts
+    ])
+
+
+def resolve(queryset, user):
+    """Resolve every open alert in ``queryset`` with a single UPDATE"""
+    now = timezone.now()
+    updated = queryset.filter(status__in=OPEN_STATUSES).update(
+        status='resolved', resolved_at=now, resolved_by=user, updated_at=now,
+    )
+    if updated:
+        # QuerySet.update() sends no post_save
+        cache.invalidate(cache.ALERTS)
+        _publish_bulk(queryset.filter(status='resolved', resolved_at=now), 'bulk_resolved')
+    return updated
+
+
+def acknowledge(queryset, user):
+    """Acknowledge every active alert in ``queryset`` with a single UPDATE"""
+    now = timezone.now()
+    updated = queryset.filter(status='active').update(
+        status='acknowledged', acknowledged_at=now, acknowledged_by=user, updated_at=now,
+    )
+    if updated:
+        cache.invalidate(cache.ALERTS)
+        _publish_bulk(queryset.filter(status='acknowledged', acknowledged_at=now), 'bulk_acknowledged')
+    return updated
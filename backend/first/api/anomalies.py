@@ -0,0 +1,222 @@
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import WaterZone, Alert, ZoneAnomalyState
+from . import signals
+
+ANOMALY_ALERT_TITLE = 'Unusual water usage'
+MERGE_RETRIES = 3
+STATE_FIELDS = [
+    'reading_count', 'ewma_mean', 'ewma_variance', 'quantile_sketch', 'last_reading_at', 'last_alert_at',
+]
+
+
+def get_options():
+    return {
+        'alpha': getattr(settings, 'WATER_ANOMALY_EWMA_ALPHA', 0.05),
+        'threshold': getattr(settings, 'WATER_ANOMALY_Z_THRESHOLD', 4.0),
+        'min_readings': getattr(settings, 'WATER_ANOMALY_MIN_READINGS', 30),
+        'quantile': getattr(settings, 'WATER_ANOMALY_QUANTILE', 0.99),
+        'cooldown': timedelta(minutes=getattr(settings, 'WATER_ANOMALY_ALERT_COOLDOWN_MINUTES', 60)),
+    }
+
+
+# P-square quantile estimator (Jain & Chlamtac, 1985): five markers track the
+# minimum, p/2, p, (1+p)/2 quantiles and the maximum in constant space.
+
+def sketch_update(sketch, value, p):
+    """Add one observation to a P-square sketch (a JSON-serialisable dict)"""
+    if sketch.get('p') != p:
+        sketch.clear()
+        sketch.update({'p': p, 'q': [], 'n': [], 'desired': []})
+    q, n = sketch['q'], sketch['n']
+    if len(n) < 5:
+        q.append(value)
+        q.sort()
+        if len(q) == 5:
+            sketch['n'] = [0, 1, 2, 3, 4]
+            sketch['desired'] = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        return sketch
+
+    if value < q[0]:
+        q[0] = value
+        k = 0
+    elif value >= q[4]:
+        q[4] = value
+        k = 3
+    else:
+        k = next(i for i in range(4) if value < q[i + 1])
+    for i in range(k + 1, 5):
+        n[i] += 1
+    increments = (0, p / 2, p, (1 + p) / 2, 1)
+    desired = sketch['desired']
+    for i in range(5):
+        desired[i] += increments[i]
+
+    for i in (1, 2, 3):
+        d = desired[i] - n[i]
+        if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+            step = 1 if d > 0 else -1
+            parabolic = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+            )
+            if q[i - 1] < parabolic < q[i + 1]:
+                q[i] = parabolic
+            else:
+                q[i] += step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+            n[i] += step
+    return sketch
+
+
+def sketch_quantile(sketch):
+    """Current quantile estimate, or None before any observation"""
+    q = sketch.get('q') or []
+    if not q:
+        return None
+    if len(sketch.get('n') or []) < 5:
+        # Fewer than five readings: nearest rank on the sorted buffer
+        return q[min(len(q) - 1, int(sketch['p'] * len(q)))]
+    return q[2]
+
+
+def _severity(z, threshold):
+    """Map a z-score past the threshold to alert severity 2-5"""
+    ratio = abs(z) / threshold
+    if ratio >= 3:
+        return 5
+    if ratio >= 2:
+        return 4
+    if ratio >= 1.5:
+        return 3
+    return 2
+
+
+def observe(state, value, measured, options):
+    """Score one reading against the zone's state, then fold it in
+
+    Returns an anomaly dict when the reading deviates more than the
+    threshold from the EWMA baseline, otherwise None.
+    """
+    anomaly = None
+    update = value
+    std = math.sqrt(state.ewma_variance)
+    if state.reading_count >= options['min_readings'] and std > 0:
+        z = (value - state.ewma_mean) / std
+        if abs(z) >= options['threshold']:
+            severity = _severity(z, options['threshold'])
+            high_quantile = sketch_quantile(state.quantile_sketch)
+            if z > 0 and high_quantile is not None and value <= high_quantile:
+                # Spikes this large are routine for this zone; keep the alert low-key
+                severity -= 1
+            anomaly = {
+                'value': value, 'z': z, 'mean': state.ewma_mean, 'std': std,
+                'quantile': high_quantile, 'severity': severity, 'measured': measured,
+            }
+            # Clip outliers to the threshold band so one spike does not inflate
+            # the variance and mask the next anomaly
+            update = state.ewma_mean + math.copysign(options['threshold'] * std, z)
+
+    # Incremental EWMA mean and variance (Finch, 2009)
+    if state.reading_count == 0:
+        state.ewma_mean = value
+        state.ewma_variance = 0.0
+    else:
+        diff = update - state.ewma_mean
+        increment = options['alpha'] * diff
+        state.ewma_mean += increment
+        state.ewma_variance = (1 - options['alpha']) * (state.ewma_variance + diff * increment)
+    sketch_update(state.quantile_sketch, value, options['quantile'])
+    state.reading_count += 1
+    if state.last_reading_at is None or measured > state.last_reading_at:
+        state.last_reading_at = measured
+    return anomaly
+
+
+def _alert(zone_name, state, anomaly, options):
+    direction = 'above' if anomaly['z'] > 0 else 'below'
+    message = (
+        f"{zone_name}: {anomaly['value']:.1f} L at {timezone.localtime(anomaly['measured']):%Y-%m-%d %H:%M} "
+        f"is {abs(anomaly['z']):.1f} standard deviations {direction} the recent average "
+        f"of {anomaly['mean']:.1f} L"
+    )
+    if anomaly['quantile'] is not None:
+        message += f" (p{options['quantile'] * 100:g} {anomaly['quantile']:.1f} L)"
+    return Alert(
+        zone_id=state.zone_id,
+        title=ANOMALY_ALERT_TITLE,
+        message=message,
+        alert_type='error' if anomaly['severity'] >= 4 else 'warning',
+        severity=anomaly['severity'],
+    )
+
+
+def _process(by_zone, options):
+    states = {
+        state.zone_id: state
+        for state in ZoneAnomalyState.objects.select_for_update().filter(zone_id__in=list(by_zone))
+    }
+    to_create = []
+    alerted = []
+    for zone_id, readings in by_zone.items():
+        state = states.get(zone_id)
+        if state is None:
+            state = ZoneAnomalyState(zone_id=zone_id, quantile_sketch={})
+            to_create.append(state)
+        for value, measured in readings:
+            anomaly = observe(state, value, measured, options)
+            if anomaly is None:
+                continue
+            if state.last_alert_at is not None and abs(measured - state.last_alert_at) < options['cooldown']:
+                continue
+            state.last_alert_at = measured
+            alerted.append((state, anomaly))
+
+    if states:
+        ZoneAnomalyState.objects.bulk_update(states.values(), STATE_FIELDS)
+    if to_create:
+        ZoneAnomalyState.objects.bulk_create(to_create)
+    return alerted
+
+
+def process_readings(readings):
+    """Update per-zone statistics with new readings and raise alerts for outliers
+
+    Each reading costs O(1) work against its zone's persisted state; the
+    batch needs one locking read of the states and one bulk write.
+    """
+    by_zone = {}
+    for reading in sorted(readings, key=lambda reading: reading.measurement_time):
+        measured = reading.measurement_time
+        if timezone.is_naive(measured):
+            measured = timezone.make_aware(measured)
+        by_zone.setdefault(reading.zone_id, []).append((reading.usage_liters, measured))
+    if not by_zone:
+        return []
+
+    options = get_options()
+    for attempt in range(MERGE_RETRIES):
+        try:
+            with transaction.atomic():
+                alerted = _process(by_zone, options)
+                if not alerted:
+                    return []
+                names = dict(
+                    WaterZone.objects.filter(id__in={state.zone_id for state, _ in alerted})
+                    .values_list('id', 'name')
+                )
+                alerts = Alert.objects.bulk_create([
+                    _alert(names.get(state.zone_id, ''), state, anomaly, options)
+                    for state, anomaly in alerted
+                ])
+            break
+        except IntegrityError:
+            # Another writer created a zone's state first; re-read and retry
+            if attempt == MERGE_RETRIES - 1:
+                raise
+    signals.alerts_created.send(sender=Alert, alerts=alerts)
+    return alerts
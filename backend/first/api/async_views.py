@@ -0,0 +1,104 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .conditional import arespond
+from .db_router import replica_reads
+from .serializers import DashboardStatsSerializer
+from . import cache, dashboard
+
+# Async counterparts of the dashboard and zone statistics endpoints. Under
+# ASGI the request waits on the event loop rather than a worker thread, and
+# independent aggregates run concurrently (see dashboard.arun_all), so the
+# latency is that of the slowest query instead of their sum.
+
+
+def _authenticate(request):
+    """Run DRF's DEFAULT_AUTHENTICATION_CLASSES; ``(user, None)`` or ``(None, exception)``"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException as exc:
+        return None, _with_auth_header(drf_request, exc)
+    if not user.is_authenticated:
+        return None, _with_auth_header(drf_request, NotAuthenticated())
+    return user, None
+
+
+def _with_auth_header(drf_request, exc):
+    """401 with WWW-Authenticate when the first authenticator has one, else 403, as APIView does"""
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        authenticators = drf_request.authenticators
+        header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+        if header:
+            exc.auth_header = header
+        else:
+            exc.status_code = 403
+    return exc
+
+
+async def authenticate(request):
+    """Authenticate like the DRF views; an error response, or None with ``request.user`` set
+
+    Session, basic and any other configured authentication work as on the
+    sync endpoints.
+    """
+    user, exc = await sync_to_async(_authenticate)(request)
+    if exc is None:
+        request.user = user
+        return None
+    response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+    if getattr(exc, 'auth_header', None):
+        response['WWW-Authenticate'] = exc.auth_header
+    return response
+
+
+def api_view(*groups, windowed=False):
+    """Accept GET/HEAD only, authenticate, then answer from the replica with conditional GET like the sync views"""
+    def decorator(view):
+        @require_safe
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            denied = await authenticate(request)
+            if denied is not None:
+                return denied
+            with replica_reads():
+                return await arespond(request, groups, lambda: view(request, *args, **kwargs), windowed)
+        return inner
+    return decorator
+
+
+@api_view(cache.USAGE, cache.ALERTS, cache.ZONES, windowed=True)
+async def dashboard_stats(request):
+    """Get dashboard statistics"""
+    stats = await cache.acached('stats', [cache.USAGE, cache.ALERTS, cache.ZONES], dashboard.astats)
+    return JsonResponse(DashboardStatsSerializer(stats).data)
+
+
+@api_view(cache.USAGE, cache.ZONES, windowed=True)
+async def top_zones(request):
+    """Get top consuming zones (?limit=4&days=7&zone_type=building)"""
+    try:
+        limit, days, zone_type = dashboard.parse_top_zones_params(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    zones = await cache.acached(
+        'top_zones', [cache.USAGE, cache.ZONES],
+        lambda: dashboard.in_thread(dashboard.top_zones, limit, days, zone_type),
+        params=(limit, days, zone_type)
+    )
+    return JsonResponse(zones, safe=False)
+
+
+@api_view(cache.USAGE, cache.ZONES, windowed=True)
+async def zone_usage_stats(request, pk):
+    """Get usage statistics for a specific zone"""
+    results = await dashboard.arun_all(dashboard.zone_usage_queries(pk))
+    if results['zone'] is None:
+        return JsonResponse({'detail': 'No WaterZone matches the given query.'}, status=404)
+    return JsonResponse(dashboard.build_zone_usage(results['zone'], results['usage']))
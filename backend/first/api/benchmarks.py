@@ -0,0 +1,202 @@
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import leaks
+from .models import WaterZone, Alert, Report, ActivityLog, Compliance, SystemSettings
+
+# Most queries each GET endpoint on the router may run against the benchmark
+# fixture, keyed by URL name. Every GET route must be listed here, so a new
+# endpoint cannot skip the budget check. Conditional GET endpoints include
+# their one watermark query (api.conditional).
+QUERY_BUDGETS = {
+    'user-list': 2,
+    'user-detail': 1,
+    'userprofile-list': 2,
+    'userprofile-detail': 1,
+    'userprofile-my-profile': 1,
+    'waterzone-list': 3,
+    'waterzone-detail': 2,
+    'waterzone-usage-stats': 4,
+    'waterzone-subtree-stats': 5,
+    'waterzone-top-children': 4,
+    'waterzone-subtree-trend': 3,
+    'waterusage-list': 2,
+    'waterusage-detail': 1,
+    'waterusage-export': 1,
+    'waterusage-trend': 2,
+    'waterusage-series': 3,
+    'waterusage-distribution': 4,
+    'alert-list': 2,
+    'alert-detail': 2,
+    'alert-active': 2,
+    'alert-count': 2,
+    'report-list': 2,
+    'report-detail': 1,
+    'report-by-type': 2,
+    'report-monthly': 1,
+    'systemsettings-list': 3,
+    'systemsettings-detail': 2,
+    'systemsettings-current': 2,
+    'activitylog-list': 1,
+    'activitylog-detail': 1,
+    'compliance-list': 2,
+    'compliance-detail': 1,
+    'dashboard-stats': 6,
+    'dashboard-top-zones': 2,
+    'dashboard-cache-stats': 0,
+    'dashboard-activity-log': 1,
+}
+
+# Query parameters for endpoints that need them; values are formatted with
+# the fixture context (zone, month, day)
+PARAMS = {
+    'waterzone-subtree-stats': {'days': '7'},
+    'waterzone-subtree-trend': {'days': '30'},
+    'waterusage-export': {'zone': '{zone}', 'start': '{day}'},
+    'waterusage-trend': {'zones': '{zone}', 'days': '30'},
+    'waterusage-series': {'zones': '{zone}', 'days': '7', 'points': '100'},
+    'waterusage-distribution': {'days': '7'},
+    'report-by-type': {'type': 'leak_detection'},
+    'report-monthly': {'month': '{month}'},
+    'dashboard-top-zones': {'days': '30'},
+}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def discover_endpoints(router):
+    """``(url name, viewset, detail)`` for every GET route registered on ``router``"""
+    endpoints = []
+    for _, viewset, basename in router.registry:
+        if hasattr(viewset, 'list'):
+            endpoints.append((f'{basename}-list', viewset, False))
+        if hasattr(viewset, 'retrieve'):
+            endpoints.append((f'{basename}-detail', viewset, True))
+        for extra in viewset.get_extra_actions():
+            if 'get' in extra.mapping:
+                endpoints.append((f'{basename}-{extra.url_name}', viewset, extra.detail))
+    return endpoints
+
+
+def seed(zones=20, days=30, interval=15, random_seed=1):
+    """Load the benchmark fixture: synthetic readings plus the other tables
+
+    Returns the context used to fill in PARAMS.
+    """
+    end = timezone.localdate()
+    call_command(
+        'generate_usage_data', zones=zones, days=days, interval=interval, seed=random_seed,
+        end=end.isoformat(), prefix='Benchmark zone', raw=True, stdout=StringIO(),
+    )
+    user = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+    for index in range(200):
+        User.objects.create_user(f'user{index}')
+    leaks.detect_leaks(days=days, recent_days=max(1, min(7, days - 1)), user=user)
+    zone_ids = list(WaterZone.objects.order_by('id').values_list('id', flat=True))
+    Alert.objects.bulk_create([
+        Alert(zone_id=zone_ids[index % len(zone_ids)], title=f'Pressure drop {index}', message='Benchmark alert',
+              alert_type=('info', 'warning', 'error')[index % 3], severity=index % 5 + 1)
+        for index in range(2000)
+    ])
+    Report.objects.bulk_create([
+        Report(title=f'Monthly report {index}', report_type='monthly', generated_by=user,
+               start_date=end - timedelta(days=30), end_date=end)
+        for index in range(100)
+    ])
+    ActivityLog.objects.bulk_create([
+        ActivityLog(user=user, action='alert.resolve', description=f'POST /api/alerts/{index}/resolve/ -> 200')
+        for index in range(5000)
+    ])
+    Compliance.objects.bulk_create([
+        Compliance(category=f'Category {index}', description='Benchmark', status='pass') for index in range(50)
+    ])
+    SystemSettings.objects.create(organization_email='benchmark@example.com', api_endpoint='http://testserver/api/')
+    call_command('rebuild_search_index', stdout=StringIO())
+    return {
+        'user': user,
+        'zone': zone_ids[0],
+        'month': end.strftime('%Y-%m'),
+        'day': (end - timedelta(days=1)).isoformat(),
+    }
+
+
+def _url(name, viewset, detail):
+    if not detail:
+        return reverse(name)
+    pk = viewset.queryset.model.objects.order_by('pk').values_list('pk', flat=True).first()
+    return reverse(name, kwargs={'pk': pk})
+
+
+def _get(client, url, params):
+    response = client.get(url, params)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run(router, context, repeat=20):
+    """Time every router GET endpoint; returns ``{name: result}``
+
+    The first request of each endpoint is not timed; it counts queries.
+    """
+    client = APIClient()
+    client.force_authenticate(context['user'])
+    results = {}
+    for name, viewset, detail in discover_endpoints(router):
+        url = _url(name, viewset, detail)
+        params = {key: value.format(**context) for key, value in PARAMS.get(name, {}).items()}
+        # The log is a bounded deque; once full its length stops growing
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = _get(client, url, params)
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _get(client, url, params)
+            latencies.append(time.perf_counter() - start)
+        results[name] = {
+            'url': url,
+            'params': params,
+            'status': response.status_code,
+            'queries': len(queries),
+            'budget': QUERY_BUDGETS.get(name),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 3) if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        }
+    return results
+
+
+def check(results, baseline=None, threshold=1.5, min_delta_ms=5.0):
+    """Failure messages for errors, blown query budgets and p95 regressions
+
+    A regression needs both the ratio to the baseline and an absolute slowdown
+    of ``min_delta_ms``, so sub-millisecond noise does not fail the run.
+    """
+    failures = []
+    previous = (baseline or {}).get('endpoints', {})
+    for name, result in results.items():
+        if result['status'] >= 400:
+            failures.append(f"{name}: HTTP {result['status']}")
+        if result['budget'] is None:
+            failures.append(f'{name}: no query budget declared in api.benchmarks.QUERY_BUDGETS')
+        elif result['queries'] > result['budget']:
+            failures.append(f"{name}: {result['queries']} queries, budget {result['budget']}")
+        before = previous.get(name)
+        if before and result['p95_ms'] is not None and before.get('p95_ms'):
+            if result['p95_ms'] > before['p95_ms'] * threshold and result['p95_ms'] - before['p95_ms'] > min_delta_ms:
+                failures.append(f"{name}: p95 {result['p95_ms']:.1f} ms, baseline {before['p95_ms']:.1f} ms")
+    return failures
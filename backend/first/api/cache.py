@@ -0,0 +1,126 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_ALIAS = 'default'
+DEFAULT_TIMEOUT = 60
+
+# Data groups that cached entries can depend on; writes bump their generation
+USAGE = 'usage'
+ALERTS = 'alerts'
+ZONES = 'zones'
+SETTINGS = 'settings'
+
+_lock = threading.Lock()
+_counters = {}
+
+
+def get_cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', DEFAULT_ALIAS)]
+
+
+def get_timeout():
+    return getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _generation_key(group):
+    return f'dashboard:gen:{group}'
+
+
+def _count(name, outcome):
+    with _lock:
+        entry = _counters.setdefault(name, {'hits': 0, 'misses': 0})
+        entry[outcome] += 1
+
+
+def _key(generations, name, depends_on, params):
+    parts = [name]
+    parts.extend(str(param) for param in params)
+    parts.extend(str(generations.get(_generation_key(group), 0)) for group in depends_on)
+    return 'dashboard:' + ':'.join(parts)
+
+
+def cached(name, depends_on, compute, params=()):
+    """Return ``compute()`` from the cache, keyed on the current generations
+
+    Writes to any group in ``depends_on`` bump that group's generation, so
+    stale entries are never read again and simply age out after the TTL.
+    A timeout of 0 (or None) disables caching.
+    """
+    timeout = get_timeout()
+    if not timeout:
+        return compute()
+
+    cache = get_cache()
+    generations = cache.get_many([_generation_key(group) for group in depends_on])
+    key = _key(generations, name, depends_on, params)
+
+    value = cache.get(key)
+    if value is not None:
+        _count(name, 'hits')
+        return value
+    _count(name, 'misses')
+    value = compute()
+    cache.set(key, value, timeout)
+    return value
+
+
+async def acached(name, depends_on, compute, params=()):
+    """Async ``cached``: ``compute`` is a coroutine function"""
+    timeout = get_timeout()
+    if not timeout:
+        return await compute()
+
+    cache = get_cache()
+    generations = await cache.aget_many([_generation_key(group) for group in depends_on])
+    key = _key(generations, name, depends_on, params)
+
+    value = await cache.aget(key)
+    if value is not None:
+        _count(name, 'hits')
+        return value
+    _count(name, 'misses')
+    value = await compute()
+    await cache.aset(key, value, timeout)
+    return value
+
+
+def generations(groups):
+    """Current generation of each group (0 until its first write)"""
+    values = get_cache().get_many([_generation_key(group) for group in groups])
+    return [values.get(_generation_key(group), 0) for group in groups]
+
+
+def invalidate(*groups):
+    """Bump the generation of each group, invalidating entries that use it"""
+    cache = get_cache()
+    for group in groups:
+        key = _generation_key(group)
+        # Generations must outlive the entries keyed on them
+        if not cache.add(key, 1, None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+
+def stats():
+    """Hit/miss counters for this process, overall and per entry"""
+    with _lock:
+        entries = {name: dict(counts) for name, counts in _counters.items()}
+    hits = sum(counts['hits'] for counts in entries.values())
+    misses = sum(counts['misses'] for counts in entries.values())
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / lookups if lookups else 0,
+        'timeout': get_timeout(),
+        'entries': entries,
+    }
+
+
+def reset_stats():
+    with _lock:
+        _counters.clear()
@@ -0,0 +1,163 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import DateTimeField, F, Func, IntegerField
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+
+from . import cache
+from .models import WaterZone, WaterUsage, Alert, SystemSettings, DataGeneration
+
+DEFAULT_WINDOW = 60
+
+
+def _generation(group):
+    """``updated_at`` and ``value`` of ``group``'s persisted generation (primary key lookups)"""
+    generation = DataGeneration.objects.filter(pk=group)
+    return [generation.values('updated_at'), generation.values('value')]
+
+
+def _table_summary(queryset, field):
+    """Latest ``field`` and row count of a table
+
+    Plain functions rather than aggregates, so the ORM adds no GROUP BY and
+    each query can be used as a scalar subquery.
+    """
+    queryset = queryset.order_by()
+    return [
+        queryset.annotate(value=Func(field, function='MAX', output_field=DateTimeField())).values('value'),
+        queryset.annotate(value=Func('pk', function='COUNT', output_field=IntegerField())).values('value'),
+    ]
+
+
+# Per data group: single-value querysets whose results change whenever the
+# group's data does. Timestamps among them also drive Last-Modified.
+WATERMARKS = {
+    # Readings are appended, so the newest row is a primary key lookup; edits
+    # and deletes advance the persisted generation (also a primary key lookup)
+    cache.USAGE: lambda: [
+        WaterUsage.objects.order_by('-pk').values('created_at')[:1], *_generation(cache.USAGE),
+    ],
+    # Inserts and updates set updated_at; deletes advance the persisted generation
+    cache.ALERTS: lambda: [
+        Alert.objects.order_by('-updated_at').values('updated_at')[:1], *_generation(cache.ALERTS),
+    ],
+    # Small tables; the counts catch deleted rows
+    cache.ZONES: lambda: _table_summary(WaterZone.objects, 'updated_at'),
+    cache.SETTINGS: lambda: _table_summary(SystemSettings.objects, 'updated_at'),
+}
+
+
+def bump_generation(group):
+    """Advance ``group``'s persisted generation once the current transaction commits
+
+    Runs as its own short statement after the commit, so concurrent writers
+    do not queue on the counter row while their transactions are open.
+    """
+    def bump():
+        now = timezone.now()
+        if not DataGeneration.objects.filter(pk=group).update(value=F('value') + 1, updated_at=now):
+            DataGeneration.objects.get_or_create(group=group, defaults={'value': 1, 'updated_at': now})
+    transaction.on_commit(bump)
+
+
+def read_watermarks(groups):
+    """Values of the WATERMARKS of ``groups``, fetched as one SELECT of scalar subqueries"""
+    querysets = [queryset for group in groups for queryset in WATERMARKS[group]()]
+    connection = connections[querysets[0].db]
+    parts, params, converters = [], [], {}
+    for position, queryset in enumerate(querysets):
+        compiler = queryset.query.get_compiler(connection=connection)
+        sql, subquery_params = compiler.as_sql()
+        parts.append(f'({sql})')
+        params.extend(subquery_params)
+        # Backend converters, e.g. SQLite returns datetimes as text
+        converter = compiler.get_converters([compiler.select[0][0]]).get(0)
+        if converter:
+            converters[position] = converter
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {', '.join(parts)}{connection.features.bare_select_suffix}", params)
+        row = cursor.fetchone()
+    return next(compiler.apply_converters([row], converters))
+
+
+def get_window():
+    return getattr(settings, 'CONDITIONAL_GET_WINDOW', DEFAULT_WINDOW)
+
+
+def validators(request, groups, windowed=False):
+    """``(etag, last_modified)`` of a GET for data in ``groups``
+
+    The ETag covers the URL with its query, the user and the negotiated media
+    type, each group's watermark and its dashboard cache generation. The
+    generations are bumped by the same signals that invalidate the cache, so
+    edits and deletes that leave a watermark alone still change the ETag.
+    """
+    marks = read_watermarks(groups)
+    latest = [mark for mark in marks if isinstance(mark, datetime)]
+    parts = [
+        request.get_full_path(), getattr(request.user, 'pk', None), getattr(request, 'accepted_media_type', ''),
+        *marks, *cache.generations(groups),
+    ]
+    window = get_window()
+    if windowed and window:
+        start = int(time.time() // window * window)
+        parts.append(start)
+        latest.append(datetime.fromtimestamp(start, dt_timezone.utc))
+    etag = quote_etag(hashlib.md5('|'.join(map(str, parts)).encode(), usedforsecurity=False).hexdigest())
+    return etag, int(max(latest).timestamp()) if latest else None
+
+
+def _enabled(request):
+    return request.method in ('GET', 'HEAD') and getattr(settings, 'CONDITIONAL_GET_ENABLED', True)
+
+
+def _add_validators(response, etag, last_modified):
+    if response.status_code not in (200, 304):
+        return response
+    response.headers.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    return response
+
+
+def respond(request, groups, view, windowed=False):
+    """Return 304 (or 412) from the watermarks alone, else run ``view()``"""
+    if not _enabled(request):
+        return view()
+    etag, last_modified = validators(request, groups, windowed)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = view()
+    return _add_validators(response, etag, last_modified)
+
+
+async def arespond(request, groups, view, windowed=False):
+    """Async ``respond``: ``view()`` returns an awaitable"""
+    if not _enabled(request):
+        return await view()
+    etag, last_modified = await sync_to_async(validators)(request, groups, windowed)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = await view()
+    return _add_validators(response, etag, last_modified)
+
+
+def conditional(*groups, windowed=False):
+    """Decorate a viewset action so unchanged GETs cost only the watermark lookups
+
+    ``windowed`` marks aggregates over a window ending now, which change as
+    time passes even without writes.
+    """
+    def decorator(method):
+        @wraps(method)
+        def inner(self, request, *args, **kwargs):
+            return respond(request, groups, lambda: method(self, request, *args, **kwargs), windowed)
+        return inner
+    return decorator
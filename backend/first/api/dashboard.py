@@ -0,0 +1,135 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import WaterZone, DailyUsageRollup
+from . import alerts, rollups
+
+TOP_ZONES_MAX_LIMIT = 100
+TOP_ZONES_MAX_DAYS = 3660
+
+
+# Dashboard aggregates are split into independent queries so the sync views
+# can run them in turn and the async views all at once.
+
+def stats_queries(now=None):
+    """Independent queries behind the dashboard stats, keyed by name"""
+    last_24h = (now or timezone.now()) - timedelta(days=1)
+    return {
+        'last_day': lambda: rollups.window_totals(last_24h),
+        'overall': lambda: DailyUsageRollup.objects.aggregate(
+            total=Sum('total_liters'), count=Sum('reading_count')
+        ),
+        'alert_counts': alerts.cached_alert_counts,
+        'zones': lambda: WaterZone.objects.filter(is_active=True).count(),
+    }
+
+
+def build_stats(results):
+    last_day = results['last_day']
+    overall = results['overall']
+    daily_avg = overall['total'] / overall['count'] if overall['count'] else 0
+
+    # Get water quality and system health
+    quality = last_day['quality_sum'] / last_day['count'] if last_day['count'] else 100
+
+    # System health based on active alerts
+    active_alerts = results['alert_counts']['active']
+    system_health = max(100 - (active_alerts * 5), 0)
+
+    return {
+        'total_usage': last_day['total'],
+        'daily_average': daily_avg,
+        'water_quality': int(quality),
+        'system_health': int(system_health),
+        'active_alerts': active_alerts,
+        'total_zones': results['zones'],
+    }
+
+
+def zone_usage_queries(zone_id, now=None):
+    """Independent queries behind a zone's usage stats, keyed by name"""
+    last_24h = (now or timezone.now()) - timedelta(days=1)
+    return {
+        'zone': lambda: WaterZone.objects.filter(is_active=True, pk=zone_id).values('id', 'name').first(),
+        'usage': lambda: rollups.window_totals(last_24h, zone_ids=[zone_id]),
+    }
+
+
+def build_zone_usage(zone, usage_data):
+    count = usage_data['count']
+    return {
+        'zone_id': zone['id'],
+        'zone_name': zone['name'],
+        'total_usage_24h': usage_data['total'],
+        'peak_usage': usage_data['peak'] or 0,
+        'low_usage': usage_data['low'] or 0,
+        'average_usage': usage_data['total'] / count if count else 0,
+        'measurements': count
+    }
+
+
+def parse_top_zones_params(params):
+    """Validate ``?limit=&days=&zone_type=``; raises ValueError with a message"""
+    try:
+        limit = int(params.get('limit', 4))
+        days = int(params.get('days', 7))
+    except ValueError:
+        raise ValueError('limit and days must be integers')
+    if not 1 <= limit <= TOP_ZONES_MAX_LIMIT or not 1 <= days <= TOP_ZONES_MAX_DAYS:
+        raise ValueError(f'limit must be 1-{TOP_ZONES_MAX_LIMIT} and days 1-{TOP_ZONES_MAX_DAYS}')
+    return limit, days, params.get('zone_type', '')
+
+
+def top_zones(limit, days, zone_type):
+    zones = WaterZone.objects.filter(is_active=True)
+    if zone_type:
+        zones = zones.filter(zone_type=zone_type)
+
+    start = timezone.now() - timedelta(days=days)
+    zone_usage = (
+        rollups.annotate_zone_usage(zones, start)
+        .order_by('-usage', 'name')
+        .values('name', 'usage')[:limit]
+    )
+    return [{'zone': row['name'], 'usage': row['usage']} for row in zone_usage]
+
+
+def run_all(queries):
+    """Run queries one after another"""
+    return {name: query() for name, query in queries.items()}
+
+
+async def in_thread(func, *args):
+    """Run blocking ORM work on a pool thread with its own DB connection
+
+    Django's async ORM funnels every query of a request through one
+    thread, so awaiting several of them still runs them back to back.
+    ``thread_sensitive=False`` gives each call its own thread and
+    connection; the connection is released again afterwards.
+    """
+    def call():
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return await sync_to_async(call, thread_sensitive=False)()
+
+
+async def arun_all(queries):
+    """Run queries concurrently, each on its own connection"""
+    names = list(queries)
+    results = await asyncio.gather(*(in_thread(queries[name]) for name in names))
+    return dict(zip(names, results))
+
+
+def stats():
+    return build_stats(run_all(stats_queries()))
+
+
+async def astats():
+    return build_stats(await arun_all(stats_queries()))
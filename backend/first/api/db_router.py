@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DEFAULT_REPLICA_ALIAS = 'replica'
+# Models whose reads may be served by the replica; users, tokens, sessions and
+# content types are always read from the primary so auth never sees stale rows
+DEFAULT_REPLICA_MODELS = (
+    'api.waterzone', 'api.waterusage', 'api.hourlyusagerollup', 'api.dailyusagerollup', 'api.alert', 'api.report',
+)
+
+# Per-request routing state; None outside replica_reads()
+_state = ContextVar('replica_state', default=None)
+
+
+def replica_alias():
+    """The configured replica alias, or None if it is not in DATABASES"""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', DEFAULT_REPLICA_ALIAS)
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def replica_reads():
+    """Route reads inside the block to the replica until the first write"""
+    token = _state.set({'wrote': False})
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def replica_models():
+    """Lowercased ``app_label.model`` labels of the models routed to the replica"""
+    return getattr(settings, 'REPLICA_MODELS', DEFAULT_REPLICA_MODELS)
+
+
+def using_replica():
+    state = _state.get()
+    return state is not None and not state['wrote'] and replica_alias() is not None
+
+
+class ReplicaRouter:
+    """Send reads from analytical endpoints to the read replica
+
+    Only code running inside ``replica_reads()`` and only the models in
+    ``REPLICA_MODELS`` are affected. Writes always go to the primary, and
+    once anything has been written in the block every later read stays on
+    the primary as well (read-your-writes).
+    """
+
+    def db_for_read(self, model, **hints):
+        if using_replica() and model._meta.label_lower in replica_models():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state['wrote'] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the primary
+        return True
@@ -0,0 +1,185 @@
+import math
+from itertools import islice
+
+import numpy as np
+from django.db.models import Max, Sum
+from django.db.models.functions import ExtractHour
+
+from .models import WaterUsage, HourlyUsageRollup
+from .timeseries import truncate
+
+DEFAULT_PERCENTILES = (50, 90, 99)
+DEFAULT_BINS = 20
+# Relative error of every quantile estimate
+DEFAULT_ACCURACY = 0.01
+# Readings below MIN_VALUE count as zero; above MAX_VALUE they share the top bucket
+MIN_VALUE = 1e-3
+MAX_VALUE = 1e9
+CHUNK_SIZE = 20000
+
+
+class UsageSketch:
+    """Mergeable quantile sketch for many zones at once
+
+    A DDSketch-style log histogram: bucket ``i`` counts readings in
+    ``(gamma ** (i - 1), gamma ** i]``, so every quantile is within
+    ``accuracy`` of the true value whatever the distribution. Counts are a
+    zones x buckets array filled a chunk at a time with ``bincount``; sketches
+    of the same accuracy merge by adding counts, which is how the overall
+    distribution of all zones is built.
+    """
+
+    def __init__(self, zones, accuracy=DEFAULT_ACCURACY):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # Column 0 holds zeros, column 1 the bucket of MIN_VALUE
+        self.offset = math.ceil(math.log(MIN_VALUE) / self.log_gamma) - 1
+        self.width = math.ceil(math.log(MAX_VALUE) / self.log_gamma) - self.offset + 1
+        self.counts = np.zeros((zones, self.width), dtype=np.int64)
+        self.total = np.zeros(zones)
+        self.low = np.full(zones, np.inf)
+        self.high = np.full(zones, -np.inf)
+
+    def add(self, rows, values):
+        """Count ``values`` (floats) for the zones at ``rows`` (indices into the sketch)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        buckets = np.zeros(len(values), dtype=np.int64)
+        positive = values >= MIN_VALUE
+        buckets[positive] = np.ceil(np.log(values[positive]) / self.log_gamma) - self.offset
+        np.clip(buckets, 0, self.width - 1, out=buckets)
+        zones = len(self.counts)
+        self.counts += np.bincount(rows * self.width + buckets, minlength=zones * self.width).reshape(zones, -1)
+        self.total += np.bincount(rows, weights=values, minlength=zones)
+        np.minimum.at(self.low, rows, values)
+        np.maximum.at(self.high, rows, values)
+
+    def merged(self):
+        """One-row sketch of all zones together"""
+        merged = UsageSketch(1, self.accuracy)
+        merged.counts = self.counts.sum(axis=0, keepdims=True)
+        merged.total = self.total.sum(keepdims=True)
+        merged.low = self.low.min(initial=np.inf, keepdims=True)
+        merged.high = self.high.max(initial=-np.inf, keepdims=True)
+        return merged
+
+    def _values(self):
+        """Estimated value of each bucket: zero, then the midpoint (relative) of its range"""
+        exponents = np.arange(self.width) + self.offset
+        values = 2 * self.gamma ** exponents / (self.gamma + 1)
+        values[0] = 0.0
+        return values
+
+    def quantiles(self, fractions):
+        """zones x fractions array of estimates (NaN for zones without readings)"""
+        cumulative = np.cumsum(self.counts, axis=1)
+        count = cumulative[:, -1]
+        values = self._values()
+        estimates = np.full((len(self.counts), len(fractions)), np.nan)
+        for column, fraction in enumerate(fractions):
+            # First bucket holding the reading of rank fraction * (count - 1)
+            rank = fraction * (count - 1)
+            bucket = np.minimum((cumulative <= rank[:, None]).sum(axis=1), self.width - 1)
+            estimates[:, column] = np.clip(values[bucket], self.low, self.high)
+        estimates[count == 0] = np.nan
+        return estimates
+
+    def histogram(self, row, bins):
+        """``(edges, counts)`` of ``bins`` equal-width bins between the zone's min and max
+
+        Readings are placed by their bucket's estimate, so a reading within
+        ``accuracy`` of an edge may land in the neighbouring bin.
+        """
+        low, high = self.low[row], self.high[row]
+        if not self.counts[row].any():
+            return [], []
+        edges = np.linspace(low, high, bins + 1)
+        if high == low:
+            return edges, np.r_[self.counts[row].sum(), np.zeros(bins - 1, dtype=np.int64)]
+        positions = (np.clip(self._values(), low, high) - low) / (high - low) * bins
+        bins_of_buckets = np.minimum(positions.astype(np.int64), bins - 1)
+        return edges, np.bincount(bins_of_buckets, weights=self.counts[row], minlength=bins).astype(np.int64)
+
+
+def sketch_usage(zone_ids, start, end, accuracy=DEFAULT_ACCURACY, chunk_size=CHUNK_SIZE):
+    """Sketch the raw readings of ``zone_ids`` over ``[start, end)`` in one pass
+
+    Only ``(zone_id, usage_liters)`` pairs are streamed from a single
+    query, ``chunk_size`` rows at a time, so memory depends on the number of
+    zones rather than readings and no timestamps are parsed.
+    """
+    sketch = UsageSketch(len(zone_ids), accuracy)
+    # Sketch rows follow zone_ids; ids are mapped to rows through the sorted ids
+    order = np.argsort(np.array(zone_ids, dtype=np.int64))
+    sorted_ids = np.array(zone_ids, dtype=np.int64)[order]
+    readings = (
+        WaterUsage.objects.filter(zone_id__in=zone_ids, measurement_time__gte=start, measurement_time__lt=end)
+        .order_by()
+        .values_list('zone_id', 'usage_liters')
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        chunk = list(islice(readings, chunk_size))
+        if not chunk:
+            return sketch
+        array = np.array(chunk, dtype=float)
+        sketch.add(order[np.searchsorted(sorted_ids, array[:, 0].astype(np.int64))], array[:, 1])
+
+
+def hour_profile(zone_ids, start, end):
+    """``{zone_id: (average, peak)}``, 24-element arrays by local hour of day
+
+    ``average`` is the mean reading and ``peak`` the highest reading in that
+    hour across the window (NaN without readings). Read from the hourly
+    rollups over the whole hours of the window and grouped in the database,
+    so it stays cheap for long windows.
+    """
+    rows = (
+        HourlyUsageRollup.objects.filter(
+            zone_id__in=zone_ids, bucket__gte=truncate(start, 'hour'), bucket__lt=end, reading_count__gt=0,
+        )
+        .annotate(hour=ExtractHour('bucket'))
+        .order_by()
+        .values_list('zone_id', 'hour')
+        .annotate(total=Sum('total_liters'), count=Sum('reading_count'), peak=Max('max_liters'))
+    )
+    profiles = {}
+    for zone_id, hour, total, count, peak in rows:
+        average, highest = profiles.setdefault(zone_id, (np.full(24, np.nan), np.full(24, np.nan)))
+        average[hour] = total / count
+        highest[hour] = peak
+    return profiles
+
+
+def _round(values, digits=3):
+    """Rounded floats with NaN as None, for JSON"""
+    return [None if math.isnan(value) else round(float(value), digits) for value in values]
+
+
+def summarize(sketch, fractions, bins):
+    """Count, mean, range, percentiles and histogram of every sketch row"""
+    quantiles = sketch.quantiles(fractions)
+    names = [f'p{fraction * 100:g}' for fraction in fractions]
+    summaries = []
+    for row in range(len(sketch.counts)):
+        count = int(sketch.counts[row].sum())
+        edges, counts = sketch.histogram(row, bins)
+        summaries.append({
+            'count': count,
+            'mean': round(float(sketch.total[row]) / count, 3) if count else None,
+            'min': round(float(sketch.low[row]), 3) if count else None,
+            'max': round(float(sketch.high[row]), 3) if count else None,
+            'percentiles': dict(zip(names, _round(quantiles[row]))),
+            'histogram': {'edges': _round(edges), 'counts': [int(value) for value in counts]},
+        })
+    return summaries
+
+
+def summarize_hours(profile):
+    """Hour-of-day averages, peaks and the busiest hour of one zone's profile"""
+    average, peak = profile or (np.full(24, np.nan), np.full(24, np.nan))
+    return {
+        'hours': {'average': _round(average), 'peak': _round(peak)},
+        'peak_hour': None if np.isnan(average).all() else int(np.nanargmax(average)),
+    }
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+import zlib
+
+from django.db.models import Q
+
+EXPORT_FIELDS = [
+    'id', 'zone_id', 'zone__name', 'usage_liters', 'measurement_time',
+    'is_peak', 'quality_percentage', 'created_at',
+]
+EXPORT_HEADER = [
+    'id', 'zone', 'zone_name', 'usage_liters', 'measurement_time',
+    'is_peak', 'quality_percentage', 'created_at',
+]
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def iter_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield value tuples in (measurement_time, id) order, one chunk at a time
+
+    Each chunk is its own keyset query, so memory stays constant and no
+    cursor or transaction is held open while the client reads the stream.
+    """
+    queryset = queryset.order_by('measurement_time', 'id').values_list(*EXPORT_FIELDS)
+    last = None
+    while True:
+        chunk = queryset
+        if last is not None:
+            chunk = chunk.filter(
+                Q(measurement_time__gt=last[4]) | Q(measurement_time=last[4], id__gt=last[0])
+            )
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def csv_stream(rows, batch=500):
+    """Encode rows as CSV, yielding a few hundred rows per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    count = 0
+    for row in rows:
+        row = list(row)
+        row[4] = _isoformat(row[4])
+        row[7] = _isoformat(row[7])
+        writer.writerow(row)
+        count += 1
+        if count % batch == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def ndjson_stream(rows, batch=500):
+    """Encode rows as newline-delimited JSON objects"""
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_HEADER, row))
+        record['measurement_time'] = _isoformat(record['measurement_time'])
+        record['created_at'] = _isoformat(record['created_at'])
+        lines.append(json.dumps(record))
+        if len(lines) >= batch:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_stream(chunks, level=6):
+    """Gzip-compress a byte stream incrementally"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,104 @@
+from django.db.models import CharField, Sum, Value
+from django.db.models.functions import Cast, Concat, LPad, Substr
+
+from .models import WaterZone, HourlyUsageRollup
+from .timeseries import truncate
+
+# A zone's path is the zero-padded ids of its ancestors and itself, e.g.
+# '00000000010000000042' for zone 42 under zone 1. Digits only, so paths
+# sort the same under every collation and a subtree is one index range.
+SEGMENT_LENGTH = 10
+MAX_DEPTH = WaterZone._meta.get_field('path').max_length // SEGMENT_LENGTH
+
+
+def segment(zone_id):
+    return f'{zone_id:0{SEGMENT_LENGTH}d}'
+
+
+def root_path():
+    """Expression for the path of a zone without a parent (its own segment)"""
+    return LPad(Cast('id', CharField()), SEGMENT_LENGTH, Value('0'))
+
+
+def depth(path):
+    """0 for top-level zones"""
+    return len(path) // SEGMENT_LENGTH - 1
+
+
+def path_ids(path):
+    """Ids of the ancestors in ``path``, root first, and the zone itself last"""
+    return [int(path[start:start + SEGMENT_LENGTH]) for start in range(0, len(path), SEGMENT_LENGTH)]
+
+
+def subtree_range(path):
+    """``(low, high)`` such that ``low <= p < high`` exactly for paths in the subtree"""
+    return path, str(int(path) + 1).zfill(len(path))
+
+
+def subtree(path, queryset=None):
+    """Zones in the subtree rooted at ``path``, the root included"""
+    low, high = subtree_range(path)
+    return (WaterZone.objects if queryset is None else queryset).filter(path__gte=low, path__lt=high)
+
+
+def subtree_ids(path):
+    """Subquery of the subtree's zone ids, for ``zone_id__in=`` filters"""
+    return subtree(path).values('id')
+
+
+def check_parent(zone, parent):
+    """Error message if ``parent`` cannot be the parent of ``zone``, else None"""
+    if parent is None:
+        return None
+    if zone is not None and zone.pk is not None and zone.path:
+        low, high = subtree_range(zone.path)
+        if low <= parent.path < high:
+            return 'A zone cannot be moved under itself or one of its descendants'
+        height = max(len(path) for path in subtree(zone.path).values_list('path', flat=True)) - len(zone.path)
+    else:
+        height = 0
+    if len(parent.path) + SEGMENT_LENGTH + height > MAX_DEPTH * SEGMENT_LENGTH:
+        return f'Zones can be nested at most {MAX_DEPTH} levels deep'
+    return None
+
+
+def place(zone):
+    """Store the path of a saved zone, rewriting its subtree's paths if it moved
+
+    The subtree is rewritten with a single UPDATE over its index range, so a
+    move costs the same number of queries however many zones it carries.
+    """
+    parent_path = ''
+    if zone.parent_id is not None:
+        parent_path = WaterZone.objects.filter(pk=zone.parent_id).values_list('path', flat=True).get()
+    path = parent_path + segment(zone.pk)
+    if path == zone.path:
+        return
+    if zone.path:
+        subtree(zone.path).update(path=Concat(Value(path), Substr('path', len(zone.path) + 1)))
+    else:
+        WaterZone.objects.filter(pk=zone.pk).update(path=path)
+    zone.path = path
+
+
+def branch_totals(path, start, end=None):
+    """Usage of each child branch of the zone at ``path`` over ``[start, end)``
+
+    Returns ``{zone_id: liters}`` keyed by child id, with the zone's own
+    readings under its own id. One grouped query over the hourly rollups of
+    the subtree: every row is attributed to a branch by its zone's path
+    prefix, so no tree is walked. The window is aligned down to the hour.
+    """
+    low, high = subtree_range(path)
+    queryset = HourlyUsageRollup.objects.filter(
+        zone__path__gte=low, zone__path__lt=high, bucket__gte=truncate(start, 'hour'),
+    )
+    if end is not None:
+        queryset = queryset.filter(bucket__lt=end)
+    rows = (
+        queryset.annotate(branch=Substr('zone__path', 1, len(path) + SEGMENT_LENGTH))
+        .order_by()
+        .values_list('branch')
+        .annotate(total=Sum('total_liters'))
+    )
+    return {path_ids(branch)[-1]: total or 0 for branch, total in rows}
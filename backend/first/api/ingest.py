@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.db import transaction
+
+from .models import WaterZone, WaterUsage
+from .serializers import WaterUsageIngestSerializer
+from .signals import usage_ingested
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_ROWS = 50000
+
+
+def get_batch_size():
+    return getattr(settings, 'WATER_USAGE_INGEST_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+def get_max_rows():
+    return getattr(settings, 'WATER_USAGE_INGEST_MAX_ROWS', DEFAULT_MAX_ROWS)
+
+
+def validate_readings(rows):
+    """Validate raw rows, returning (valid_rows, errors)
+
+    Field validation is done per row without touching the database; zone
+    existence is checked for the whole batch with a single query.
+    """
+    valid = []
+    errors = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'row': index, 'errors': {'non_field_errors': ['Expected an object.']}})
+            continue
+        serializer = WaterUsageIngestSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'row': index, 'errors': serializer.errors})
+
+    zone_ids = {data['zone'] for _, data in valid}
+    known_zones = set(
+        WaterZone.objects.filter(id__in=zone_ids).values_list('id', flat=True)
+    ) if zone_ids else set()
+
+    checked = []
+    for index, data in valid:
+        if data['zone'] in known_zones:
+            checked.append((index, data))
+        else:
+            errors.append({
+                'row': index,
+                'errors': {'zone': [f'Invalid pk "{data["zone"]}" - object does not exist.']}
+            })
+
+    errors.sort(key=lambda error: error['row'])
+    return checked, errors
+
+
+def ingest_readings(rows, batch_size=None):
+    """Validate and insert readings, returning (created_readings, errors)
+
+    Valid rows are written with chunked bulk inserts inside one transaction,
+    together with the rollup updates triggered by ``usage_ingested``;
+    invalid rows are reported back and do not block the rest of the batch.
+    """
+    batch_size = batch_size or get_batch_size()
+    valid, errors = validate_readings(rows)
+
+    readings = [
+        WaterUsage(
+            zone_id=data['zone'],
+            usage_liters=data['usage_liters'],
+            measurement_time=data['measurement_time'],
+            is_peak=data['is_peak'],
+            quality_percentage=data['quality_percentage'],
+        )
+        for _, data in valid
+    ]
+    if readings:
+        readings = insert_readings(readings, batch_size)
+    return readings, errors
+
+
+def insert_readings(readings, batch_size=None):
+    """Bulk-insert readings in one transaction and send ``usage_ingested``"""
+    with transaction.atomic():
+        readings = WaterUsage.objects.bulk_create(readings, batch_size=batch_size or get_batch_size())
+        usage_ingested.send(sender=WaterUsage, readings=readings)
+    return readings
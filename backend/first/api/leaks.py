@@ -0,0 +1,272 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Sum, Value
+from django.utils import timezone
+
+from .models import WaterZone, Alert, Report, HourlyUsageRollup, DailyUsageRollup
+from .alerts import OPEN_STATUSES
+from .signals import alerts_created
+
+LEAK_ALERT_TITLE = 'Possible leak detected'
+# Night flow is loaded with one UNION ALL branch per day; SQLite caps
+# compound selects at 500 branches.
+MAX_DAYS = 366
+
+DEFAULTS = {
+    'days': 90,
+    'recent_days': 7,
+    'night_hours': (2, 3, 4),
+    # Minimum night flow: recent median vs. baseline median
+    'night_increase_pct': 30.0,
+    'night_min_increase_liters': 1.0,
+    # Baseline drift: fitted daily trend over the window, as % of mean daily use
+    'drift_pct': 25.0,
+    'drift_persistence': 0.8,
+    'min_days': 14,
+}
+
+
+def _grid(zone_ids, days, zone_col, day_col, values):
+    """Scatter per-(zone, day) values into a zones x days array (NaN = no data)"""
+    grid = np.full((len(zone_ids), days), np.nan)
+    if len(values):
+        zone_idx = np.searchsorted(zone_ids, np.asarray(zone_col, dtype=np.int64))
+        day_idx = np.asarray(day_col, dtype=np.int64)
+        keep = (day_idx >= 0) & (day_idx < days)
+        grid[zone_idx[keep], day_idx[keep]] = np.asarray(values, dtype=np.float64)[keep]
+    return grid
+
+
+def _night_buckets(day, night_hours):
+    return [timezone.make_aware(datetime.combine(day, time(hour))) for hour in night_hours]
+
+
+def load_arrays(start, days, night_hours):
+    """Load per-zone daily totals and night flow for the window as NumPy arrays
+
+    Both come from the rollups, so the cost depends on zones x days rather
+    than on the number of raw readings. Night buckets are matched by exact
+    hour on the bucket index, with one UNION ALL branch per day, which keeps
+    timezone conversion out of the database and date parsing out of Python.
+    """
+    end = start + timedelta(days=days)
+    zones = list(WaterZone.objects.filter(is_active=True).order_by('id').values_list('id', 'name'))
+    zone_ids = np.array([zone_id for zone_id, _ in zones], dtype=np.int64)
+
+    daily_rows = list(
+        DailyUsageRollup.objects.filter(bucket__gte=start, bucket__lt=end, zone__is_active=True)
+        .values_list('zone_id', 'bucket', 'total_liters')
+    )
+    if daily_rows:
+        zone_col, date_col, values = zip(*daily_rows)
+        day_col = np.asarray(date_col, dtype='datetime64[D]') - np.datetime64(start, 'D')
+        daily = _grid(zone_ids, days, zone_col, day_col.astype(np.int64), values)
+    else:
+        daily = _grid(zone_ids, days, (), (), ())
+
+    per_day = [
+        HourlyUsageRollup.objects.filter(
+            bucket__in=_night_buckets(start + timedelta(days=offset), night_hours), zone__is_active=True,
+        )
+        .order_by()
+        .values('zone_id')
+        .annotate(day=Value(offset), total=Sum('total_liters'), hours=Count('id'))
+        .values_list('zone_id', 'day', 'total', 'hours')
+        for offset in range(days)
+    ]
+    night_rows = list(per_day[0].union(*per_day[1:], all=True))
+    if night_rows:
+        zone_col, day_col, totals, hours = zip(*night_rows)
+        # Night flow is liters per hour, averaged over the night hours with data
+        night = _grid(zone_ids, days, zone_col, day_col, np.divide(totals, hours))
+    else:
+        night = _grid(zone_ids, days, (), (), ())
+
+    return zones, daily, night
+
+
+def _nanmedian(values):
+    """Row-wise median that tolerates all-NaN rows without warnings"""
+    result = np.full(values.shape[0], np.nan)
+    has_data = ~np.all(np.isnan(values), axis=1)
+    if has_data.any():
+        result[has_data] = np.nanmedian(values[has_data], axis=1)
+    return result
+
+
+def _trend(daily):
+    """Least-squares slope per row, ignoring missing days"""
+    mask = ~np.isnan(daily)
+    t = np.broadcast_to(np.arange(daily.shape[1], dtype=np.float64), daily.shape)
+    n = mask.sum(axis=1)
+    y = np.where(mask, daily, 0.0)
+    tm = np.where(mask, t, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = tm.sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dt = np.where(mask, t - t_mean[:, None], 0.0)
+        dy = np.where(mask, daily - y_mean[:, None], 0.0)
+        slope = (dt * dy).sum(axis=1) / (dt * dt).sum(axis=1)
+    return slope, y_mean
+
+
+def analyze(daily, night, recent_days, options):
+    """Run minimum-night-flow and baseline-drift checks for all zones at once"""
+    baseline_night = _nanmedian(night[:, :-recent_days])
+    recent_night = _nanmedian(night[:, -recent_days:])
+    night_increase = recent_night - baseline_night
+    with np.errstate(invalid='ignore', divide='ignore'):
+        night_increase_pct = np.where(baseline_night > 0, night_increase / baseline_night * 100, np.inf)
+    night_flag = (
+        (night_increase >= options['night_min_increase_liters'])
+        & (night_increase_pct >= options['night_increase_pct'])
+    )
+
+    slope, mean_daily = _trend(daily)
+    days = daily.shape[1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        drift_pct = np.where(mean_daily > 0, slope * days / mean_daily * 100, 0.0)
+    baseline_daily = _nanmedian(daily[:, :-recent_days])
+    recent = daily[:, -recent_days:]
+    recent_days_seen = (~np.isnan(recent)).sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        above = (recent > baseline_daily[:, None]).sum(axis=1)
+        persistence = np.where(recent_days_seen > 0, above / np.maximum(recent_days_seen, 1), 0.0)
+    drift_flag = (drift_pct >= options['drift_pct']) & (persistence >= options['drift_persistence'])
+
+    enough_data = (~np.isnan(daily)).sum(axis=1) >= options['min_days']
+    night_flag &= enough_data & ~np.isnan(night_increase)
+    drift_flag &= enough_data
+
+    return {
+        'baseline_night_flow': baseline_night,
+        'recent_night_flow': recent_night,
+        'night_increase_pct': night_increase_pct,
+        'drift_pct': drift_pct,
+        'persistence': persistence,
+        'mean_daily': mean_daily,
+        'night_flag': night_flag,
+        'drift_flag': drift_flag,
+    }
+
+
+def _severity(night_flag, drift_flag, night_increase_pct):
+    if night_flag and drift_flag:
+        return 5 if night_increase_pct >= 100 else 4
+    if night_flag:
+        return 4 if night_increase_pct >= 100 else 3
+    return 2
+
+
+def _number(value):
+    value = float(value)
+    return round(value, 3) if np.isfinite(value) else None
+
+
+def detect_leaks(days=None, recent_days=None, create_alerts=True, user=None, now=None, **overrides):
+    """Analyse every active zone and record a leak-detection Report
+
+    Returns the Report; suspected zones and their evidence are in
+    ``report.data['suspected']``. With ``create_alerts`` an Alert is raised
+    for each suspected zone that has no active leak alert yet.
+    """
+    options = dict(DEFAULTS, **{key: value for key, value in overrides.items() if value is not None})
+    days = days or options['days']
+    recent_days = recent_days or options['recent_days']
+    if not 1 <= recent_days < days <= MAX_DAYS:
+        raise ValueError(f'recent_days must be shorter than days, and days at most {MAX_DAYS}')
+
+    today = timezone.localdate(now or timezone.now())
+    start = today - timedelta(days=days - 1)
+    zones, daily, night = load_arrays(start, days, options['night_hours'])
+    results = analyze(daily, night, recent_days, options)
+
+    suspected = []
+    estimated_loss = 0.0
+    flagged = np.flatnonzero(results['night_flag'] | results['drift_flag'])
+    for i in flagged:
+        zone_id, zone_name = zones[i]
+        night_flag = bool(results['night_flag'][i])
+        drift_flag = bool(results['drift_flag'][i])
+        severity = _severity(night_flag, drift_flag, results['night_increase_pct'][i])
+        if night_flag:
+            excess = results['recent_night_flow'][i] - results['baseline_night_flow'][i]
+            estimated_loss += float(excess) * 24 * recent_days
+        suspected.append({
+            'zone': zone_id,
+            'zone_name': zone_name,
+            'severity': severity,
+            'checks': [name for name, hit in (('minimum_night_flow', night_flag), ('baseline_drift', drift_flag)) if hit],
+            'evidence': {
+                'baseline_night_flow': _number(results['baseline_night_flow'][i]),
+                'recent_night_flow': _number(results['recent_night_flow'][i]),
+                'night_increase_pct': _number(results['night_increase_pct'][i]),
+                'drift_pct': _number(results['drift_pct'][i]),
+                'recent_days_above_baseline': _number(results['persistence'][i]),
+                'mean_daily_usage': _number(results['mean_daily'][i]),
+            },
+        })
+    suspected.sort(key=lambda item: (-item['severity'], item['zone_name']))
+
+    total_usage = float(np.nansum(daily))
+    with transaction.atomic():
+        report = Report.objects.create(
+            title=f'Leak Detection {start} to {today}',
+            report_type='leak_detection',
+            description=f'Minimum night flow and baseline drift analysis of {len(zones)} zones',
+            generated_by=user,
+            start_date=start,
+            end_date=today,
+            total_usage=total_usage,
+            efficiency_rate=round(max(0.0, 100 - estimated_loss / total_usage * 100), 2) if total_usage else 100,
+            data={
+                'zones_analyzed': len(zones),
+                'suspected_count': len(suspected),
+                'estimated_loss_liters': round(estimated_loss, 2),
+                'parameters': {
+                    'days': days,
+                    'recent_days': recent_days,
+                    'night_hours': list(options['night_hours']),
+                    'night_increase_pct': options['night_increase_pct'],
+                    'drift_pct': options['drift_pct'],
+                },
+                'suspected': suspected,
+            },
+        )
+        if create_alerts and suspected:
+            _raise_alerts(suspected)
+    return report
+
+
+def _raise_alerts(suspected):
+    already_alerted = set(
+        Alert.objects.filter(
+            status__in=OPEN_STATUSES, title=LEAK_ALERT_TITLE, zone_id__in=[item['zone'] for item in suspected]
+        ).values_list('zone_id', flat=True)
+    )
+    alerts = []
+    for item in suspected:
+        if item['zone'] in already_alerted:
+            continue
+        evidence = item['evidence']
+        details = []
+        if 'minimum_night_flow' in item['checks']:
+            details.append(
+                f"night flow up {evidence['night_increase_pct']}% "
+                f"({evidence['baseline_night_flow']} -> {evidence['recent_night_flow']} L/h)"
+            )
+        if 'baseline_drift' in item['checks']:
+            details.append(f"daily usage drifting up {evidence['drift_pct']}% over the window")
+        alerts.append(Alert(
+            zone_id=item['zone'],
+            title=LEAK_ALERT_TITLE,
+            message=f"{item['zone_name']}: " + '; '.join(details),
+            alert_type='error' if item['severity'] >= 4 else 'warning',
+            severity=item['severity'],
+        ))
+    if alerts:
+        alerts = Alert.objects.bulk_create(alerts)
+        alerts_created.send(sender=Alert, alerts=alerts)
+    return alerts
@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import connections, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.dispatch import receiver
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from django.utils.module_loading import import_string
+
+from .async_views import authenticate
+
+EVENT_TYPES = ('usage', 'alert')
+
+
+class Subscription:
+    """One client's view of the feed: a bounded queue plus its filters"""
+
+    def __init__(self, loop, zones=None, types=None, queue_size=1000):
+        self.loop = loop
+        self.zones = set(zones) if zones else None
+        self.types = set(types) if types else None
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def wants(self, event):
+        if self.types is not None and event['type'] not in self.types:
+            return False
+        # Events without a zone (alerts not tied to one) go to everyone
+        zone = event.get('zone')
+        return self.zones is None or zone is None or zone in self.zones
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client must not hold up the others; tell it to resync instead
+            self.overflowed = True
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker:
+    """Fan events out to subscribers in this process
+
+    ``publish`` may be called from any thread (sync views run in a thread
+    pool under ASGI); delivery hops onto each subscriber's event loop. A
+    multi-process deployment can swap in a broker backed by e.g. Redis
+    pub/sub with the same ``publish``/``subscribe``/``unsubscribe`` methods
+    via the LIVE_FEED_BROKER setting.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+        self.sequence = itertools.count(1)
+
+    def subscribe(self, zones=None, types=None):
+        subscription = Subscription(
+            asyncio.get_running_loop(), zones, types,
+            queue_size=getattr(settings, 'LIVE_FEED_QUEUE_SIZE', 1000),
+        )
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, event):
+        with self.lock:
+            event = dict(event, id=next(self.sequence))
+            targets = [subscription for subscription in self.subscriptions if subscription.wants(event)]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it will be unsubscribed on exit
+                pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'LIVE_FEED_BROKER', 'api.live.InProcessBroker'))()
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'LIVE_FEED_BROKER':
+        _broker = None
+
+
+def publish(*events):
+    """Publish events once the current transaction commits"""
+    if not events:
+        return
+    broker = get_broker()
+    transaction.on_commit(lambda: [broker.publish(event) for event in events])
+
+
+def usage_events(readings):
+    """Summarise a batch of new readings as one aggregate event per zone"""
+    by_zone = {}
+    for reading in readings:
+        summary = by_zone.get(reading.zone_id)
+        if summary is None:
+            summary = by_zone[reading.zone_id] = {
+                'type': 'usage', 'zone': reading.zone_id, 'readings': 0, 'total_liters': 0.0,
+                'max_liters': reading.usage_liters, 'latest': reading.measurement_time,
+            }
+        summary['readings'] += 1
+        summary['total_liters'] += reading.usage_liters
+        summary['max_liters'] = max(summary['max_liters'], reading.usage_liters)
+        summary['latest'] = max(summary['latest'], reading.measurement_time)
+    return list(by_zone.values())
+
+
+def alert_event(alert, event):
+    return {
+        'type': 'alert', 'event': event, 'zone': alert.zone_id, 'alert': alert.id,
+        'title': alert.title, 'alert_type': alert.alert_type, 'status': alert.status,
+        'severity': alert.severity,
+    }
+
+
+def _format(event):
+    data = json.dumps({key: value for key, value in event.items() if key != 'id'}, cls=DjangoJSONEncoder)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n".encode()
+
+
+async def _stream(subscription, heartbeat):
+    yield b'retry: 5000\n\n'
+    while True:
+        try:
+            event = await subscription.get(heartbeat)
+        except asyncio.TimeoutError:
+            # Comment line keeps proxies from closing an idle connection
+            yield b': keep-alive\n\n'
+            continue
+        if subscription.overflowed:
+            subscription.overflowed = False
+            yield b'event: resync\ndata: {}\n\n'
+        yield _format(event)
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """SSE response that drops its subscription when the client goes away
+
+    The ASGI handler calls ``close()`` once the stream ends or the client
+    disconnects.
+    """
+
+    def __init__(self, broker, subscription, heartbeat):
+        super().__init__(_stream(subscription, heartbeat), content_type='text/event-stream')
+        self.broker = broker
+        self.subscription = subscription
+        self['Cache-Control'] = 'no-cache'
+        self['X-Accel-Buffering'] = 'no'
+
+    def close(self):
+        self.broker.unsubscribe(self.subscription)
+        super().close()
+
+
+@require_safe
+async def live_feed(request):
+    """Server-sent events feed of usage aggregates and alert changes
+
+    ``?zone=1,2`` limits the feed to some zones, ``?types=usage,alert`` to
+    some event types. Needs ASGI (first/asgi.py): each open stream is a
+    coroutine, and a WSGI server or runserver would have to consume the async
+    stream synchronously and never deliver events, so they get 503.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'the live feed needs the server to run under ASGI'}, status=503)
+    denied = await authenticate(request)
+    if denied is not None:
+        return denied
+    try:
+        zones = [int(part) for part in request.GET.get('zone', '').split(',') if part.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'zone must be a comma-separated list of ids'}, status=400)
+    types = [part for part in request.GET.get('types', '').split(',') if part]
+    if any(part not in EVENT_TYPES for part in types):
+        return JsonResponse({'error': f'types must be among {", ".join(EVENT_TYPES)}'}, status=400)
+
+    # An idle subscriber should not hold a database connection open
+    await sync_to_async(connections.close_all)()
+
+    broker = get_broker()
+    subscription = broker.subscribe(zones=zones, types=types)
+    return EventStreamResponse(broker, subscription, getattr(settings, 'LIVE_FEED_HEARTBEAT_SECONDS', 15))
@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from api.benchmarks import percentile
+from api.models import WaterZone
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare latency of the sync dashboard/zone-stats endpoints with their async '
+        'counterparts under concurrent clients (in-process, cache disabled by default)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per client and endpoint')
+        parser.add_argument('--username', help='User to authenticate as (default: first superuser)')
+        parser.add_argument('--zone', type=int, help='Zone id for the zone-stats endpoint (default: first active zone)')
+        parser.add_argument('--with-cache', action='store_true',
+                            help='Keep the dashboard cache enabled (measures cache hits instead of queries)')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['requests'] < 1:
+            raise CommandError('--clients and --requests must be at least 1')
+        users = User.objects.filter(username=options['username']) if options['username'] \
+            else User.objects.filter(is_superuser=True).order_by('id')
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to authenticate as; pass --username')
+        zone_id = options['zone'] or WaterZone.objects.filter(is_active=True).order_by('id').values_list('id', flat=True).first()
+        if zone_id is None:
+            raise CommandError('No active zone; pass --zone')
+
+        endpoints = [
+            ('stats', '/api/dashboard/stats/', '/api/async/dashboard/stats/'),
+            ('top_zones', '/api/dashboard/top_zones/?days=30', '/api/async/dashboard/top_zones/?days=30'),
+            ('zone_usage_stats', f'/api/zones/{zone_id}/usage_stats/', f'/api/async/zones/{zone_id}/usage_stats/'),
+        ]
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if not options['with_cache']:
+            overrides['DASHBOARD_CACHE_TIMEOUT'] = 0
+
+        self.stdout.write(
+            f"{options['clients']} clients x {options['requests']} requests per endpoint\n"
+            f"{'endpoint':<18}{'mode':<7}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}{'req/s':>9}"
+        )
+        with override_settings(**overrides):
+            for name, sync_url, async_url in endpoints:
+                for mode, runner in (('sync', self._run_sync), ('async', self._run_async)):
+                    url = sync_url if mode == 'sync' else async_url
+                    started = time.perf_counter()
+                    latencies = runner(user, url, options['clients'], options['requests'])
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{name:<18}{mode:<7}{percentile(latencies, 0.5) * 1000:>9.2f}"
+                        f"{percentile(latencies, 0.95) * 1000:>9.2f}"
+                        f"{sum(latencies) / len(latencies) * 1000:>9.2f}{len(latencies) / elapsed:>9.1f}"
+                    )
+
+    def _run_sync(self, user, url, clients, requests):
+        """One thread per client, as a threaded WSGI server would do"""
+        def client_loop():
+            client = Client()
+            client.force_login(user)
+            latencies = []
+            try:
+                for _ in range(requests):
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append(time.perf_counter() - start)
+                    self._check(url, response.status_code)
+                client.logout()
+            finally:
+                connections.close_all()
+            return latencies
+
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = [pool.submit(client_loop) for _ in range(clients)]
+            return [latency for result in results for latency in result.result()]
+
+    def _run_async(self, user, url, clients, requests):
+        """All clients as coroutines on one event loop, as under an ASGI server"""
+        async def client_loop():
+            client = AsyncClient()
+            await client.aforce_login(user)
+            latencies = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                # Like ASGIHandler: sync work of one request shares a thread
+                async with ThreadSensitiveContext():
+                    response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                self._check(url, response.status_code)
+            await client.alogout()
+            return latencies
+
+        async def main():
+            results = await asyncio.gather(*(client_loop() for _ in range(clients)))
+            return [latency for result in results for latency in result]
+
+        return asyncio.run(main())
+
+    def _check(self, url, status_code):
+        if status_code != 200:
+            raise CommandError(f'{url} returned {status_code}')
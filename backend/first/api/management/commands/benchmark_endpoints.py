@@ -0,0 +1,90 @@
+import json
+import platform
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a synthetic fixture into a throwaway test database and time every GET endpoint of the '
+        'API router: query count against its budget plus p50/p95 latency, optionally compared with a '
+        'saved baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=20, help='Synthetic zones in the fixture')
+        parser.add_argument('--days', type=int, default=30, help='Days of readings per zone')
+        parser.add_argument('--interval', type=int, default=15, help='Minutes between readings')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed of the fixture')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', help='JSON file of an earlier run to compare p95 latency against')
+        parser.add_argument('--threshold', type=float, default=1.5,
+                            help='Fail when p95 exceeds the baseline by this factor')
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help='Ignore p95 regressions smaller than this many milliseconds')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['zones'] < 1 or options['days'] < 2:
+            raise CommandError('--repeat and --zones must be at least 1, --days at least 2')
+        if options['threshold'] <= 1:
+            raise CommandError('--threshold must be above 1')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline {options['baseline']}: {exc}")
+
+        from first.urls import router
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # The response cache would turn every timed request into a hit
+            with override_settings(DASHBOARD_CACHE_TIMEOUT=0, ACTIVITY_LOG_ENABLED=False):
+                started = time.perf_counter()
+                context = benchmarks.seed(
+                    zones=options['zones'], days=options['days'], interval=options['interval'],
+                    random_seed=options['seed'],
+                )
+                self.stdout.write(f'Loaded fixture in {time.perf_counter() - started:.1f}s')
+                results = benchmarks.run(router, context, repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'endpoint':<28}{'queries':>8}{'budget':>8}{'p50 ms':>9}{'p95 ms':>9}{'mean ms':>9}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<28}{result['queries']:>8}{str(result['budget']):>8}{result['p50_ms']:>9.2f}"
+                f"{result['p95_ms']:>9.2f}{result['mean_ms']:>9.2f}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump({
+                    'meta': {
+                        'created': timezone.now().isoformat(),
+                        'zones': options['zones'], 'days': options['days'], 'interval': options['interval'],
+                        'seed': options['seed'], 'repeat': options['repeat'],
+                        'python': platform.python_version(), 'django': django.get_version(),
+                        'database': connection.vendor,
+                    },
+                    'endpoints': results,
+                }, handle, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+        failures = benchmarks.check(results, baseline, options['threshold'], options['min_delta_ms'])
+        if failures:
+            raise CommandError('Benchmark failed:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} endpoints within budget'))
@@ -0,0 +1,77 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api import compression
+from api.benchmarks import percentile
+from api.renderers import ORJSONRenderer
+
+DEFAULT_URLS = [
+    '/api/usage/?page_size=1000',
+    '/api/usage/trend/?days=90&granularity=hour',
+    '/api/alerts/?page_size=500',
+    '/api/reports/',
+    '/api/reports/monthly/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSONRenderer with the orjson renderer on real endpoint payloads and show "
+        'the bytes on the wire with gzip and (if installed) brotli'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Endpoint to measure (repeatable; default: usage, trend, alerts and reports)')
+        parser.add_argument('--repeat', type=int, default=50, help='Renders per endpoint and renderer')
+        parser.add_argument('--username', help='User to authenticate as (default: first superuser)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        users = User.objects.filter(username=options['username']) if options['username'] \
+            else User.objects.filter(is_superuser=True).order_by('id')
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to authenticate as; pass --username')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        encodings = ['gzip'] + (['br'] if compression.brotli is not None else [])
+        self.stdout.write(
+            f"{'endpoint':<46}{'stdlib ms':>10}{'orjson ms':>10}{'speedup':>8}{'bytes':>10}"
+            + ''.join(f'{encoding:>9}{"ms":>7}' for encoding in encodings)
+        )
+        with override_settings(ALLOWED_HOSTS=['testserver'], CONDITIONAL_GET_ENABLED=False):
+            for url in options['urls'] or DEFAULT_URLS:
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+                stdlib_ms = self._time(JSONRenderer().render, response.data, options['repeat'])
+                orjson_ms = self._time(ORJSONRenderer().render, response.data, options['repeat'])
+                content = ORJSONRenderer().render(response.data)
+                line = (
+                    f'{url[:45]:<46}{stdlib_ms:>10.2f}{orjson_ms:>10.2f}{stdlib_ms / orjson_ms:>7.1f}x'
+                    f'{len(content):>10}'
+                )
+                for encoding in encodings:
+                    started = time.perf_counter()
+                    compressed = compression.compress(content, encoding)
+                    line += f'{len(compressed):>9}{(time.perf_counter() - started) * 1000:>7.2f}'
+                self.stdout.write(line)
+        if compression.brotli is None:
+            self.stdout.write('brotli is not installed; pip install brotli to compare it')
+
+    def _time(self, render, data, repeat):
+        """Median render time in milliseconds"""
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render(data)
+            latencies.append(time.perf_counter() - started)
+        return percentile(latencies, 0.5) * 1000
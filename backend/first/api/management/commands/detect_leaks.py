@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import leaks
+
+
+class Command(BaseCommand):
+    help = (
+        'Run minimum-night-flow and baseline-drift leak detection over every active zone, '
+        'raising alerts and saving a leak_detection report'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=leaks.DEFAULTS['days'],
+                            help='Length of the analysis window in days')
+        parser.add_argument('--recent-days', type=int, default=leaks.DEFAULTS['recent_days'],
+                            help='Trailing days compared against the rest of the window')
+        parser.add_argument('--night-increase-pct', type=float,
+                            help='Minimum rise in night flow, in percent, to flag a zone')
+        parser.add_argument('--drift-pct', type=float,
+                            help='Minimum upward drift of daily usage over the window, in percent')
+        parser.add_argument('--no-alerts', action='store_true',
+                            help='Only write the report, do not raise alerts')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['recent_days'] < options['days']:
+            raise CommandError('--recent-days must be at least 1 and below --days')
+        if options['days'] > leaks.MAX_DAYS:
+            raise CommandError(f'--days must be at most {leaks.MAX_DAYS}')
+
+        started = time.perf_counter()
+        report = leaks.detect_leaks(
+            days=options['days'],
+            recent_days=options['recent_days'],
+            create_alerts=not options['no_alerts'],
+            night_increase_pct=options['night_increase_pct'],
+            drift_pct=options['drift_pct'],
+        )
+        elapsed = time.perf_counter() - started
+        for item in report.data['suspected']:
+            self.stdout.write(f"  [{item['severity']}] {item['zone_name']}: {', '.join(item['checks'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Analysed {report.data['zones_analyzed']} zones in {elapsed:.2f}s, "
+            f"{report.data['suspected_count']} suspected leaks (report #{report.pk})"
+        ))
@@ -0,0 +1,86 @@
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api import rollups, synthetic
+from api.ingest import insert_readings
+from api.models import WaterZone
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic zones and water usage readings with daily, weekly, spike and leak '
+        'patterns for load and capacity testing (deterministic for a given seed)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=20, help='Number of zones to create')
+        parser.add_argument('--days', type=int, default=30, help='Days of readings per zone')
+        parser.add_argument('--interval', type=int, default=15, help='Minutes between readings (must divide a day)')
+        parser.add_argument('--end', help='Day after the last generated day (YYYY-MM-DD); default: today')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed')
+        parser.add_argument('--leak-fraction', type=float, default=0.1,
+                            help='Share of zones that develop a leak during the window')
+        parser.add_argument('--prefix', default='Synthetic zone', help='Name prefix of the created zones')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Readings per bulk insert')
+        parser.add_argument('--raw', action='store_true',
+                            help='Insert readings only and rebuild the rollups once at the end, skipping '
+                                 'the per-batch rollup, anomaly and live-feed updates (fastest)')
+
+    def handle(self, *args, **options):
+        zones, days, interval = options['zones'], options['days'], options['interval']
+        if zones < 1 or days < 1 or options['batch_size'] < 1:
+            raise CommandError('--zones, --days and --batch-size must be at least 1')
+        if interval < 1 or (24 * 60) % interval:
+            raise CommandError('--interval must be a positive number of minutes dividing 1440')
+        if not 0 <= options['leak_fraction'] <= 1:
+            raise CommandError('--leak-fraction must be between 0 and 1')
+        end = parse_date(options['end']) if options['end'] else timezone.localdate()
+        if end is None:
+            raise CommandError('--end must be a date in YYYY-MM-DD format')
+        if WaterZone.objects.filter(name__startswith=options['prefix']).exists():
+            raise CommandError(f"Zones named '{options['prefix']} ...' already exist; pass another --prefix")
+
+        start = synthetic.window_start(end, days)
+        plan = synthetic.plan_zones(zones, options['seed'], options['leak_fraction'])
+        zone_ids = synthetic.create_zones(options['prefix'], plan)
+        total = zones * days * (24 * 60 // interval)
+        self.stdout.write(f'Generating {total} readings for {zones} zones from {start:%Y-%m-%d} to {end}')
+
+        started = time.perf_counter()
+        written = 0
+        leaks = []
+        for index, (zone_id, (zone_type, leaking)) in enumerate(zip(zone_ids, plan)):
+            series, leak_start = synthetic.zone_readings(
+                zone_id, index, zone_type, leaking, start, days, interval, options['seed'],
+            )
+            if leak_start is not None:
+                leaks.append((zone_id, leak_start))
+            if options['raw']:
+                written += synthetic.insert_raw(series, start, options['batch_size'])
+            else:
+                readings = synthetic.iter_readings(series, start)
+                while batch := list(islice(readings, options['batch_size'])):
+                    insert_readings(batch, batch_size=options['batch_size'])
+                    written += len(batch)
+            if options['verbosity'] >= 2:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'  {written}/{total} rows, {written / elapsed:.0f} rows/s')
+        elapsed = time.perf_counter() - started
+
+        if options['raw']:
+            rebuild_started = time.perf_counter()
+            # The zones are new, so every day of their history has raw readings
+            rollups.rebuild(start=start, end=start + timedelta(days=days), zone_ids=zone_ids, include_purged=True)
+            self.stdout.write(f'Rebuilt rollups in {time.perf_counter() - rebuild_started:.1f}s')
+
+        names = dict(WaterZone.objects.filter(id__in=[zone_id for zone_id, _ in leaks]).values_list('id', 'name'))
+        for zone_id, leak_start in leaks:
+            self.stdout.write(f'  leak in {names[zone_id]} from {leak_start:%Y-%m-%d}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {written} readings in {elapsed:.1f}s ({written / elapsed:.0f} rows/s)'
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import retention, rollups
+from api.models import WaterUsage
+
+
+class Command(BaseCommand):
+    help = (
+        'Downsample raw WaterUsage readings older than the retention period into '
+        'the hourly/daily rollups, then delete them a day per transaction'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Keep this many days of raw readings (default: WATER_USAGE_RAW_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=retention.DEFAULT_BATCH_SIZE,
+                            help='Rows deleted per DELETE statement')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between days to let other writers in')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Trust the incrementally maintained rollups instead of rebuilding each day first')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many readings would be purged')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        cutoff = rollups.raw_retention_cutoff(days=options['days'])
+        if cutoff is None:
+            raise CommandError('Retention is disabled; set WATER_USAGE_RAW_RETENTION_DAYS or pass --days')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        if options['dry_run']:
+            count = WaterUsage.objects.filter(measurement_time__lt=cutoff).count()
+            self.stdout.write(f'Would purge {count} readings measured before {cutoff}')
+            return
+
+        deleted = retention.purge_raw(
+            cutoff,
+            batch_size=options['batch_size'],
+            rebuild=not options['skip_rebuild'],
+            pause=options['pause'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} readings measured before {cutoff}'))
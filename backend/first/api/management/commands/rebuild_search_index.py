@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of alerts, reports and activity logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models',
+                            choices=[index.model._meta.model_name for index in search.INDEXES.values()],
+                            help='Only rebuild this model (repeatable)')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias')
+
+    def handle(self, *args, **options):
+        backend = search.get_backend(options['database'])
+        if backend is None:
+            raise CommandError('No search backend for this database; ?search= uses LIKE queries')
+        for index in search.INDEXES.values():
+            name = index.model._meta.model_name
+            if options['models'] and name not in options['models']:
+                continue
+            with transaction.atomic(using=options['database']):
+                count = backend.rebuild(index, options['database'])
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {name} rows'))
@@ -0,0 +1,41 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly and daily usage rollups from raw WaterUsage readings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD); default: the raw retention cutoff')
+        parser.add_argument('--end', help='Last day to rebuild, inclusive (YYYY-MM-DD); default: no limit')
+        parser.add_argument('--zone', type=int, action='append', dest='zones',
+                            help='Only rebuild this zone id (repeatable)')
+        parser.add_argument('--include-purged', action='store_true',
+                            help='Also rebuild days before the raw retention cutoff, dropping the rollups of '
+                                 'readings purge_old_usage has deleted')
+
+    def _day_start(self, value, option):
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    def handle(self, *args, **options):
+        start = self._day_start(options['start'], '--start') if options['start'] else None
+        end = None
+        if options['end']:
+            end = self._day_start(options['end'], '--end') + timedelta(days=1)
+        if start and end and start >= end:
+            raise CommandError('--start must not be after --end')
+
+        hourly, daily = rollups.rebuild(
+            start=start, end=end, zone_ids=options['zones'], include_purged=options['include_purged']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {hourly} hourly and {daily} daily rollup rows'
+        ))
@@ -0,0 +1,232 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from . import activity
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class RouteStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+        self.responses = {}
+
+
+class Registry:
+    """In-process store of per-route request metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, method, status_code, seconds, queries, db_seconds, size):
+        with self.lock:
+            stats = self.routes.get((route, method))
+            if stats is None:
+                stats = self.routes[(route, method)] = RouteStats()
+            stats.latency.observe(seconds)
+            stats.queries.observe(queries)
+            stats.db_seconds += db_seconds
+            if size is not None:
+                stats.response_bytes += size
+            stats.responses[status_code] = stats.responses.get(status_code, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        with self.lock:
+            routes = sorted(self.routes.items())
+            lines = []
+            _histogram(lines, 'http_request_duration_seconds', 'Request latency in seconds',
+                       [(labels, stats.latency) for labels, stats in routes])
+            _histogram(lines, 'http_request_db_queries', 'Database queries per request',
+                       [(labels, stats.queries) for labels, stats in routes])
+            lines.append('# HELP http_request_db_seconds_total Time spent in database queries')
+            lines.append('# TYPE http_request_db_seconds_total counter')
+            for (route, method), stats in routes:
+                lines.append(f'http_request_db_seconds_total{_labels(route, method)} {stats.db_seconds!r}')
+            lines.append('# HELP http_response_size_bytes_total Response body bytes (non-streaming)')
+            lines.append('# TYPE http_response_size_bytes_total counter')
+            for (route, method), stats in routes:
+                lines.append(f'http_response_size_bytes_total{_labels(route, method)} {stats.response_bytes}')
+            lines.append('# HELP http_responses_total Responses by status code')
+            lines.append('# TYPE http_responses_total counter')
+            for (route, method), stats in routes:
+                for code, count in sorted(stats.responses.items()):
+                    lines.append(f'http_responses_total{_labels(route, method, status=code)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(route, method, **extra):
+    pairs = [('route', route), ('method', method)] + list(extra.items())
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _histogram(lines, name, help_text, series):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for (route, method), histogram in series:
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(route, method, le=bound)} {cumulative}')
+        lines.append(f'{name}_bucket{_labels(route, method, le="+Inf")} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(route, method)} {histogram.sum!r}')
+        lines.append(f'{name}_count{_labels(route, method)} {histogram.count}')
+
+
+registry = Registry()
+
+
+class QueryCounter:
+    """Counts queries and their duration for one request"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+
+    def add(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.seconds += seconds
+
+
+# The counter of the request being handled. Context variables follow the
+# request into sync_to_async threads, so queries an async view runs on pool
+# threads (see dashboard.arun_all) are counted too.
+_counter = ContextVar('metrics_query_counter', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.add(time.perf_counter() - start)
+
+
+def _install(connection):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    _install(connection)
+
+
+def route_name(request):
+    """Label requests with their URL name (the DRF router basename-action)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.route or 'unnamed'
+
+
+class MetricsMiddleware:
+    """Record latency, DB query count/time and response size per route
+
+    Works in both sync and async middleware chains, so async views are not
+    pushed back onto a worker thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _counter.reset(token)
+        return self._finish(request, response, counter, start)
+
+    async def __acall__(self, request):
+        counter, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _counter.reset(token)
+        return self._finish(request, response, counter, start)
+
+    def _start(self):
+        # Connections opened before this module was imported missed connection_created
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        counter = QueryCounter()
+        return counter, _counter.set(counter), time.perf_counter()
+
+    def _finish(self, request, response, counter, start):
+        elapsed = time.perf_counter() - start
+        size = None if response.streaming else len(response.content)
+        registry.record(
+            route_name(request), request.method, response.status_code,
+            elapsed, counter.count, counter.seconds, size,
+        )
+        return response
+
+
+def can_scrape(request):
+    """Staff users, ``Authorization: Bearer <METRICS_TOKEN>`` or a METRICS_ALLOWED_IPS address"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return True
+    if activity.client_ip(request) in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def metrics_view(request):
+    """Expose collected metrics for Prometheus to scrape"""
+    if not can_scrape(request):
+        return HttpResponseForbidden('Metrics require a staff user, the metrics token or an allowed address\n')
+    return HttpResponse(registry.render() + activity.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,101 @@
+# Generated by Django 6.0.2 on 2026-10-18 05:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import Trunc, TruncDate
+
+BATCH_SIZE = 1000
+
+
+def _bulk_write(model, db, rows, bucket_field):
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(model(
+            zone_id=row['zone_id'], bucket=row[bucket_field],
+            total_liters=row['total'] or 0, min_liters=row['low'], max_liters=row['peak'],
+            reading_count=row['count'] or 0, quality_sum=row['quality'] or 0,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            model.objects.using(db).bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.using(db).bulk_create(batch)
+
+
+def backfill_rollups(apps, schema_editor):
+    # Existing readings would otherwise be invisible to every rollup-backed
+    # endpoint until rebuild_usage_rollups is run (same steps as rollups.rebuild)
+    db = schema_editor.connection.alias
+    WaterUsage = apps.get_model('api', 'WaterUsage')
+    HourlyUsageRollup = apps.get_model('api', 'HourlyUsageRollup')
+    DailyUsageRollup = apps.get_model('api', 'DailyUsageRollup')
+    hourly = (
+        WaterUsage.objects.using(db).annotate(hour=Trunc('measurement_time', 'hour'))
+        .order_by()
+        .values('zone_id', 'hour')
+        .annotate(
+            total=Sum('usage_liters'), low=Min('usage_liters'), peak=Max('usage_liters'),
+            count=Count('id'), quality=Sum('quality_percentage'),
+        )
+    )
+    _bulk_write(HourlyUsageRollup, db, hourly, 'hour')
+    daily = (
+        HourlyUsageRollup.objects.using(db).annotate(day=TruncDate('bucket'))
+        .order_by()
+        .values('zone_id', 'day')
+        .annotate(
+            total=Sum('total_liters'), low=Min('min_liters'), peak=Max('max_liters'),
+            count=Sum('reading_count'), quality=Sum('quality_sum'),
+        )
+    )
+    _bulk_write(DailyUsageRollup, db, daily, 'day')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_liters', models.FloatField(default=0)),
+                ('min_liters', models.FloatField(blank=True, null=True)),
+                ('max_liters', models.FloatField(blank=True, null=True)),
+                ('reading_count', models.IntegerField(default=0)),
+                ('quality_sum', models.BigIntegerField(default=0, help_text='Sum of quality_percentage over readings')),
+                ('bucket', models.DateField(help_text='Day (in TIME_ZONE)')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='api.waterzone')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['bucket'], name='api_dailyus_bucket_1a9229_idx')],
+                'constraints': [models.UniqueConstraint(fields=('zone', 'bucket'), name='unique_daily_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_liters', models.FloatField(default=0)),
+                ('min_liters', models.FloatField(blank=True, null=True)),
+                ('max_liters', models.FloatField(blank=True, null=True)),
+                ('reading_count', models.IntegerField(default=0)),
+                ('quality_sum', models.BigIntegerField(default=0, help_text='Sum of quality_percentage over readings')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='api.waterzone')),
+            ],
+            options={
+                'ordering': ['-bucket'],
+                'abstract': False,
+                'indexes': [models.Index(fields=['bucket'], name='api_hourlyu_bucket_0266a3_idx')],
+                'constraints': [models.UniqueConstraint(fields=('zone', 'bucket'), name='unique_hourly_rollup')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-18 05:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_usage_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['-timestamp', '-id'], name='api_activit_timesta_7bdc35_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['-created_at', '-id'], name='api_alert_created_bce3a8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waterusage',
+            index=models.Index(fields=['-measurement_time', '-id'], name='api_waterus_measure_e197de_idx'),
+        ),
+    ]
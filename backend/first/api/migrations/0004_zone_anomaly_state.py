@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ZoneAnomalyState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reading_count', models.BigIntegerField(default=0)),
+                ('ewma_mean', models.FloatField(default=0)),
+                ('ewma_variance', models.FloatField(default=0)),
+                ('quantile_sketch', models.JSONField(default=dict, help_text='P-square markers for the high-usage quantile')),
+                ('last_reading_at', models.DateTimeField(blank=True, null=True)),
+                ('last_alert_at', models.DateTimeField(blank=True, null=True)),
+                ('zone', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='anomaly_state', to='api.waterzone')),
+            ],
+        ),
+    ]
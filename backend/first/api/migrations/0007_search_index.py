@@ -0,0 +1,101 @@
+# Generated by Django 6.0.2 on 2026-10-18 11:20
+
+import api.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+# FTS5 tables behind api.search.SQLiteFTS5Backend: table -> (columns, bm25 column weights, rows)
+TABLES = {
+    'api_alert_fts': (
+        ('title', 'message'), '4.0, 1.0',
+        'SELECT id, title, message FROM api_alert',
+    ),
+    'api_report_fts': (
+        ('title', 'description'), '4.0, 1.0',
+        'SELECT id, title, description FROM api_report',
+    ),
+    'api_activitylog_fts': (
+        ('action', 'description', 'username'), '2.0, 1.0, 2.0',
+        'SELECT a.id, a.action, a.description, COALESCE(u.username, \'\') '
+        'FROM api_activitylog a LEFT JOIN auth_user u ON u.id = a.user_id',
+    ),
+}
+
+
+def _fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_tables(apps, schema_editor):
+    if not _fts5(schema_editor.connection):
+        return
+    for table, (columns, weights, source) in TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5({', '.join(columns)}, "
+            f"tokenize = 'porter unicode61 remove_diacritics 2')"
+        )
+        # Default ``rank`` of the table, so matching titles count for more
+        schema_editor.execute(f"INSERT INTO {table} ({table}, rank) VALUES ('rank', 'bm25({weights})')")
+        schema_editor.execute(f"INSERT INTO {table} (rowid, {', '.join(columns)}) {source}")
+
+
+def drop_tables(apps, schema_editor):
+    if not _fts5(schema_editor.connection):
+        return
+    for table in TABLES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_activitylog_timestamp_default'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityLogSearchEntry',
+            fields=[
+                ('rank', models.FloatField()),
+                ('activity', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='api.activitylog')),
+                ('document', api.models.SearchDocumentField(db_column='api_activitylog_fts')),
+            ],
+            options={
+                'db_table': 'api_activitylog_fts',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertSearchEntry',
+            fields=[
+                ('rank', models.FloatField()),
+                ('alert', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='api.alert')),
+                ('document', api.models.SearchDocumentField(db_column='api_alert_fts')),
+            ],
+            options={
+                'db_table': 'api_alert_fts',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ReportSearchEntry',
+            fields=[
+                ('rank', models.FloatField()),
+                ('report', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='api.report')),
+                ('document', api.models.SearchDocumentField(db_column='api_report_fts')),
+            ],
+            options={
+                'db_table': 'api_report_fts',
+                'abstract': False,
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_tables, drop_tables),
+    ]
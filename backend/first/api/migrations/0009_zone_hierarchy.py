@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import CharField, Value
+from django.db.models.functions import Cast, LPad
+
+
+def backfill_paths(apps, schema_editor):
+    # Existing zones are all top-level: the path is the zero-padded id
+    WaterZone = apps.get_model('api', 'WaterZone')
+    WaterZone.objects.using(schema_editor.connection.alias).update(
+        path=LPad(Cast('id', CharField()), 10, Value('0'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_alert_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='waterzone',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='api.waterzone'),
+        ),
+        migrations.AddField(
+            model_name='waterzone',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=250),
+        ),
+        migrations.AlterField(
+            model_name='waterzone',
+            name='zone_type',
+            field=models.CharField(choices=[('site', 'Site'), ('building', 'Building'), ('floor', 'Floor'), ('meter', 'Meter'), ('outdoor', 'Outdoor Area'), ('irrigation', 'Irrigation System'), ('other', 'Other')], default='building', max_length=50),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
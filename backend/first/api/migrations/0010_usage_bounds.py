@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-18 16:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_zone_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waterusage',
+            name='quality_percentage',
+            field=models.IntegerField(default=100, help_text='Water quality percentage', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.AlterField(
+            model_name='waterusage',
+            name='usage_liters',
+            field=models.FloatField(validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
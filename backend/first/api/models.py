@@ -1,3 +1,4 @@
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -18,6 +19,7 @@ ALERT_TYPE_CHOICES = [
 
 ALERT_STATUS_CHOICES = [
     ('active', 'Active'),
+    ('acknowledged', 'Acknowledged'),
     ('resolved', 'Resolved'),
 ]
 
@@ -49,13 +51,19 @@ class WaterZone(models.Model):
     zone_type = models.CharField(
         max_length=50,
         choices=[
+            ('site', 'Site'),
             ('building', 'Building'),
+            ('floor', 'Floor'),
+            ('meter', 'Meter'),
             ('outdoor', 'Outdoor Area'),
             ('irrigation', 'Irrigation System'),
             ('other', 'Other'),
         ],
         default='building'
     )
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='children')
+    # Materialized path (see api.hierarchy), maintained on save
+    path = models.CharField(max_length=250, blank=True, editable=False, db_index=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -70,22 +78,86 @@ class WaterZone(models.Model):
 class WaterUsage(models.Model):
     """Track water usage measurements"""
     zone = models.ForeignKey(WaterZone, on_delete=models.CASCADE, related_name='usage_records')
-    usage_liters = models.FloatField()
+    usage_liters = models.FloatField(validators=[MinValueValidator(0)])
     measurement_time = models.DateTimeField()
     is_peak = models.BooleanField(default=False)
-    quality_percentage = models.IntegerField(default=100, help_text="Water quality percentage")
+    quality_percentage = models.IntegerField(
+        default=100, validators=[MinValueValidator(0), MaxValueValidator(100)], help_text="Water quality percentage"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-measurement_time']
         indexes = [
             models.Index(fields=['zone', '-measurement_time']),
+            models.Index(fields=['-measurement_time', '-id']),
         ]
 
     def __str__(self):
         return f"{self.zone.name} - {self.usage_liters}L at {self.measurement_time}"
 
 
+class UsageRollup(models.Model):
+    """Pre-aggregated usage for one zone and time bucket"""
+    total_liters = models.FloatField(default=0)
+    min_liters = models.FloatField(null=True, blank=True)
+    max_liters = models.FloatField(null=True, blank=True)
+    reading_count = models.IntegerField(default=0)
+    quality_sum = models.BigIntegerField(default=0, help_text="Sum of quality_percentage over readings")
+
+    class Meta:
+        abstract = True
+        ordering = ['-bucket']
+
+
+class HourlyUsageRollup(UsageRollup):
+    """Hourly usage per zone, maintained incrementally from WaterUsage"""
+    zone = models.ForeignKey(WaterZone, on_delete=models.CASCADE, related_name='hourly_rollups')
+    bucket = models.DateTimeField(help_text="Start of the hour")
+
+    class Meta(UsageRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['zone', 'bucket'], name='unique_hourly_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.zone.name} - {self.total_liters}L in hour {self.bucket}"
+
+
+class DailyUsageRollup(UsageRollup):
+    """Daily usage per zone, maintained incrementally from WaterUsage"""
+    zone = models.ForeignKey(WaterZone, on_delete=models.CASCADE, related_name='daily_rollups')
+    bucket = models.DateField(help_text="Day (in TIME_ZONE)")
+
+    class Meta(UsageRollup.Meta):
+        constraints = [
+            models.UniqueConstraint(fields=['zone', 'bucket'], name='unique_daily_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+    def __str__(self):
+        return f"{self.zone.name} - {self.total_liters}L on {self.bucket}"
+
+
+class ZoneAnomalyState(models.Model):
+    """Online usage statistics per zone, updated in O(1) as readings arrive"""
+    zone = models.OneToOneField(WaterZone, on_delete=models.CASCADE, related_name='anomaly_state')
+    reading_count = models.BigIntegerField(default=0)
+    ewma_mean = models.FloatField(default=0)
+    ewma_variance = models.FloatField(default=0)
+    quantile_sketch = models.JSONField(default=dict, help_text="P-square markers for the high-usage quantile")
+    last_reading_at = models.DateTimeField(null=True, blank=True)
+    last_alert_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.zone.name} - mean {self.ewma_mean:.1f}L over {self.reading_count} readings"
+
+
 class Alert(models.Model):
     """System alerts and notifications"""
     zone = models.ForeignKey(WaterZone, on_delete=models.CASCADE, related_name='alerts', null=True, blank=True)
@@ -97,9 +169,17 @@ class Alert(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
     resolved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='resolved_alerts')
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+    acknowledged_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='acknowledged_alerts')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
+            models.Index(fields=['status', 'alert_type', 'severity']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.get_status_display()}"
@@ -158,11 +238,15 @@ class ActivityLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='activities')
     action = models.CharField(max_length=255)
     description = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: buffered entries are inserted after the request, keeping its time
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.action} ({self.timestamp})"
@@ -190,3 +274,67 @@ class Compliance(models.Model):
     def __str__(self):
         return f"{self.category} - {self.get_status_display()}"
 
+
+class DataGeneration(models.Model):
+    """Persisted change counter of one data group (see api.cache), shared by every process"""
+    group = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.group} #{self.value}"
+
+
+class SearchDocumentField(models.TextField):
+    """An FTS5 table's hidden column named after the table; supports ``__match``"""
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class SearchEntry(models.Model):
+    """Row of an SQLite FTS5 search table (see api.search)
+
+    The tables are created by migration rather than managed by Django. The
+    rowid is the indexed row's primary key and ``rank`` its relevance to the
+    current MATCH, lower being better.
+    """
+    rank = models.FloatField()
+
+    class Meta:
+        abstract = True
+        managed = False
+
+
+class AlertSearchEntry(SearchEntry):
+    alert = models.OneToOneField(Alert, models.DO_NOTHING, primary_key=True, db_column='rowid',
+                                 related_name='search_entry')
+    document = SearchDocumentField(db_column='api_alert_fts')
+
+    class Meta(SearchEntry.Meta):
+        db_table = 'api_alert_fts'
+
+
+class ReportSearchEntry(SearchEntry):
+    report = models.OneToOneField(Report, models.DO_NOTHING, primary_key=True, db_column='rowid',
+                                  related_name='search_entry')
+    document = SearchDocumentField(db_column='api_report_fts')
+
+    class Meta(SearchEntry.Meta):
+        db_table = 'api_report_fts'
+
+
+class ActivityLogSearchEntry(SearchEntry):
+    activity = models.OneToOneField(ActivityLog, models.DO_NOTHING, primary_key=True, db_column='rowid',
+                                    related_name='search_entry')
+    document = SearchDocumentField(db_column='api_activitylog_fts')
+
+    class Meta(SearchEntry.Meta):
+        db_table = 'api_activitylog_fts'
@@ -0,0 +1,209 @@
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination, _reverse_ordering
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination on a composite, unique ordering such as (measurement_time, id)
+
+    DRF's CursorPagination keys the cursor on the first ordering field only
+    and falls back to OFFSET for ties. Here the cursor carries every ordering
+    field, so each page is a single range query on an index no matter how
+    deep it is, and no COUNT(*) is run.
+
+    Passing ``?page=`` opts back into page-number pagination.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    page_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.fallback = None
+        if self.page_query_param in request.query_params:
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.nullable = [_is_nullable(queryset, order.lstrip('-')) for order in self.ordering]
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        queryset = queryset.order_by(*self._order_by(reverse))
+
+        if current_position is not None:
+            queryset = queryset.filter(self._keyset_filter(queryset, current_position, reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_ordering(self, request, queryset, view):
+        """Append the primary key as a tie-breaker so positions are unique"""
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            descending = ordering[0].startswith('-')
+            ordering = ordering + ('-id' if descending else 'id',)
+        return ordering
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            elif field_name == 'pk':
+                attr = instance.pk
+            else:
+                try:
+                    attr = getattr(instance, instance._meta.get_field(field_name).attname)
+                except FieldDoesNotExist:
+                    # An annotation, such as the search rank
+                    attr = getattr(instance, field_name)
+            values.append(None if attr is None else str(attr))
+        return json.dumps(values)
+
+    def _order_by(self, reverse):
+        """Ordering expressions, with NULLs pinned below every value on nullable fields
+
+        Pinning NULL placement keeps the keyset comparison identical on every
+        database backend. NOT NULL fields are ordered plainly, so the ORDER BY
+        still matches their index.
+        """
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        expressions = []
+        for order, nullable in zip(ordering, self.nullable):
+            if not nullable:
+                expressions.append(order)
+            elif order.startswith('-'):
+                expressions.append(F(order[1:]).desc(nulls_last=True))
+            else:
+                expressions.append(F(order).asc(nulls_first=True))
+        return expressions
+
+    def _keyset_filter(self, queryset, position, reverse):
+        """Build ``(a, b, ...) > (x, y, ...)`` as nested OR/AND lookups"""
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            values = [
+                _to_python(queryset, order.lstrip('-'), value)
+                for order, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q(pk__in=[])
+        for i, order in enumerate(self.ordering):
+            descending = order.startswith('-') != reverse
+            clause = _after(order.lstrip('-'), values[i], descending, self.nullable[i])
+            for previous, value in zip(self.ordering[:i], values[:i]):
+                clause &= _equal(previous.lstrip('-'), value)
+            condition |= clause
+
+        # The same rows, plus a range on the leading field that the database
+        # can seek the index with instead of testing every OR branch
+        attr = self.ordering[0].lstrip('-')
+        if not self.nullable[0] and values[0] is not None:
+            lookup = 'lte' if self.ordering[0].startswith('-') != reverse else 'gte'
+            condition &= Q(**{f'{attr}__{lookup}': values[0]})
+        return condition
+
+
+def _is_nullable(queryset, field_name):
+    """Whether the ordering field can hold NULL (annotations are assumed to)"""
+    if field_name == 'pk':
+        return False
+    if field_name in queryset.query.annotations:
+        return True
+    try:
+        return queryset.model._meta.get_field(field_name).null
+    except FieldDoesNotExist:
+        return True
+
+
+def _after(attr, value, descending, nullable=True):
+    """Rows that sort after ``value`` on one field, NULL being the lowest value"""
+    if descending:
+        if value is None:
+            return Q(pk__in=[])
+        if not nullable:
+            return Q(**{f'{attr}__lt': value})
+        return Q(**{f'{attr}__lt': value}) | Q(**{f'{attr}__isnull': True})
+    if value is None:
+        return Q(**{f'{attr}__isnull': False})
+    return Q(**{f'{attr}__gt': value})
+
+
+def _equal(attr, value):
+    if value is None:
+        return Q(**{f'{attr}__isnull': True})
+    return Q(**{attr: value})
+
+
+def _to_python(queryset, field_name, value):
+    if value is None:
+        return None
+    annotation = queryset.query.annotations.get(field_name)
+    if annotation is not None:
+        return annotation.output_field.to_python(value)
+    model = queryset.model
+    field = model._meta.pk if field_name == 'pk' else model._meta.get_field(field_name)
+    return field.to_python(value)
+
+
+class UsageCursorPagination(KeysetCursorPagination):
+    ordering = ('-measurement_time', '-id')
+
+
+class AlertCursorPagination(KeysetCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ActivityCursorPagination(KeysetCursorPagination):
+    ordering = ('-timestamp', '-id')
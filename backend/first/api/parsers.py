@@ -0,0 +1,79 @@
+import csv
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .renderers import ORJSONRenderer
+
+
+class ORJSONParser(BaseParser):
+    """Parse JSON request bodies with orjson"""
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class NDJSONParser(BaseParser):
+    """Parse newline-delimited JSON into a list of rows
+
+    Lines that are not valid JSON are kept as raw strings so the caller can
+    report them as per-row errors instead of failing the whole request.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            text = stream.read().decode(encoding)
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'NDJSON parse error - {exc}')
+
+        rows = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(orjson.loads(line))
+            except ValueError:
+                rows.append(line)
+        return rows
+
+
+class CSVParser(BaseParser):
+    """Parse CSV with a header row into a list of rows
+
+    Empty cells are dropped so that serializer defaults apply.
+    """
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            text = stream.read().decode(encoding)
+        except UnicodeDecodeError as exc:
+            raise ParseError(f'CSV parse error - {exc}')
+
+        try:
+            reader = csv.DictReader(io.StringIO(text))
+            return [
+                {key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+                for row in reader
+            ]
+        except csv.Error as exc:
+            raise ParseError(f'CSV parse error - {exc}')
@@ -0,0 +1,56 @@
+import math
+
+import numpy as np
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Line/paragraph separators are valid JSON but not valid JavaScript
+_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+def _has_non_finite(data):
+    """Whether ``data`` holds a NaN or infinite float, which orjson renders as null"""
+    if isinstance(data, (float, np.floating)):
+        return not math.isfinite(data)
+    if isinstance(data, dict):
+        return any(_has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite(value) for value in data)
+    if isinstance(data, np.ndarray):
+        return data.dtype.kind in 'fc' and not np.isfinite(data).all()
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer output produced by orjson
+
+    Dicts, lists, strings, numbers, datetimes, dates, UUIDs and numpy arrays
+    are encoded natively; anything else (Decimal, timedelta, lazy strings,
+    querysets, generators) goes through DRF's encoder, and data orjson cannot
+    encode at all falls back to JSONRenderer. So does data with NaN or
+    infinite floats, which orjson would render as null: JSONRenderer rejects
+    them as not JSON compliant. It is only looked for in output holding a
+    null. An ``indent`` media type parameter, or the browsable API, selects
+    two-space indentation.
+    """
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        try:
+            content = orjson.dumps(data, default=self.encoder.default, option=options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in content and _has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        for separator, escaped in _SEPARATORS:
+            if separator in content:
+                content = content.replace(separator, escaped)
+        return content
@@ -0,0 +1,70 @@
+import time
+from datetime import timedelta
+
+from django.db import connection, transaction
+
+from .models import WaterUsage
+from . import cache, conditional, rollups
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _delete_ids(ids):
+    """Delete readings by id without loading them or sending signals
+
+    The post_delete receivers would recompute rollups from the (now empty)
+    raw hour, which is exactly what retention must not do.
+    """
+    table = connection.ops.quote_name(WaterUsage._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+        return cursor.rowcount
+
+
+def purge_raw(cutoff, batch_size=DEFAULT_BATCH_SIZE, rebuild=True, pause=0, log=None):
+    """Downsample then delete raw readings older than ``cutoff``, a day at a time
+
+    For each day the hourly/daily rollups are rebuilt from the raw rows
+    (unless ``rebuild`` is False) and the raw rows are then deleted in
+    batches of ``batch_size`` ids. The rebuild and the deletes of a day
+    share one transaction: a purge interrupted partway through a day leaves
+    all of its readings in place, so a rerun never rebuilds a day's rollups
+    from the rows that survived. ``pause`` seconds are slept between days.
+    Returns the number of rows deleted.
+    """
+    oldest = (
+        WaterUsage.objects.filter(measurement_time__lt=cutoff)
+        .order_by('measurement_time')
+        .values_list('measurement_time', flat=True)
+        .first()
+    )
+    if oldest is None:
+        return 0
+
+    deleted = 0
+    day = rollups.truncate(oldest, 'day')
+    while day < cutoff:
+        day_end = min(rollups.truncate(day + timedelta(days=1, hours=12), 'day'), cutoff)
+        day_deleted = 0
+        readings = WaterUsage.objects.filter(measurement_time__gte=day, measurement_time__lt=day_end)
+        with transaction.atomic():
+            if rebuild:
+                rollups.rebuild(start=day, end=day_end, include_purged=True)
+            while True:
+                ids = list(readings.order_by().values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                day_deleted += _delete_ids(ids)
+
+        deleted += day_deleted
+        if day_deleted:
+            # The raw deletes send no post_delete
+            cache.invalidate(cache.USAGE)
+            conditional.bump_generation(cache.USAGE)
+            if log:
+                log(f'{day.date()}: purged {day_deleted} readings')
+            if pause:
+                time.sleep(pause)
+        day = day_end
+    return deleted
@@ -0,0 +1,415 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FilteredRelation, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, Trunc, TruncDate
+from django.utils import timezone
+
+from .models import WaterUsage, HourlyUsageRollup, DailyUsageRollup
+from .timeseries import truncate
+
+BATCH_SIZE = 1000
+ZONE_CHUNK_SIZE = 500
+MERGE_RETRIES = 3
+
+ROLLUP_FIELDS = ['total_liters', 'min_liters', 'max_liters', 'reading_count', 'quality_sum']
+
+
+def _aware(value):
+    if timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def _empty():
+    return {'total': 0, 'peak': None, 'low': None, 'count': 0, 'quality_sum': 0}
+
+
+def _combine(into, total, peak, low, count, quality_sum):
+    into['total'] += total or 0
+    into['count'] += count or 0
+    into['quality_sum'] += quality_sum or 0
+    if peak is not None:
+        into['peak'] = peak if into['peak'] is None else max(into['peak'], peak)
+    if low is not None:
+        into['low'] = low if into['low'] is None else min(into['low'], low)
+    return into
+
+
+# Incremental maintenance
+
+def _deltas(readings):
+    """Aggregate new readings per (zone, hour) and (zone, day) in Python"""
+    hourly = {}
+    daily = {}
+    for reading in readings:
+        measured = _aware(reading.measurement_time)
+        usage = reading.usage_liters
+        quality = reading.quality_percentage
+        for deltas, key in (
+            (hourly, (reading.zone_id, truncate(measured, 'hour'))),
+            (daily, (reading.zone_id, timezone.localtime(measured).date())),
+        ):
+            _combine(deltas.setdefault(key, _empty()), usage, usage, usage, 1, quality)
+    return hourly, daily
+
+
+def _merge(model, deltas):
+    """Fold deltas into existing rollup rows, creating missing ones"""
+    by_zone = {}
+    for zone_id, bucket in deltas:
+        by_zone.setdefault(zone_id, []).append(bucket)
+    zone_ids = sorted(by_zone)
+
+    existing = {}
+    for i in range(0, len(zone_ids), ZONE_CHUNK_SIZE):
+        chunk = zone_ids[i:i + ZONE_CHUNK_SIZE]
+        buckets = [bucket for zone_id in chunk for bucket in by_zone[zone_id]]
+        rows = model.objects.select_for_update().filter(
+            zone_id__in=chunk, bucket__gte=min(buckets), bucket__lte=max(buckets)
+        )
+        for row in rows:
+            existing[(row.zone_id, row.bucket)] = row
+
+    to_update = []
+    to_create = []
+    for (zone_id, bucket), delta in deltas.items():
+        row = existing.get((zone_id, bucket))
+        if row is None:
+            to_create.append(model(
+                zone_id=zone_id, bucket=bucket,
+                total_liters=delta['total'], min_liters=delta['low'], max_liters=delta['peak'],
+                reading_count=delta['count'], quality_sum=delta['quality_sum'],
+            ))
+            continue
+        merged = _combine(
+            {'total': row.total_liters, 'peak': row.max_liters, 'low': row.min_liters,
+             'count': row.reading_count, 'quality_sum': row.quality_sum},
+            delta['total'], delta['peak'], delta['low'], delta['count'], delta['quality_sum'],
+        )
+        row.total_liters = merged['total']
+        row.min_liters = merged['low']
+        row.max_liters = merged['peak']
+        row.reading_count = merged['count']
+        row.quality_sum = merged['quality_sum']
+        to_update.append(row)
+
+    if to_update:
+        model.objects.bulk_update(to_update, ROLLUP_FIELDS, batch_size=BATCH_SIZE)
+    if to_create:
+        model.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+
+
+def apply_readings(readings):
+    """Add newly created readings to the hourly and daily rollups"""
+    readings = list(readings)
+    if not readings:
+        return
+    hourly, daily = _deltas(readings)
+    for attempt in range(MERGE_RETRIES):
+        try:
+            with transaction.atomic():
+                _merge(HourlyUsageRollup, hourly)
+                _merge(DailyUsageRollup, daily)
+            return
+        except IntegrityError:
+            # A concurrent writer created one of our buckets first; re-read and retry
+            if attempt == MERGE_RETRIES - 1:
+                raise
+
+
+def _subtract(model, deltas):
+    """Take deltas of removed readings out of their rollup rows
+
+    Totals and counts are exact; min/max cannot be recomputed without the raw
+    rows, so they are left as bounds. Rows left without readings are deleted.
+    """
+    for (zone_id, bucket), delta in deltas.items():
+        rows = model.objects.filter(zone_id=zone_id, bucket=bucket)
+        rows.update(
+            total_liters=F('total_liters') - delta['total'],
+            reading_count=F('reading_count') - delta['count'],
+            quality_sum=F('quality_sum') - delta['quality_sum'],
+        )
+        rows.filter(reading_count__lte=0).delete()
+
+
+def refresh_reading(previous, current=None):
+    """Update the rollups after a reading was edited from ``previous`` to ``current``
+
+    ``current`` is None for a deletion; both are readings (or anything with
+    their zone_id, measurement_time, usage_liters and quality_percentage).
+    Hours still covered by raw readings are recomputed from them. Before the
+    raw retention cutoff the other readings of the hour may have been purged,
+    so the change is applied as a delta instead of rebuilding the hour away.
+    """
+    cutoff = raw_retention_cutoff()
+    hours = set()
+    removed = []
+    added = []
+    for reading, purged in ((previous, removed), (current, added)):
+        if reading is None:
+            continue
+        measured = _aware(reading.measurement_time)
+        if cutoff is not None and measured < cutoff:
+            purged.append(reading)
+        else:
+            hours.add((reading.zone_id, truncate(measured, 'hour')))
+
+    with transaction.atomic():
+        for zone_id, hour in hours:
+            rebuild(start=hour, end=hour + timedelta(hours=1), zone_ids=[zone_id])
+        if removed:
+            hourly, daily = _deltas(removed)
+            _subtract(HourlyUsageRollup, hourly)
+            _subtract(DailyUsageRollup, daily)
+        if added:
+            apply_readings(added)
+
+
+# Full / ranged rebuild
+
+def rebuild(start=None, end=None, zone_ids=None, include_purged=False):
+    """Recompute rollups from raw readings
+
+    ``start``/``end`` bound the hourly buckets that are rebuilt; daily
+    buckets are rebuilt for every day touching that range. Returns the
+    number of (hourly, daily) rows written.
+
+    ``start`` is clamped to the raw retention cutoff: before it the rollups
+    are all that is left of purged readings. Pass ``include_purged=True``
+    only when the raw readings of the whole range are known to exist.
+    """
+    cutoff = None if include_purged else raw_retention_cutoff()
+    if cutoff is not None and (start is None or _aware(start) < cutoff):
+        start = cutoff
+    if start is not None:
+        start = truncate(_aware(start), 'hour')
+    if end is not None:
+        end = _aware(end)
+        hour = truncate(end, 'hour')
+        end = hour if hour == end else hour + timedelta(hours=1)
+        if start is not None and end <= start:
+            return 0, 0
+
+    with transaction.atomic():
+        hourly = _rebuild_hourly(start, end, zone_ids)
+        daily = _rebuild_daily(start, end, zone_ids)
+    return hourly, daily
+
+
+def _rebuild_hourly(start, end, zone_ids):
+    raw = WaterUsage.objects.all()
+    stale = HourlyUsageRollup.objects.all()
+    if zone_ids is not None:
+        raw = raw.filter(zone_id__in=zone_ids)
+        stale = stale.filter(zone_id__in=zone_ids)
+    if start is not None:
+        raw = raw.filter(measurement_time__gte=start)
+        stale = stale.filter(bucket__gte=start)
+    if end is not None:
+        raw = raw.filter(measurement_time__lt=end)
+        stale = stale.filter(bucket__lt=end)
+    stale.delete()
+
+    rows = (
+        raw.annotate(hour=Trunc('measurement_time', 'hour'))
+        .order_by()
+        .values('zone_id', 'hour')
+        .annotate(
+            total=Sum('usage_liters'), low=Min('usage_liters'), peak=Max('usage_liters'),
+            count=Count('id'), quality=Sum('quality_percentage'),
+        )
+    )
+    return _write(HourlyUsageRollup, rows, 'hour')
+
+
+def _rebuild_daily(start, end, zone_ids):
+    hourly = HourlyUsageRollup.objects.all()
+    stale = DailyUsageRollup.objects.all()
+    if zone_ids is not None:
+        hourly = hourly.filter(zone_id__in=zone_ids)
+        stale = stale.filter(zone_id__in=zone_ids)
+    if start is not None:
+        day_start = truncate(start, 'day')
+        hourly = hourly.filter(bucket__gte=day_start)
+        stale = stale.filter(bucket__gte=day_start.date())
+    if end is not None:
+        day_end = truncate(end - timedelta(microseconds=1), 'day')
+        hourly = hourly.filter(bucket__lt=day_end + timedelta(days=1))
+        stale = stale.filter(bucket__lte=day_end.date())
+    stale.delete()
+
+    rows = (
+        hourly.annotate(day=TruncDate('bucket'))
+        .order_by()
+        .values('zone_id', 'day')
+        .annotate(
+            total=Sum('total_liters'), low=Min('min_liters'), peak=Max('max_liters'),
+            count=Sum('reading_count'), quality=Sum('quality_sum'),
+        )
+    )
+    return _write(DailyUsageRollup, rows, 'day')
+
+
+def _write(model, rows, bucket_field):
+    written = 0
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(model(
+            zone_id=row['zone_id'], bucket=row[bucket_field],
+            total_liters=row['total'] or 0, min_liters=row['low'], max_liters=row['peak'],
+            reading_count=row['count'] or 0, quality_sum=row['quality'] or 0,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def raw_retention_cutoff(days=None, now=None):
+    """Start of the oldest day whose raw readings are still kept
+
+    Readings before this may have been purged by ``purge_old_usage`` and only
+    survive in the rollups. ``None`` when retention is disabled.
+    """
+    if days is None:
+        days = getattr(settings, 'WATER_USAGE_RAW_RETENTION_DAYS', None)
+    if not days:
+        return None
+    return truncate((now or timezone.now()) - timedelta(days=days), 'day')
+
+
+# Reads
+
+def _raw_totals(start, end, zone_ids, by_zone):
+    queryset = WaterUsage.objects.filter(measurement_time__gte=start, measurement_time__lt=end)
+    if zone_ids is not None:
+        queryset = queryset.filter(zone_id__in=zone_ids)
+    aggregates = dict(
+        total=Sum('usage_liters'), peak=Max('usage_liters'), low=Min('usage_liters'),
+        count=Count('id'), quality_sum=Sum('quality_percentage'),
+    )
+    if by_zone:
+        return list(queryset.order_by().values('zone_id').annotate(**aggregates))
+    return [queryset.aggregate(**aggregates)]
+
+
+def _rollup_totals(start, end, zone_ids, by_zone):
+    queryset = HourlyUsageRollup.objects.filter(bucket__gte=start)
+    if end is not None:
+        queryset = queryset.filter(bucket__lt=end)
+    if zone_ids is not None:
+        queryset = queryset.filter(zone_id__in=zone_ids)
+    aggregates = dict(
+        total=Sum('total_liters'), peak=Max('max_liters'), low=Min('min_liters'),
+        count=Sum('reading_count'), quality_sum=Sum('quality_sum'),
+    )
+    if by_zone:
+        return list(queryset.order_by().values('zone_id').annotate(**aggregates))
+    return [queryset.aggregate(**aggregates)]
+
+
+def window_totals(start, end=None, zone_ids=None, by_zone=False):
+    """Aggregate usage over ``[start, end)`` from the rollups
+
+    Whole hours are read from the hourly rollup table; only the partial
+    hours at the edges of the window touch raw readings. ``end=None`` means
+    open-ended. Returns a dict with total/peak/low/count/quality_sum, or a
+    ``{zone_id: dict}`` mapping with ``by_zone``.
+
+    Edges that fall before the raw retention cutoff are widened to whole
+    hours, since raw readings there may already be downsampled away.
+    """
+    cutoff = raw_retention_cutoff()
+    if cutoff is not None:
+        if start < cutoff:
+            start = truncate(start, 'hour')
+        if end is not None and end < cutoff and truncate(end, 'hour') != end:
+            end = truncate(end, 'hour') + timedelta(hours=1)
+    head_end = truncate(start, 'hour')
+    if head_end < start:
+        head_end += timedelta(hours=1)
+    tail_start = truncate(end, 'hour') if end is not None else None
+
+    parts = []
+    if tail_start is not None and head_end >= tail_start:
+        parts.extend(_raw_totals(start, end, zone_ids, by_zone))
+    else:
+        if start < head_end:
+            parts.extend(_raw_totals(start, head_end, zone_ids, by_zone))
+        parts.extend(_rollup_totals(head_end, tail_start, zone_ids, by_zone))
+        if tail_start is not None and tail_start < end:
+            parts.extend(_raw_totals(tail_start, end, zone_ids, by_zone))
+
+    if not by_zone:
+        result = _empty()
+        for part in parts:
+            _combine(result, part['total'], part['peak'], part['low'], part['count'], part['quality_sum'])
+        return result
+
+    results = {}
+    for part in parts:
+        _combine(
+            results.setdefault(part['zone_id'], _empty()),
+            part['total'], part['peak'], part['low'], part['count'], part['quality_sum'],
+        )
+    return results
+
+
+def trend_totals(start, granularity, zone_ids=None, by_zone=False):
+    """Sum usage per bucket from ``start`` onwards with one grouped query
+
+    Hourly trends read the hourly rollups; day/week/month trends read the
+    daily rollups, so the cost depends on the number of buckets rather than
+    the number of readings. Returns ``{bucket: total}`` or, with
+    ``by_zone``, ``{zone_id: {bucket: total}}``.
+    """
+    if granularity == 'hour':
+        queryset = HourlyUsageRollup.objects.filter(bucket__gte=start)
+        period = F('bucket')
+    else:
+        queryset = DailyUsageRollup.objects.filter(bucket__gte=timezone.localtime(start).date())
+        period = F('bucket') if granularity == 'day' else Trunc('bucket', granularity)
+    if zone_ids is not None:
+        queryset = queryset.filter(zone_id__in=zone_ids)
+
+    fields = ['zone_id', 'period'] if by_zone else ['period']
+    rows = (
+        queryset.annotate(period=period)
+        .order_by()
+        .values(*fields)
+        .annotate(total=Sum('total_liters'))
+    )
+    if not by_zone:
+        return {row['period']: row['total'] or 0 for row in rows}
+    totals = {}
+    for row in rows:
+        totals.setdefault(row['zone_id'], {})[row['period']] = row['total'] or 0
+    return totals
+
+
+def annotate_zone_usage(zones, start, end=None, daily=False):
+    """Annotate a WaterZone queryset with ``usage`` over ``[start, end)``
+
+    The rollup table is joined with the window in the join condition
+    (FilteredRelation), so the whole queryset is one grouped query that only
+    reads buckets inside the window. Hourly rollups take datetimes (the
+    window is aligned down to the hour); ``daily=True`` takes dates.
+    """
+    relation = 'daily_rollups' if daily else 'hourly_rollups'
+    if not daily:
+        start = truncate(start, 'hour')
+    condition = Q(**{f'{relation}__bucket__gte': start})
+    if end is not None:
+        condition &= Q(**{f'{relation}__bucket__lt': end})
+    return zones.annotate(
+        window_rollups=FilteredRelation(relation, condition=condition),
+    ).annotate(
+        usage=Coalesce(Sum('window_rollups__total_liters'), 0.0),
+    )
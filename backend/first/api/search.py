@@ -0,0 +1,197 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, router
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .models import Alert, Report, ActivityLog
+
+# Annotation holding the relevance score; lower ranks first (FTS5 bm25)
+RANK = 'search_rank'
+CHUNK_SIZE = 500
+
+
+class SearchIndex:
+    """Text columns of one model copied into a search table
+
+    ``columns`` are ``(name, lookup)`` pairs, so related values such as the
+    user name of an activity log entry are indexed with the row. Each model
+    reaches its table's rows through the ``search_entry`` relation.
+    """
+
+    def __init__(self, model, table, columns):
+        self.model = model
+        self.table = table
+        self.columns = columns
+
+    @property
+    def names(self):
+        return [name for name, _ in self.columns]
+
+    def rows(self, queryset):
+        return queryset.order_by().values_list('pk', *[lookup for _, lookup in self.columns])
+
+
+INDEXES = {
+    index.model: index for index in (
+        SearchIndex(Alert, 'api_alert_fts', [('title', 'title'), ('message', 'message')]),
+        SearchIndex(Report, 'api_report_fts', [('title', 'title'), ('description', 'description')]),
+        SearchIndex(
+            ActivityLog, 'api_activitylog_fts',
+            [('action', 'action'), ('description', 'description'), ('username', 'user__username')],
+        ),
+    )
+}
+
+
+class SearchBackend:
+    """Keeps the search tables of INDEXES in sync and answers queries
+
+    Backends for other databases implement the same four methods and are
+    selected with the SEARCH_BACKEND setting.
+    """
+
+    def update(self, index, pks, using):
+        raise NotImplementedError
+
+    def remove(self, index, pks, using):
+        raise NotImplementedError
+
+    def rebuild(self, index, using):
+        raise NotImplementedError
+
+    def search(self, index, queryset, terms):
+        """Filter ``queryset`` to rows matching every term, annotated with RANK"""
+        raise NotImplementedError
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Search tables as SQLite FTS5 virtual tables keyed by the model's pk
+
+    Each term matches as a word prefix (``leak`` finds "leaking"); quoted
+    phrases match as phrases. Tables are created by migration 0007 and
+    mapped by the unmanaged ``*SearchEntry`` models.
+    """
+
+    def update(self, index, pks, using):
+        pks = list(pks)
+        for start in range(0, len(pks), CHUNK_SIZE):
+            chunk = pks[start:start + CHUNK_SIZE]
+            rows = list(index.rows(index.model._default_manager.using(using).filter(pk__in=chunk)))
+            with connections[using].cursor() as cursor:
+                self._delete(cursor, index, chunk)
+                self._insert(cursor, index, rows)
+
+    def remove(self, index, pks, using):
+        pks = list(pks)
+        with connections[using].cursor() as cursor:
+            for start in range(0, len(pks), CHUNK_SIZE):
+                self._delete(cursor, index, pks[start:start + CHUNK_SIZE])
+
+    def rebuild(self, index, using):
+        rows = index.rows(index.model._default_manager.using(using)).iterator(chunk_size=CHUNK_SIZE)
+        count = 0
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {index.table}')
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) == CHUNK_SIZE:
+                    count += self._insert(cursor, index, batch)
+                    batch = []
+            count += self._insert(cursor, index, batch)
+        return count
+
+    def _delete(self, cursor, index, pks):
+        if pks:
+            cursor.execute(
+                f'DELETE FROM {index.table} WHERE rowid IN ({", ".join(["%s"] * len(pks))})', pks,
+            )
+
+    def _insert(self, cursor, index, rows):
+        if rows:
+            columns = ', '.join(['rowid', *index.names])
+            placeholders = ', '.join(['%s'] * (len(index.names) + 1))
+            cursor.executemany(
+                f'INSERT INTO {index.table} ({columns}) VALUES ({placeholders})',
+                [[value if value is not None else '' for value in row] for row in rows],
+            )
+        return len(rows)
+
+    def search(self, index, queryset, terms):
+        query = ' AND '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        # Joined rather than correlated, so each match is ranked once (bm25
+        # with the column weights set up by migration 0007)
+        return queryset.filter(search_entry__document__match=query).annotate(**{RANK: F('search_entry__rank')})
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+_backends = {}
+
+
+def get_backend(using):
+    """The search backend for a database alias, or None to fall back to LIKE"""
+    if using not in _backends:
+        path = getattr(settings, 'SEARCH_BACKEND', None)
+        if path:
+            _backends[using] = import_string(path)()
+        else:
+            _backends[using] = SQLiteFTS5Backend() if fts5_available(connections[using]) else None
+    return _backends[using]
+
+
+@receiver(setting_changed)
+def reset_backends(setting, **kwargs):
+    if setting == 'SEARCH_BACKEND':
+        _backends.clear()
+
+
+def update_index(model, pks, using=None):
+    """Reindex rows of ``model`` after they were created or changed"""
+    index = INDEXES.get(model)
+    using = using or router.db_for_write(model)
+    backend = get_backend(using)
+    if index is not None and backend is not None and pks:
+        backend.update(index, pks, using)
+
+
+def remove_from_index(model, pks, using=None):
+    index = INDEXES.get(model)
+    using = using or router.db_for_write(model)
+    backend = get_backend(using)
+    if index is not None and backend is not None and pks:
+        backend.remove(index, pks, using)
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """``?search=`` answered from the search index, best matches first
+
+    Models without an index, or databases without a search backend, use
+    DRF's ``search_fields`` LIKE search. The view's OrderingFilter still
+    wins when ``?ordering=`` is given; cursor pagination picks the rank
+    ordering up through ``get_ordering``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = [term for term in self.get_search_terms(request) if term.strip()]
+        index = INDEXES.get(queryset.model)
+        backend = get_backend(queryset.db) if index is not None else None
+        if not terms or backend is None:
+            return super().filter_queryset(request, queryset, view)
+        queryset = backend.search(index, queryset, terms)
+        return queryset.order_by(RANK, '-pk')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = filters.OrderingFilter().get_ordering(request, queryset, view)
+        if not ordering and RANK in queryset.query.annotations:
+            return (RANK, '-id')
+        return ordering
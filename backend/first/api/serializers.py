@@ -1,9 +1,78 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import F
+from django.utils import timezone
 from .models import (
     UserProfile, WaterZone, WaterUsage, Alert, Report,
     SystemSettings, ActivityLog, Compliance
 )
+from . import hierarchy
+
+
+def _datetime(value):
+    """Format a datetime the way serializers.DateTimeField does"""
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+def _full_name(first_name, last_name):
+    """Match User.get_full_name() for values() rows"""
+    if first_name is None and last_name is None:
+        return None
+    return f"{first_name} {last_name}".strip()
+
+
+class ValuesSerializer:
+    """Read-only fast path that builds list output from ``QuerySet.values()``
+
+    ``fields`` lists output keys; a ``(key, lookup)`` pair fetches the key
+    through a join. ``converters`` maps keys to functions applied to the
+    value, and ``computed`` maps keys to functions of the whole row (used for
+    display names). Output must match the model serializer it shadows.
+    """
+
+    def __init__(self, fields, converters=None, computed=None, extra=()):
+        self.fields = fields
+        self.converters = converters or {}
+        self.computed = computed or {}
+        self.extra = extra
+        self.keys = [field if isinstance(field, str) else field[0] for field in fields]
+
+    def values(self, queryset):
+        names = [field for field in self.fields if isinstance(field, str) and field not in self.computed]
+        names.extend(self.extra)
+        # Keep annotations (e.g. the search rank) for the cursor paginator
+        names.extend(name for name in queryset.query.annotations if name not in names)
+        aliases = {field[0]: F(field[1]) for field in self.fields if not isinstance(field, str)}
+        return queryset.values(*names, **aliases)
+
+    def to_representation(self, rows):
+        plan = []
+        for key in self.keys:
+            if key in self.computed:
+                plan.append((key, self.computed[key], True))
+            else:
+                plan.append((key, self.converters.get(key), False))
+        data = []
+        for row in rows:
+            item = {}
+            for key, func, whole_row in plan:
+                if whole_row:
+                    item[key] = func(row)
+                elif func is not None:
+                    item[key] = func(row[key])
+                else:
+                    item[key] = row[key]
+            data.append(item)
+        return data
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -28,11 +97,22 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 
 class WaterZoneSerializer(serializers.ModelSerializer):
+    depth = serializers.SerializerMethodField()
+
     class Meta:
         model = WaterZone
-        fields = ['id', 'name', 'description', 'zone_type', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'zone_type', 'parent', 'depth', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def get_depth(self, obj):
+        return hierarchy.depth(obj.path)
+
+    def validate_parent(self, value):
+        error = hierarchy.check_parent(self.instance, value)
+        if error:
+            raise serializers.ValidationError(error)
+        return value
+
 
 class WaterUsageSerializer(serializers.ModelSerializer):
     zone_name = serializers.CharField(source='zone.name', read_only=True)
@@ -44,20 +124,73 @@ class WaterUsageSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+WATER_USAGE_VALUES = ValuesSerializer(
+    ['id', 'zone', ('zone_name', 'zone__name'), 'usage_liters', 'measurement_time',
+     'is_peak', 'quality_percentage', 'created_at'],
+    converters={'measurement_time': _datetime, 'created_at': _datetime},
+)
+
+
+def _model_validators(model, name):
+    """Validators of a model field, so plain serializers check the same bounds as ModelSerializers"""
+    return model._meta.get_field(name).validators
+
+
+class WaterUsageIngestSerializer(serializers.Serializer):
+    """Per-row validation for bulk ingest (zones are checked once per batch)
+
+    Field bounds come from the WaterUsage model, as they do for
+    WaterUsageSerializer, so POST /usage/ and /usage/bulk/ accept the same rows.
+    """
+    zone = serializers.IntegerField()
+    usage_liters = serializers.FloatField(validators=_model_validators(WaterUsage, 'usage_liters'))
+    measurement_time = serializers.DateTimeField()
+    is_peak = serializers.BooleanField(default=False)
+    quality_percentage = serializers.IntegerField(
+        default=100, validators=_model_validators(WaterUsage, 'quality_percentage')
+    )
+
+
 class AlertSerializer(serializers.ModelSerializer):
     zone_name = serializers.CharField(source='zone.name', read_only=True, allow_null=True)
     alert_type_display = serializers.CharField(source='get_alert_type_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     resolved_by_name = serializers.CharField(source='resolved_by.get_full_name', read_only=True, allow_null=True)
+    acknowledged_by_name = serializers.CharField(source='acknowledged_by.get_full_name', read_only=True, allow_null=True)
 
     class Meta:
         model = Alert
         fields = [
             'id', 'zone', 'zone_name', 'title', 'message', 'alert_type',
             'alert_type_display', 'status', 'status_display', 'severity',
-            'created_at', 'resolved_at', 'resolved_by', 'resolved_by_name'
+            'created_at', 'resolved_at', 'resolved_by', 'resolved_by_name',
+            'acknowledged_at', 'acknowledged_by', 'acknowledged_by_name'
         ]
-        read_only_fields = ['id', 'created_at', 'resolved_at', 'resolved_by']
+        read_only_fields = [
+            'id', 'created_at', 'resolved_at', 'resolved_by', 'acknowledged_at', 'acknowledged_by'
+        ]
+
+
+_ALERT_TYPES = dict(Alert._meta.get_field('alert_type').choices)
+_ALERT_STATUSES = dict(Alert._meta.get_field('status').choices)
+
+ALERT_VALUES = ValuesSerializer(
+    ['id', 'zone', ('zone_name', 'zone__name'), 'title', 'message', 'alert_type',
+     'alert_type_display', 'status', 'status_display', 'severity',
+     'created_at', 'resolved_at', 'resolved_by', 'resolved_by_name',
+     'acknowledged_at', 'acknowledged_by', 'acknowledged_by_name'],
+    converters={'created_at': _datetime, 'resolved_at': _datetime, 'acknowledged_at': _datetime},
+    computed={
+        'alert_type_display': lambda row: _ALERT_TYPES.get(row['alert_type'], row['alert_type']),
+        'status_display': lambda row: _ALERT_STATUSES.get(row['status'], row['status']),
+        'resolved_by_name': lambda row: _full_name(row['resolved_by__first_name'], row['resolved_by__last_name']),
+        'acknowledged_by_name': lambda row: _full_name(
+            row['acknowledged_by__first_name'], row['acknowledged_by__last_name']
+        ),
+    },
+    extra=('resolved_by__first_name', 'resolved_by__last_name',
+           'acknowledged_by__first_name', 'acknowledged_by__last_name'),
+)
 
 
 class ReportSerializer(serializers.ModelSerializer):
@@ -74,6 +207,21 @@ class ReportSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'generated_by', 'generated_by_name']
 
 
+_REPORT_TYPES = dict(Report.REPORT_TYPE_CHOICES)
+
+REPORT_VALUES = ValuesSerializer(
+    ['id', 'title', 'report_type', 'report_type_display', 'description',
+     'generated_by', 'generated_by_name', 'start_date', 'end_date',
+     'total_usage', 'efficiency_rate', 'data', 'created_at'],
+    converters={'start_date': _date, 'end_date': _date, 'created_at': _datetime},
+    computed={
+        'report_type_display': lambda row: _REPORT_TYPES.get(row['report_type'], row['report_type']),
+        'generated_by_name': lambda row: _full_name(row['generated_by__first_name'], row['generated_by__last_name']),
+    },
+    extra=('generated_by__first_name', 'generated_by__last_name'),
+)
+
+
 class SystemSettingsSerializer(serializers.ModelSerializer):
     class Meta:
         model = SystemSettings
@@ -94,6 +242,16 @@ class ActivityLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'timestamp']
 
 
+ACTIVITY_LOG_VALUES = ValuesSerializer(
+    ['id', 'user', 'user_name', 'action', 'description', 'timestamp', 'ip_address'],
+    converters={'timestamp': _datetime},
+    computed={
+        'user_name': lambda row: _full_name(row['user__first_name'], row['user__last_name']),
+    },
+    extra=('user__first_name', 'user__last_name'),
+)
+
+
 class ComplianceSerializer(serializers.ModelSerializer):
     status_display = serializers.CharField(source='get_status_display', read_only=True)
 
@@ -0,0 +1,178 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import WaterUsage, HourlyUsageRollup, DailyUsageRollup
+from .rollups import raw_retention_cutoff
+from .timeseries import truncate
+
+METHODS = ('lttb', 'minmax')
+# Raw readings are loaded only while a zone's range holds at most this many per point
+RAW_ROWS_PER_POINT = 2
+DEFAULT_READING_INTERVAL_MINUTES = 15
+
+
+# Downsampling (indices into the input arrays)
+
+def lttb(x, y, threshold):
+    """Indices of ``threshold`` points picked by Largest-Triangle-Three-Buckets
+
+    The first and last points are kept; every bucket in between contributes
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket, which preserves the visual shape.
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # threshold - 2 buckets over points 1 .. count - 2; at least one point each
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[:count - 1], edges[:-1]) / sizes
+    mean_y = np.add.reduceat(y[:count - 1], edges[:-1]) / sizes
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        px, py = x[previous], y[previous]
+        area = np.abs((px - next_x[bucket]) * (y[start:end] - py) - (px - x[start:end]) * (next_y[bucket] - py))
+        previous = start + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax(low, high, threshold):
+    """Lowest and highest point of each of ``threshold // 2`` equal-count buckets
+
+    Returns ``(indices, is_high)`` in time order: the value at ``indices[i]``
+    is ``high`` where ``is_high[i]`` else ``low``. Peaks survive any amount
+    of downsampling, which LTTB does not guarantee.
+    """
+    count = len(low)
+    low = np.asarray(low, dtype=float)
+    high = np.asarray(high, dtype=float)
+    buckets = max(1, threshold // 2)
+    if 2 * count <= threshold or (count <= threshold and np.array_equal(low, high)):
+        indices = np.repeat(np.arange(count), 2)
+        is_high = np.tile([False, True], count)
+    else:
+        edges = np.linspace(0, count, buckets + 1).astype(np.int64)
+        bucket = np.repeat(np.arange(buckets), np.diff(edges))
+        # Sorted by bucket, then value: each bucket's extremes sit at its edges
+        lows = np.lexsort((low, bucket))[edges[:-1]]
+        highs = np.lexsort((-high, bucket))[edges[:-1]]
+        indices = np.concatenate([lows, highs])
+        is_high = np.concatenate([np.zeros(buckets, dtype=bool), np.ones(buckets, dtype=bool)])
+    order = np.lexsort((is_high, indices))
+    indices, is_high = indices[order], is_high[order]
+    # The same point picked as both extreme (raw readings) is sent once
+    values = np.where(is_high, high[indices], low[indices])
+    keep = np.ones(len(indices), dtype=bool)
+    keep[1:] = (indices[1:] != indices[:-1]) | (values[1:] != values[:-1])
+    return indices[keep], is_high[keep]
+
+
+# Loading
+
+def reading_interval():
+    minutes = getattr(settings, 'WATER_USAGE_READING_INTERVAL_MINUTES', DEFAULT_READING_INTERVAL_MINUTES)
+    return timedelta(minutes=minutes)
+
+
+def choose_source(start, end, points):
+    """Coarsest store that still has at least ``points`` values per zone in the range
+
+    Raw readings are only used inside the raw retention period and while the
+    range is expected to hold at most ``RAW_ROWS_PER_POINT * points`` of them
+    per zone (one every ``WATER_USAGE_READING_INTERVAL_MINUTES``), so the work
+    per request stays bounded by ``points`` rather than by the length of the
+    range.
+    """
+    span = end - start
+    if span >= timedelta(days=points):
+        return 'daily'
+    cutoff = raw_retention_cutoff()
+    if span > RAW_ROWS_PER_POINT * points * reading_interval() or (cutoff is not None and start < cutoff):
+        return 'hourly'
+    return 'raw'
+
+
+def _epoch_ms(values):
+    return np.array([int(value.timestamp() * 1000) for value in values], dtype=np.int64)
+
+
+def load(zone_ids, start, end, source):
+    """``{zone_id: arrays}`` of one source over ``[start, end)``
+
+    Arrays are ``timestamps`` (epoch ms), ``usage`` (liters per reading;
+    the mean reading for rollups), ``low``/``high`` (the range of readings
+    behind each value) and ``quality``. Zones without data are missing.
+    """
+    if source == 'raw':
+        rows = [
+            (zone_id, measured, usage, usage, usage, quality, 1)
+            for zone_id, measured, usage, quality in WaterUsage.objects.filter(
+                zone_id__in=zone_ids, measurement_time__gte=start, measurement_time__lt=end,
+            ).order_by('zone_id', 'measurement_time').values_list(
+                'zone_id', 'measurement_time', 'usage_liters', 'quality_percentage',
+            )
+        ]
+    else:
+        if source == 'hourly':
+            queryset = HourlyUsageRollup.objects.filter(bucket__gte=truncate(start, 'hour'), bucket__lt=end)
+        else:
+            queryset = DailyUsageRollup.objects.filter(
+                bucket__gte=timezone.localtime(start).date(),
+                bucket__lte=timezone.localtime(end - timedelta(microseconds=1)).date(),
+            )
+        rows = list(
+            queryset.filter(zone_id__in=zone_ids, reading_count__gt=0)
+            .order_by('zone_id', 'bucket')
+            .values_list('zone_id', 'bucket', 'total_liters', 'min_liters', 'max_liters', 'quality_sum',
+                         'reading_count')
+        )
+        if source == 'daily':
+            rows = [
+                (row[0], timezone.make_aware(datetime.combine(row[1], time.min))) + row[2:] for row in rows
+            ]
+    if not rows:
+        return {}
+
+    zone, measured, total, low, high, quality, count = zip(*rows)
+    zone = np.array(zone)
+    count = np.array(count, dtype=float)
+    columns = {
+        'timestamps': _epoch_ms(measured),
+        'usage': np.array(total, dtype=float) / count,
+        'low': np.array(low, dtype=float),
+        'high': np.array(high, dtype=float),
+        'quality': np.array(quality, dtype=float) / count,
+    }
+    starts = np.flatnonzero(np.r_[True, zone[1:] != zone[:-1]])
+    ends = np.r_[starts[1:], len(zone)]
+    return {
+        int(zone[first]): {name: values[first:last] for name, values in columns.items()}
+        for first, last in zip(starts, ends)
+    }
+
+
+def downsample(arrays, points, method):
+    """Parallel ``timestamps``/``usage``/``quality`` arrays of at most ``points`` points"""
+    if method == 'minmax':
+        indices, is_high = minmax(arrays['low'], arrays['high'], points)
+        usage = np.where(is_high, arrays['high'][indices], arrays['low'][indices])
+    else:
+        indices = lttb(arrays['timestamps'], arrays['usage'], points)
+        usage = arrays['usage'][indices]
+    return {
+        'timestamps': arrays['timestamps'][indices],
+        'usage': np.round(usage, 3),
+        'quality': np.round(arrays['quality'][indices], 1),
+    }
@@ -1,7 +1,20 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.dispatch import receiver, Signal
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, WaterZone, WaterUsage, Alert, Report, SystemSettings, ActivityLog
+from . import anomalies, cache, conditional, hierarchy, live, rollups, search
+
+# Sent after readings are written in bulk (bulk_create skips post_save).
+# Receivers get ``readings``: the list of created WaterUsage instances.
+usage_ingested = Signal()
+
+# Sent after alerts are raised in bulk. Receivers get ``alerts``: the
+# list of created Alert instances.
+alerts_created = Signal()
+
+# Sent after the activity log writer inserts a batch. Receivers get
+# ``entries``: the list of created ActivityLog instances.
+activity_logged = Signal()
 
 
 @receiver(post_save, sender=User)
@@ -13,3 +26,206 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         # Check if profile exists, if not create it
         if not hasattr(instance, 'profile'):
             UserProfile.objects.create(user=instance)
+
+
+@receiver(usage_ingested)
+def rollup_ingested_usage(sender, readings, **kwargs):
+    """Fold bulk-ingested readings into the usage rollups"""
+    rollups.apply_readings(readings)
+
+
+@receiver(usage_ingested)
+def score_ingested_usage(sender, readings, **kwargs):
+    """Update per-zone anomaly statistics with bulk-ingested readings"""
+    anomalies.process_readings(readings)
+
+
+@receiver(pre_save, sender=WaterUsage)
+def remember_usage_bucket(sender, instance, raw=False, **kwargs):
+    """Remember which bucket an edited reading used to belong to"""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous = (
+        WaterUsage.objects.filter(pk=instance.pk)
+        .only('zone_id', 'measurement_time', 'usage_liters', 'quality_percentage')
+        .first()
+    )
+
+
+@receiver(post_save, sender=WaterUsage)
+def rollup_saved_usage(sender, instance, created, raw=False, **kwargs):
+    """Keep usage rollups in step with single-row writes"""
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if created or previous is None:
+        rollups.apply_readings([instance])
+        return
+    rollups.refresh_reading(previous, instance)
+
+
+@receiver(post_save, sender=WaterUsage)
+def score_saved_usage(sender, instance, created, raw=False, **kwargs):
+    """Score new single readings against their zone's anomaly statistics
+
+    Edits and deletes are not replayed: the online statistics only move
+    forward, like the readings stream they summarise.
+    """
+    if created and not raw:
+        anomalies.process_readings([instance])
+
+
+@receiver(post_delete, sender=WaterUsage)
+def rollup_deleted_usage(sender, instance, **kwargs):
+    """Drop a deleted reading from the usage rollups"""
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is not WaterUsage:
+        # Cascaded from a zone delete; its rollups are cascaded away as well
+        return
+    rollups.refresh_reading(instance)
+
+
+@receiver(usage_ingested)
+@receiver(post_save, sender=WaterUsage)
+@receiver(post_delete, sender=WaterUsage)
+def invalidate_usage_cache(sender, **kwargs):
+    """Invalidate cached dashboard data derived from usage readings"""
+    cache.invalidate(cache.USAGE)
+
+
+@receiver(post_save, sender=WaterUsage)
+@receiver(post_delete, sender=WaterUsage)
+def bump_usage_generation(sender, created=False, raw=False, **kwargs):
+    """Advance the usage watermark on edits and deletes
+
+    Appended readings already move the newest-row watermark, so inserts
+    leave the shared generation row alone.
+    """
+    if not created and not raw:
+        conditional.bump_generation(cache.USAGE)
+
+
+@receiver(alerts_created)
+@receiver(post_save, sender=Alert)
+@receiver(post_delete, sender=Alert)
+def invalidate_alert_cache(sender, **kwargs):
+    """Invalidate cached dashboard data derived from alerts"""
+    cache.invalidate(cache.ALERTS)
+
+
+@receiver(post_delete, sender=Alert)
+def bump_alert_generation(sender, **kwargs):
+    """Advance the alert watermark on deletes, which leave max(updated_at) alone"""
+    conditional.bump_generation(cache.ALERTS)
+
+
+@receiver(pre_save, sender=WaterZone)
+def keep_zone_path(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the stored path; the instance's copy is stale if an ancestor moved since it was loaded"""
+    if raw or instance.pk is None or (update_fields is not None and 'path' not in update_fields):
+        return
+    instance.path = WaterZone.objects.filter(pk=instance.pk).values_list('path', flat=True).first() or ''
+
+
+@receiver(post_save, sender=WaterZone)
+def place_saved_zone(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Set the path of new zones and move the subtree of re-parented ones"""
+    if raw or (update_fields is not None and 'parent' not in update_fields):
+        return
+    hierarchy.place(instance)
+
+
+@receiver(post_save, sender=WaterZone)
+@receiver(post_delete, sender=WaterZone)
+def invalidate_zone_cache(sender, **kwargs):
+    """Invalidate cached dashboard data derived from zones"""
+    cache.invalidate(cache.ZONES)
+
+
+@receiver(post_save, sender=SystemSettings)
+@receiver(post_delete, sender=SystemSettings)
+def invalidate_settings_cache(sender, **kwargs):
+    """Change the validators of conditional GETs on system settings"""
+    cache.invalidate(cache.SETTINGS)
+
+
+@receiver(usage_ingested)
+def publish_ingested_usage(sender, readings, **kwargs):
+    """Push per-zone aggregates of bulk-ingested readings to the live feed"""
+    live.publish(*live.usage_events(readings))
+
+
+@receiver(post_save, sender=WaterUsage)
+def publish_saved_usage(sender, instance, created, raw=False, **kwargs):
+    """Push new single readings to the live feed"""
+    if created and not raw:
+        live.publish(*live.usage_events([instance]))
+
+
+@receiver(alerts_created)
+def publish_created_alerts(sender, alerts, **kwargs):
+    """Push bulk-raised alerts to the live feed"""
+    live.publish(*[live.alert_event(alert, 'created') for alert in alerts])
+
+
+@receiver(post_save, sender=Alert)
+def publish_saved_alert(sender, instance, created, raw=False, **kwargs):
+    """Push alert creation, acknowledgement and resolution to the live feed"""
+    if raw:
+        return
+    if created:
+        event = 'created'
+    elif instance.status == 'active':
+        event = 'updated'
+    else:
+        event = instance.status
+    live.publish(live.alert_event(instance, event))
+
+
+@receiver(post_save, sender=Alert)
+@receiver(post_save, sender=Report)
+@receiver(post_save, sender=ActivityLog)
+def index_saved_text(sender, instance, using, update_fields=None, **kwargs):
+    """Keep the search index in step with single-row writes"""
+    index = search.INDEXES[sender]
+    if update_fields is not None and not set(update_fields) & {lookup.split('__')[0] for _, lookup in index.columns}:
+        return
+    search.update_index(sender, [instance.pk], using)
+
+
+@receiver(post_delete, sender=Alert)
+@receiver(post_delete, sender=Report)
+@receiver(post_delete, sender=ActivityLog)
+def unindex_deleted_text(sender, instance, using, **kwargs):
+    """Drop deleted rows from the search index"""
+    search.remove_from_index(sender, [instance.pk], using)
+
+
+@receiver(alerts_created)
+def index_created_alerts(sender, alerts, **kwargs):
+    """Index bulk-raised alerts for search"""
+    search.update_index(Alert, [alert.pk for alert in alerts])
+
+
+@receiver(activity_logged)
+def index_logged_activity(sender, entries, **kwargs):
+    """Index activity log batches for search"""
+    search.update_index(ActivityLog, [entry.pk for entry in entries])
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Remember a user's name before an edit that may change it"""
+    instance._previous_username = None
+    if raw or instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        return
+    instance._previous_username = User.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def reindex_renamed_user_activity(sender, instance, created, **kwargs):
+    """Activity log entries are searchable by user name; follow renames"""
+    previous = getattr(instance, '_previous_username', None)
+    if not created and previous is not None and previous != instance.username:
+        search.update_index(ActivityLog, ActivityLog.objects.filter(user=instance).values_list('pk', flat=True))
@@ -0,0 +1,150 @@
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import numpy as np
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import WaterZone, WaterUsage
+from . import hierarchy
+
+ZONE_TYPES = ('building', 'outdoor', 'irrigation', 'other')
+ZONE_TYPE_WEIGHTS = (0.5, 0.2, 0.2, 0.1)
+
+# Per zone type: mean liters per hour, the daily shape as a base level plus
+# (amplitude, hour, width) bumps, and the weekend factor
+PROFILES = {
+    'building': (400, 0.2, [(1.6, 8.5, 1.2), (0.8, 12.5, 1.0), (1.3, 19.0, 1.5)], 0.6),
+    'outdoor': (150, 0.1, [(1.5, 14.0, 3.0)], 1.3),
+    'irrigation': (600, 0.05, [(3.0, 5.5, 0.7), (2.0, 20.0, 0.7)], 1.0),
+    'other': (200, 0.4, [(1.0, 10.0, 2.5), (0.8, 17.0, 2.5)], 0.8),
+}
+SPIKE_PROBABILITY = 0.002
+PEAK_LEVEL = 1.2
+
+
+def daily_shape(zone_type, hours):
+    """Relative flow at fractional local ``hours``, averaging 1 over a day"""
+    _, base, bumps, _ = PROFILES[zone_type]
+
+    def shape(h):
+        value = np.full_like(h, base, dtype=float)
+        for amplitude, center, width in bumps:
+            # Wrap around midnight so late bumps carry into the early hours
+            distance = np.minimum(np.abs(h - center), 24 - np.abs(h - center))
+            value += amplitude * np.exp(-0.5 * (distance / width) ** 2)
+        return value
+
+    return shape(hours) / shape(np.arange(0, 24, 0.25)).mean()
+
+
+def plan_zones(count, seed, leak_fraction):
+    """Zone types and leaks, decided up front so they do not depend on volume"""
+    rng = np.random.default_rng([seed, 0])
+    types = rng.choice(len(ZONE_TYPES), size=count, p=ZONE_TYPE_WEIGHTS)
+    leaking = rng.random(count) < leak_fraction
+    return [(ZONE_TYPES[zone_type], bool(leak)) for zone_type, leak in zip(types, leaking)]
+
+
+def zone_readings(zone_id, zone_index, zone_type, leaking, start, days, interval_minutes, seed):
+    """Readings of one zone as column arrays plus its leak start (or None)
+
+    Flow follows the zone type's daily shape and weekday/weekend level with
+    multiplicative noise and rare spikes. A leaking zone gets a constant
+    extra flow from a random day in the second half of the window, which
+    lifts its night-time minimum the way a real leak does.
+    """
+    rng = np.random.default_rng([seed, zone_index + 1])
+    mean_per_hour, _, _, weekend_factor = PROFILES[zone_type]
+    mean_per_hour *= rng.lognormal(0, 0.35)
+    per_day = 24 * 60 // interval_minutes
+    offsets = np.arange(days * per_day) * interval_minutes
+    day_index = offsets // (24 * 60)
+    hours = (offsets % (24 * 60)) / 60
+
+    weekday = np.array([(start + timedelta(days=day)).weekday() for day in range(days)])
+    level = np.where(weekday[day_index] >= 5, weekend_factor, 1.0)
+    shape = daily_shape(zone_type, hours)
+    liters = mean_per_hour * interval_minutes / 60 * shape * level * rng.lognormal(0, 0.15, size=len(offsets))
+    spikes = rng.random(len(offsets)) < SPIKE_PROBABILITY
+    liters[spikes] *= rng.uniform(3, 8, size=int(spikes.sum()))
+    quality = np.clip(rng.normal(96, 2, size=len(offsets)), 80, 100)
+
+    leak_start = None
+    if leaking:
+        leak_day = int(rng.integers(days // 2, max(days // 2 + 1, days - 7)))
+        leak_rate = mean_per_hour * rng.uniform(0.05, 0.15) * interval_minutes / 60
+        leaking_rows = day_index >= leak_day
+        liters[leaking_rows] += leak_rate
+        quality[leaking_rows] -= 3
+        leak_start = start + timedelta(days=leak_day)
+
+    return {
+        'zone_id': zone_id,
+        'offsets': offsets,
+        'liters': np.round(liters, 2),
+        'is_peak': (shape * level >= PEAK_LEVEL) | spikes,
+        'quality': quality.astype(int),
+    }, leak_start
+
+
+def iter_readings(series, start):
+    """Unsaved WaterUsage instances for one zone's arrays"""
+    zone_id = series['zone_id']
+    for offset, liters, is_peak, quality in zip(
+        series['offsets'].tolist(), series['liters'].tolist(), series['is_peak'].tolist(), series['quality'].tolist(),
+    ):
+        yield WaterUsage(
+            zone_id=zone_id, usage_liters=liters, measurement_time=start + timedelta(minutes=offset),
+            is_peak=is_peak, quality_percentage=quality,
+        )
+
+
+def insert_raw(series, start, batch_size):
+    """Insert one zone's arrays with ``executemany``, skipping model instances
+
+    Nothing is sent to ``usage_ingested`` receivers; callers rebuild the
+    rollups afterwards. Returns the number of rows written.
+    """
+    using = router.db_for_write(WaterUsage)
+    connection = connections[using]
+    ops = connection.ops
+    fields = ['zone', 'usage_liters', 'measurement_time', 'is_peak', 'quality_percentage', 'created_at']
+    columns = ', '.join(ops.quote_name(WaterUsage._meta.get_field(name).column) for name in fields)
+    sql = (
+        f'INSERT INTO {ops.quote_name(WaterUsage._meta.db_table)} ({columns}) '
+        f'VALUES ({", ".join(["%s"] * len(fields))})'
+    )
+    zone_id = series['zone_id']
+    created = ops.adapt_datetimefield_value(timezone.now())
+    rows = zip(
+        series['offsets'].tolist(), series['liters'].tolist(), series['is_peak'].tolist(), series['quality'].tolist(),
+    )
+    written = 0
+    while True:
+        batch = [
+            (zone_id, liters, ops.adapt_datetimefield_value(start + timedelta(minutes=offset)), is_peak, quality,
+             created)
+            for offset, liters, is_peak, quality in islice(rows, batch_size)
+        ]
+        if not batch:
+            return written
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        written += len(batch)
+
+
+def window_start(end, days):
+    """Local midnight ``days`` before the ``end`` date"""
+    return timezone.make_aware(datetime.combine(end - timedelta(days=days), time.min))
+
+
+def create_zones(prefix, plan):
+    zones = WaterZone.objects.bulk_create([
+        WaterZone(name=f'{prefix} {index + 1:04d}', zone_type=zone_type, description='Synthetic zone')
+        for index, (zone_type, _) in enumerate(plan)
+    ])
+    ids = [zone.id for zone in zones]
+    # bulk_create skips the save signals that set paths
+    WaterZone.objects.filter(id__in=ids).update(path=hierarchy.root_path())
+    return ids
@@ -0,0 +1,19 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Run the suite with the activity log writer off
+
+    Its background thread inserts entries outside the test transactions, for
+    users and rows that are rolled back. ActivityLogTests turns it back on.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.activity_log = override_settings(ACTIVITY_LOG_ENABLED=False)
+        self.activity_log.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.activity_log.disable()
+        super().teardown_test_environment(**kwargs)
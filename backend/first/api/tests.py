@@ -1,3 +1,1286 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import warnings
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+import orjson
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F, Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from .models import (
+    WaterZone, WaterUsage, Alert, Report, SystemSettings, ActivityLog, Compliance,
+    HourlyUsageRollup, DailyUsageRollup, DataGeneration
+)
+from .export import EXPORT_HEADER, csv_stream, iter_rows
+from .leaks import detect_leaks
+from .pagination import KeysetCursorPagination
+from .renderers import ORJSONRenderer
+from .timeseries import truncate
+from . import (
+    activity, alerts, benchmarks, cache, distribution, hierarchy, live, metrics, retention, rollups, series, signals,
+)
+
+
+class ListQueryCountTests(APITestCase):
+    """List endpoints must load related data in a constant number of queries"""
+
+    ROWS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tester', password='secret', first_name='Test', last_name='User')
+        now = timezone.now()
+        zones = [WaterZone.objects.create(name=f'Zone {i}') for i in range(4)]
+        SystemSettings.objects.create(organization_email='a@example.com', api_endpoint='http://localhost/')
+        for i in range(cls.ROWS):
+            User.objects.create_user(f'user{i}')
+            zone = zones[i % len(zones)]
+            WaterUsage.objects.create(zone=zone, usage_liters=i, measurement_time=now - timedelta(hours=i))
+            Alert.objects.create(
+                zone=zone, title=f'Alert {i}', message='m', alert_type='warning',
+                status='resolved' if i % 2 else 'active', resolved_by=cls.user if i % 2 else None,
+            )
+            Report.objects.create(
+                title=f'Report {i}', report_type='monthly', generated_by=cls.user,
+                start_date=date(2026, 1, 1), end_date=date(2026, 1, 31),
+            )
+            ActivityLog.objects.create(user=cls.user, action='login', description='d')
+            Compliance.objects.create(category=f'Category {i}', description='d', status='pass')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_list_endpoints_query_count(self):
+        # Page-number endpoints run COUNT(*) plus the page; keyset ones only the page.
+        # Conditional GET endpoints add one watermark query.
+        budgets = {
+            '/api/users/': 2,
+            '/api/profiles/': 2,
+            '/api/zones/': 3,
+            '/api/usage/': 2,
+            '/api/alerts/': 2,
+            '/api/alerts/active/': 2,
+            '/api/reports/': 2,
+            '/api/reports/by_type/?type=monthly': 2,
+            '/api/settings/': 3,
+            '/api/activity/': 1,
+            '/api/compliance/': 2,
+            '/api/dashboard/activity_log/': 1,
+        }
+        for url, queries in budgets.items():
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_values_fast_path_matches_serializer(self):
+        response = self.client.get('/api/alerts/')
+        resolved = next(row for row in response.json()['results'] if row['resolved_by'])
+        self.assertEqual(resolved['resolved_by_name'], 'Test User')
+        self.assertEqual(resolved['status_display'], 'Resolved')
+        self.assertTrue(resolved['zone_name'].startswith('Zone'))
+
+        response = self.client.get('/api/usage/')
+        row = response.json()['results'][0]
+        reading = WaterUsage.objects.get(pk=row['id'])
+        self.assertEqual(row['zone_name'], reading.zone.name)
+        self.assertTrue(row['measurement_time'].endswith('Z'))
+
+
+class BulkIngestTests(APITestCase):
+    """Bulk ingest reports per-row errors and accepts JSON, NDJSON and CSV"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('ingest'))
+        self.zone = WaterZone.objects.create(name='North')
+        self.when = '2026-03-01T10:00:00Z'
+
+    def test_partial_failure_reports_rows(self):
+        rows = [
+            {'zone': self.zone.id, 'usage_liters': 5, 'measurement_time': self.when},
+            {'zone': self.zone.id, 'usage_liters': -1, 'measurement_time': self.when},
+            {'zone': 999999, 'usage_liters': 5, 'measurement_time': self.when},
+            'not an object',
+            {'zone': self.zone.id, 'usage_liters': 7, 'measurement_time': self.when, 'quality_percentage': 101},
+        ]
+        response = self.client.post('/api/usage/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['received'], data['created'], data['failed']), (5, 1, 4))
+        self.assertEqual([error['row'] for error in data['errors']], [1, 2, 3, 4])
+        self.assertIn('usage_liters', data['errors'][0]['errors'])
+        self.assertIn('zone', data['errors'][1]['errors'])
+        self.assertIn('quality_percentage', data['errors'][3]['errors'])
+        self.assertEqual(HourlyUsageRollup.objects.get(zone=self.zone).total_liters, 5)
+
+    def test_ndjson_and_csv(self):
+        body = (
+            f'{{"zone": {self.zone.id}, "usage_liters": 1.5, "measurement_time": "{self.when}"}}\n'
+            '\n{broken\n'
+        )
+        response = self.client.post('/api/usage/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual((response.status_code, response.json()['created'], response.json()['failed']), (201, 1, 1))
+
+        body = (
+            'zone,usage_liters,measurement_time,quality_percentage\n'
+            f'{self.zone.id},2.5,{self.when},\n'
+            f'{self.zone.id},3.5,{self.when},80\n'
+        )
+        response = self.client.post('/api/usage/bulk/', body, content_type='text/csv')
+        self.assertEqual((response.status_code, response.json()['created']), (201, 2))
+        self.assertEqual(
+            sorted(WaterUsage.objects.values_list('usage_liters', 'quality_percentage')),
+            [(1.5, 100), (2.5, 100), (3.5, 80)],
+        )
+
+    @override_settings(WATER_USAGE_INGEST_MAX_ROWS=2)
+    def test_limits_and_all_invalid(self):
+        row = {'zone': self.zone.id, 'usage_liters': 1, 'measurement_time': self.when}
+        self.assertEqual(self.client.post('/api/usage/bulk/', [row] * 3, format='json').status_code, 413)
+        response = self.client.post('/api/usage/bulk/', [{'zone': self.zone.id}], format='json')
+        self.assertEqual((response.status_code, response.json()['created']), (400, 0))
+        self.assertEqual(self.client.post('/api/usage/bulk/', {'rows': []}, format='json').status_code, 400)
+        self.assertFalse(WaterUsage.objects.exists())
+
+    def test_single_create_uses_same_bounds(self):
+        for field, value in (('usage_liters', -1), ('quality_percentage', 101)):
+            row = {'zone': self.zone.id, 'usage_liters': 1, 'measurement_time': self.when, field: value}
+            response = self.client.post('/api/usage/', row, format='json')
+            self.assertEqual(response.status_code, 400, field)
+            self.assertIn(field, response.json())
+
+
+class UsageTrendTests(APITestCase):
+    """Trend buckets readings per granularity and filters by zone"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('analyst'))
+        self.north = WaterZone.objects.create(name='North')
+        self.south = WaterZone.objects.create(name='South')
+        now = timezone.now()
+        self.this_hour = truncate(now, 'hour')
+        two_days_ago = truncate(now, 'day') - timedelta(days=2) + timedelta(hours=1)
+        for zone, when, liters in (
+            (self.north, self.this_hour, 10), (self.south, self.this_hour, 4), (self.north, two_days_ago, 7),
+        ):
+            WaterUsage.objects.create(zone=zone, usage_liters=liters, measurement_time=when)
+
+    def test_daily_and_zone_filters(self):
+        trend = self.client.get('/api/usage/trend/?days=3').json()
+        self.assertEqual([point['usage'] for point in trend], [7, 0, 14])
+        self.assertEqual(trend[-1]['date'], str(timezone.localdate()))
+
+        trend = self.client.get(f'/api/usage/trend/?days=3&zone={self.south.id}').json()
+        self.assertEqual([point['usage'] for point in trend], [0, 0, 4])
+
+        trend = self.client.get(f'/api/usage/trend/?days=3&zones={self.south.id},{self.north.id}').json()
+        self.assertEqual(
+            [(series['zone'], [point['usage'] for point in series['trend']]) for series in trend],
+            [(self.south.id, [0, 0, 4]), (self.north.id, [7, 0, 10])],
+        )
+
+    def test_hourly_buckets(self):
+        trend = self.client.get('/api/usage/trend/?days=1&granularity=hour').json()
+        self.assertEqual(len(trend), 24)
+        self.assertEqual(trend[-1]['usage'], 14)
+        self.assertEqual(sum(point['usage'] for point in trend), 14)
+
+    def test_invalid_parameters(self):
+        for query in ('granularity=year', 'zone=abc', 'zones=1,x', 'days=0', 'days=93&granularity=hour'):
+            response = self.client.get(f'/api/usage/trend/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('error', response.json())
+
+
+class RollupMaintenanceTests(APITestCase):
+    """Rollups kept up to date on every write match a rebuild from raw readings"""
+
+    def snapshot(self):
+        fields = ('zone_id', 'bucket', 'total_liters', 'min_liters', 'max_liters', 'reading_count', 'quality_sum')
+        return (
+            sorted(HourlyUsageRollup.objects.values_list(*fields)),
+            sorted(DailyUsageRollup.objects.values_list(*fields)),
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_create_update_delete(self):
+        north = WaterZone.objects.create(name='North')
+        south = WaterZone.objects.create(name='South')
+        base = truncate(timezone.now(), 'day') - timedelta(days=1)
+        readings = [
+            WaterUsage.objects.create(zone=north, usage_liters=liters, quality_percentage=90,
+                                      measurement_time=base + timedelta(minutes=minutes))
+            for liters, minutes in ((3, 5), (9, 20), (4, 70), (6, 60 * 25))
+        ]
+        self.assertMatchesRebuild()
+        self.assertEqual(HourlyUsageRollup.objects.get(zone=north, bucket=base).total_liters, 12)
+
+        readings[1].zone = south
+        readings[1].save()
+        self.assertMatchesRebuild()
+
+        readings[0].measurement_time = base + timedelta(hours=5)
+        readings[0].usage_liters = 8
+        readings[0].save()
+        self.assertMatchesRebuild()
+
+        readings[2].delete()
+        readings[3].delete()
+        self.assertMatchesRebuild()
+        self.assertEqual(DailyUsageRollup.objects.filter(zone=north).count(), 1)
+
+
+class ZoneUsageReportTests(APITestCase):
+    """Top zones and the monthly report sum rollups per zone, zones without readings included"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('analyst'))
+        north = WaterZone.objects.create(name='North')
+        south = WaterZone.objects.create(name='South')
+        WaterZone.objects.create(name='Garden', zone_type='irrigation')
+        closed = WaterZone.objects.create(name='Closed', is_active=False)
+        now = timezone.now()
+        january = timezone.make_aware(datetime(2025, 1, 10, 12))
+        for zone, when, liters in (
+            (north, now, 10), (north, now - timedelta(days=2), 5), (south, now - timedelta(hours=1), 5),
+            (south, now - timedelta(days=10), 100), (closed, now, 50),
+            (north, january, 30), (south, january + timedelta(days=20), 10), (closed, january, 60),
+        ):
+            WaterUsage.objects.create(zone=zone, usage_liters=liters, measurement_time=when)
+
+    def test_top_zones(self):
+        response = self.client.get('/api/dashboard/top_zones/')
+        self.assertEqual(response.json(), [
+            {'zone': 'North', 'usage': 15.0}, {'zone': 'South', 'usage': 5.0}, {'zone': 'Garden', 'usage': 0.0},
+        ])
+        response = self.client.get('/api/dashboard/top_zones/?limit=1&days=30')
+        self.assertEqual(response.json(), [{'zone': 'South', 'usage': 105.0}])
+        response = self.client.get('/api/dashboard/top_zones/?zone_type=irrigation')
+        self.assertEqual(response.json(), [{'zone': 'Garden', 'usage': 0.0}])
+        self.assertEqual(self.client.get('/api/dashboard/top_zones/?limit=0').status_code, 400)
+
+    def test_monthly_report(self):
+        report = self.client.get('/api/reports/monthly/?month=2025-01').json()
+        self.assertEqual(report['period'], '2025-01-01 to 2025-01-31')
+        # Inactive zones count towards the total but are left out of the breakdown
+        self.assertEqual(report['total_usage'], 100.0)
+        self.assertEqual(report['zone_breakdown'], [
+            {'zone': 'North', 'usage': 30.0, 'percentage': 30.0},
+            {'zone': 'South', 'usage': 10.0, 'percentage': 10.0},
+            {'zone': 'Garden', 'usage': 0.0, 'percentage': 0.0},
+        ])
+        report = self.client.get('/api/reports/monthly/?month=2024-12').json()
+        self.assertEqual(report['total_usage'], 0)
+        self.assertEqual({zone['usage'] for zone in report['zone_breakdown']}, {0.0})
+        self.assertEqual(self.client.get('/api/reports/monthly/?month=2025-13').status_code, 400)
+
+
+class DashboardCacheTests(APITestCase):
+    """Cached dashboard entries are reused until a write bumps a group they depend on"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('analyst'))
+        cache.get_cache().clear()
+        cache.reset_stats()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return {'calls': self.calls}
+
+    def test_hits_misses_and_generations(self):
+        self.assertEqual(cache.cached('entry', [cache.USAGE], self.compute), {'calls': 1})
+        self.assertEqual(cache.cached('entry', [cache.USAGE], self.compute), {'calls': 1})
+        # Parameters are part of the key
+        self.assertEqual(cache.cached('entry', [cache.USAGE], self.compute, params=(7,)), {'calls': 2})
+
+        self.assertEqual(cache.generations([cache.USAGE, cache.ALERTS]), [0, 0])
+        cache.invalidate(cache.ALERTS)
+        self.assertEqual(cache.cached('entry', [cache.USAGE], self.compute), {'calls': 1})
+        cache.invalidate(cache.USAGE)
+        cache.invalidate(cache.USAGE)
+        self.assertEqual(cache.generations([cache.USAGE, cache.ALERTS]), [2, 1])
+        self.assertEqual(cache.cached('entry', [cache.USAGE], self.compute), {'calls': 3})
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 3))
+        self.assertEqual(stats['hit_rate'], 0.4)
+        self.assertEqual(stats['entries'], {'entry': {'hits': 2, 'misses': 3}})
+
+        with override_settings(DASHBOARD_CACHE_TIMEOUT=0):
+            self.assertEqual(cache.cached('entry', [cache.USAGE], self.compute), {'calls': 4})
+        self.assertEqual(cache.stats()['misses'], 3)
+
+    def test_write_invalidates_dashboard_stats(self):
+        zone = WaterZone.objects.create(name='North')
+        WaterUsage.objects.create(zone=zone, usage_liters=10, measurement_time=timezone.now())
+        self.assertEqual(self.client.get('/api/dashboard/stats/').json()['total_usage'], 10)
+        self.assertEqual(self.client.get('/api/dashboard/stats/').json()['total_usage'], 10)
+
+        WaterUsage.objects.create(zone=zone, usage_liters=5, measurement_time=timezone.now())
+        self.assertEqual(self.client.get('/api/dashboard/stats/').json()['total_usage'], 15)
+
+        stats = self.client.get('/api/dashboard/cache_stats/').json()
+        self.assertEqual(stats['entries']['stats'], {'hits': 1, 'misses': 2})
+
+
+class KeysetPaginationTests(APITestCase):
+    """Cursor pages follow the full ordering and seek the index on deep pages"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('analyst'))
+        zone = WaterZone.objects.create(name='North')
+        now = timezone.now()
+        # Several readings share a measurement_time, so the id breaks ties across pages
+        for minutes in (0, 0, 0, 5, 5, 10, 20, 20):
+            WaterUsage.objects.create(zone=zone, usage_liters=1, measurement_time=now - timedelta(minutes=minutes))
+
+    def test_pages_cover_ordering(self):
+        expected = list(WaterUsage.objects.order_by('-measurement_time', '-id').values_list('id', flat=True))
+        ids, url = [], '/api/usage/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            ids.extend(row['id'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(ids, expected)
+
+        previous = self.client.get(page['previous']).json()
+        self.assertEqual([row['id'] for row in previous['results']], expected[3:6])
+
+    def test_deep_page_query_has_no_null_handling(self):
+        url = self.client.get('/api/usage/?page_size=3').json()['next']
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        sql = next(query['sql'] for query in queries if 'LIMIT 4' in query['sql'])
+        self.assertNotIn('IS NULL', sql)
+        self.assertNotIn('NULLS', sql)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('USING INDEX', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_nullable_field_keeps_nulls_last(self):
+        class ResolvedPagination(KeysetCursorPagination):
+            ordering = ('-resolved_at',)
+            page_size = 2
+
+        now = timezone.now()
+        for resolved_at in (None, now, None, now - timedelta(hours=1), now):
+            Alert.objects.create(title='Leak', message='', alert_type='warning', resolved_at=resolved_at)
+        expected = list(Alert.objects.order_by(F('resolved_at').desc(nulls_last=True), '-id').values_list('id', flat=True))
+
+        factory = APIRequestFactory()
+        ids, url = [], '/api/alerts/'
+        while url:
+            paginator = ResolvedPagination()
+            page = paginator.paginate_queryset(Alert.objects.all(), Request(factory.get(url)))
+            ids.extend(alert.id for alert in page)
+            url = paginator.get_next_link()
+        self.assertEqual(ids, expected)
+
+
+class ExportTests(APITestCase):
+    """Exports stream every matching reading once, in (measurement_time, id) order"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('analyst'))
+        self.north = WaterZone.objects.create(name='North')
+        south = WaterZone.objects.create(name='South')
+        self.when = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+        # Most readings share one measurement_time, so chunks split inside the tie
+        for minutes, zone in ((0, self.north), (0, south), (0, self.north), (0, self.north), (0, south), (5, self.north)):
+            WaterUsage.objects.create(zone=zone, usage_liters=2.5, measurement_time=self.when + timedelta(minutes=minutes))
+        self.expected = list(WaterUsage.objects.order_by('measurement_time', 'id').values_list('id', flat=True))
+
+    def export(self, query):
+        response = self.client.get(f'/api/usage/export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_chunks_split_on_tied_times(self):
+        for chunk_size in (1, 2, 4, 6, 100):
+            with self.subTest(chunk_size=chunk_size):
+                rows = list(iter_rows(WaterUsage.objects.all(), chunk_size=chunk_size))
+                self.assertEqual([row[0] for row in rows], self.expected)
+
+    def test_csv(self):
+        response, body = self.export(f'output=csv&zone={self.north.id}')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(body.decode().splitlines()))
+        self.assertEqual(rows[0], EXPORT_HEADER)
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][:5], [str(self.expected[0]), str(self.north.id), 'North', '2.5', self.when.isoformat()])
+        # Batches are concatenated without repeating the header
+        self.assertEqual(b''.join(csv_stream(iter_rows(WaterUsage.objects.all()), batch=2)), self.export('')[1])
+
+    def test_ndjson(self):
+        response, body = self.export('output=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([record['id'] for record in records], self.expected)
+        self.assertEqual(set(records[0]), set(EXPORT_HEADER))
+        self.assertEqual(records[-1]['measurement_time'], (self.when + timedelta(minutes=5)).isoformat())
+
+    def test_gzip_round_trip(self):
+        for output in ('csv', 'ndjson'):
+            with self.subTest(output=output):
+                response, body = self.export(f'output={output}&compress=gzip')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(body), self.export(f'output={output}')[1])
+
+    def test_invalid_parameters(self):
+        for query in ('output=xml', 'zone=abc', 'start=yesterday'):
+            self.assertEqual(self.client.get(f'/api/usage/export/?{query}').status_code, 400, query)
+
+
+class MetricsTests(APITestCase):
+    """/api/metrics/ is restricted and reports per-route latency and query counts"""
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def test_access(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.client.force_login(User.objects.create_user('analyst'))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+        self.client.logout()
+
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_exposition(self):
+        self.client.force_authenticate(User.objects.create_user('analyst'))
+        WaterZone.objects.create(name='North')
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/zones/').status_code, 200)
+        # Later requests reset the query log
+        per_request = len(queries)
+        self.client.get('/api/zones/')
+
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        lines = response.content.decode().splitlines()
+        labels = '{route="waterzone-list",method="GET"}'
+        self.assertIn('# TYPE http_request_duration_seconds histogram', lines)
+        self.assertIn(f'http_request_duration_seconds_count{labels} 2', lines)
+        self.assertIn('http_request_duration_seconds_bucket{route="waterzone-list",method="GET",le="+Inf"} 2', lines)
+        self.assertIn(f'http_request_db_queries_count{labels} 2', lines)
+        self.assertIn('http_responses_total{route="waterzone-list",method="GET",status="200"} 2', lines)
+        self.assertIn(f'http_request_db_queries_sum{labels} {float(2 * per_request)!r}', lines)
+
+
+@override_settings(WATER_USAGE_RAW_RETENTION_DAYS=30)
+class RetentionTests(APITestCase):
+    """Rollups before the retention cutoff survive rebuilds and edits once raw readings are purged"""
+
+    def setUp(self):
+        self.zone = WaterZone.objects.create(name='North')
+        self.old_hour = truncate(timezone.now() - timedelta(days=40), 'hour')
+        self.recent = timezone.now() - timedelta(days=1)
+        for when, liters in ((self.old_hour + timedelta(minutes=10), 5), (self.old_hour + timedelta(minutes=20), 7),
+                             (self.recent, 3)):
+            WaterUsage.objects.create(zone=self.zone, usage_liters=liters, quality_percentage=90, measurement_time=when)
+        self.assertEqual(retention.purge_raw(rollups.raw_retention_cutoff()), 2)
+
+    def old_rollup(self):
+        row = HourlyUsageRollup.objects.filter(zone=self.zone, bucket=self.old_hour).first()
+        return row and (row.total_liters, row.reading_count, row.quality_sum)
+
+    def old_day_total(self):
+        day = timezone.localtime(self.old_hour).date()
+        return DailyUsageRollup.objects.get(zone=self.zone, bucket=day).total_liters
+
+    def test_rebuild_keeps_purged_history(self):
+        self.assertEqual(self.old_rollup(), (12, 2, 180))
+        rollups.rebuild()
+        rollups.rebuild(start=self.old_hour - timedelta(days=1), end=self.recent + timedelta(hours=1))
+        call_command('rebuild_usage_rollups', stdout=StringIO())
+        self.assertEqual(self.old_rollup(), (12, 2, 180))
+        self.assertEqual(self.old_day_total(), 12)
+        self.assertEqual(rollups.window_totals(self.recent - timedelta(hours=1))['total'], 3)
+
+        rollups.rebuild(include_purged=True)
+        self.assertIsNone(self.old_rollup())
+
+    def test_edits_before_cutoff_apply_deltas(self):
+        late = WaterUsage.objects.create(zone=self.zone, usage_liters=8, quality_percentage=50,
+                                         measurement_time=self.old_hour + timedelta(minutes=30))
+        self.assertEqual(self.old_rollup(), (20, 3, 230))
+        late.usage_liters = 10
+        late.save()
+        self.assertEqual(self.old_rollup(), (22, 3, 230))
+        self.assertEqual(self.old_day_total(), 22)
+
+        # Moved into the retained range: taken out of the old hour, recomputed in the new one
+        late.measurement_time = self.recent
+        late.save()
+        self.assertEqual(self.old_rollup(), (12, 2, 180))
+        self.assertEqual(rollups.window_totals(self.recent - timedelta(hours=1))['total'], 13)
+
+        late.measurement_time = self.old_hour
+        late.save()
+        late.delete()
+        self.assertEqual(self.old_rollup(), (12, 2, 180))
+        self.assertEqual(self.old_day_total(), 12)
+        self.assertEqual(rollups.window_totals(self.recent - timedelta(hours=1))['total'], 3)
+
+    def test_interrupted_purge_resumes_without_losing_history(self):
+        hour = self.old_hour + timedelta(days=5)
+        for minutes, liters in ((10, 4), (20, 6)):
+            WaterUsage.objects.create(zone=self.zone, usage_liters=liters, quality_percentage=90,
+                                      measurement_time=hour + timedelta(minutes=minutes))
+        delete_ids = retention._delete_ids
+        calls = []
+
+        def interrupted(ids):
+            calls.append(ids)
+            if len(calls) > 1:
+                raise KeyboardInterrupt
+            return delete_ids(ids)
+
+        with mock.patch.object(retention, '_delete_ids', interrupted), self.assertRaises(KeyboardInterrupt):
+            retention.purge_raw(rollups.raw_retention_cutoff(), batch_size=1)
+        # The day's first batch was rolled back with the rest of it
+        self.assertEqual(WaterUsage.objects.filter(measurement_time__lt=self.recent).count(), 2)
+
+        self.assertEqual(retention.purge_raw(rollups.raw_retention_cutoff(), batch_size=1), 2)
+        row = HourlyUsageRollup.objects.get(zone=self.zone, bucket=hour)
+        self.assertEqual((row.total_liters, row.reading_count), (10, 2))
+        self.assertEqual(self.old_rollup(), (12, 2, 180))
+
+    def test_window_totals_across_cutoff(self):
+        # The edge before the cutoff is widened to the whole hour held in the rollups
+        totals = rollups.window_totals(self.old_hour + timedelta(minutes=15))
+        self.assertEqual((totals['total'], totals['count'], totals['peak'], totals['low']), (15, 3, 7, 3))
+        self.assertEqual(rollups.window_totals(self.old_hour, self.recent)['total'], 12)
+        by_zone = rollups.window_totals(self.old_hour - timedelta(days=1), by_zone=True)
+        self.assertEqual(by_zone[self.zone.id]['total'], 15)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'the replica is a copy of the SQLite test database')
+class ReplicaRoutingTests(APITestCase):
+    """Analytical reads go to the replica while authentication stays on the primary"""
+
+    @classmethod
+    def setUpClass(cls):
+        # A copy of the migrated, still empty test database: a replica that
+        # has not caught up with any rows yet
+        cls.replica_file = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+        primary = connections['default']
+        primary.ensure_connection()
+        target = sqlite3.connect(cls.replica_file)
+        primary.connection.backup(target)
+        target.close()
+        replica = type(primary)({**primary.settings_dict, 'NAME': cls.replica_file}, alias='replica')
+        connections['replica'] = replica
+        # The router only needs to see the alias; DATABASES overrides warn
+        cls.replica_settings = override_settings(DATABASES={**connections.settings, 'replica': replica.settings_dict})
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            cls.replica_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            cls.replica_settings.disable()
+        connections['replica'].close()
+        del connections['replica']
+        os.remove(cls.replica_file)
+
+    def setUp(self):
+        User.objects.create_user('analyst', password='secret')
+        WaterZone.objects.create(name='North')
+
+    def test_auth_reads_primary(self):
+        with self.subTest('basic'):
+            self.client.credentials(HTTP_AUTHORIZATION='Basic ' + base64.b64encode(b'analyst:secret').decode())
+            response = self.client.get('/api/dashboard/stats/')
+            self.assertEqual(response.status_code, 200)
+            # The zone only exists on the primary
+            self.assertEqual(response.json()['total_zones'], 0)
+            self.client.credentials()
+        with self.subTest('session'):
+            self.client.login(username='analyst', password='secret')
+            self.assertEqual(self.client.get('/api/dashboard/stats/').json()['total_zones'], 0)
+            # Not a replica action
+            self.assertEqual(len(self.client.get('/api/zones/').json()['results']), 1)
+
+
+class LeakDetectionTests(APITestCase):
+    """Leak detection flags rising night flow and drifting baselines"""
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.steady, self.leaking, self.drifting = (
+            WaterZone.objects.create(name=name) for name in ('Steady', 'Leaking', 'Drifting')
+        )
+        hourly, daily = [], []
+        for offset in range(30):
+            day = today - timedelta(days=29 - offset)
+            for zone in (self.steady, self.leaking, self.drifting):
+                night = 20.0 if zone == self.leaking and offset >= 23 else 5.0
+                total = 1000.0 + (20 * offset if zone == self.drifting else 0)
+                daily.append(DailyUsageRollup(zone=zone, bucket=day, total_liters=total, reading_count=24))
+                for hour in (2, 3, 4):
+                    hourly.append(HourlyUsageRollup(
+                        zone=zone, bucket=timezone.make_aware(datetime.combine(day, time(hour))),
+                        total_liters=night, reading_count=1,
+                    ))
+        DailyUsageRollup.objects.bulk_create(daily)
+        HourlyUsageRollup.objects.bulk_create(hourly)
+
+    def test_detect_leaks(self):
+        report = detect_leaks(days=30, recent_days=7)
+        self.assertEqual(report.report_type, 'leak_detection')
+        suspected = {item['zone']: item for item in report.data['suspected']}
+        self.assertEqual(set(suspected), {self.leaking.id, self.drifting.id})
+        self.assertEqual(suspected[self.leaking.id]['checks'], ['minimum_night_flow'])
+        self.assertEqual(suspected[self.leaking.id]['evidence']['recent_night_flow'], 20.0)
+        self.assertEqual(suspected[self.drifting.id]['checks'], ['baseline_drift'])
+        self.assertEqual(Alert.objects.filter(status='active').count(), 2)
+
+        # Zones that already have an active leak alert are not alerted twice
+        detect_leaks(days=30, recent_days=7)
+        self.assertEqual(Alert.objects.count(), 2)
+
+
+class AnomalyDetectionTests(APITestCase):
+    """New readings are scored against per-zone online statistics"""
+
+    def test_outliers_raise_alerts(self):
+        zone = WaterZone.objects.create(name='Main')
+        start = timezone.now() - timedelta(days=1)
+        for i in range(60):
+            WaterUsage.objects.create(
+                zone=zone, usage_liters=100 + (i % 5), measurement_time=start + timedelta(minutes=10 * i)
+            )
+        self.assertFalse(Alert.objects.exists())
+        state = zone.anomaly_state
+        self.assertEqual(state.reading_count, 60)
+        self.assertAlmostEqual(state.ewma_mean, 102, delta=1)
+
+        WaterUsage.objects.create(zone=zone, usage_liters=400, measurement_time=start + timedelta(hours=12))
+        alert = Alert.objects.get()
+        self.assertEqual(alert.zone, zone)
+        self.assertEqual(alert.severity, 5)
+        self.assertIn('above', alert.message)
+
+        # Within the cooldown no second alert is raised
+        WaterUsage.objects.create(zone=zone, usage_liters=400, measurement_time=start + timedelta(hours=12, minutes=5))
+        self.assertEqual(Alert.objects.count(), 1)
+
+
+class AlertBulkOperationTests(APITestCase):
+    """Bulk alert updates and counts run a constant number of queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('operator', first_name='On', last_name='Call')
+        self.client.force_authenticate(self.user)
+        self.zone = WaterZone.objects.create(name='North')
+        other = WaterZone.objects.create(name='South')
+        self.alerts = [
+            Alert.objects.create(
+                zone=self.zone if i < 6 else other, title=f'Alert {i}', message='m',
+                alert_type='error' if i % 2 else 'warning', severity=i % 5 + 1,
+            )
+            for i in range(10)
+        ]
+
+    def test_bulk_acknowledge_and_resolve(self):
+        ids = [alert.id for alert in self.alerts[:3]]
+        # The UPDATE, then one grouped count per zone for the live feed
+        with self.assertNumQueries(2):
+            updated = alerts.acknowledge(Alert.objects.filter(id__in=ids), self.user)
+        self.assertEqual(updated, 3)
+
+        response = self.client.post('/api/alerts/bulk_resolve/', {'zone': self.zone.id}, format='json')
+        self.assertEqual(response.json(), {'updated': 6})
+        resolved = Alert.objects.get(pk=ids[0])
+        self.assertEqual((resolved.status, resolved.resolved_by), ('resolved', self.user))
+        self.assertEqual(resolved.acknowledged_by, self.user)
+
+        response = self.client.post('/api/alerts/bulk_acknowledge/', {'ids': [self.alerts[9].id]}, format='json')
+        self.assertEqual(response.json(), {'updated': 1})
+        response = self.client.post('/api/alerts/bulk_resolve/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_counts_single_query(self):
+        Alert.objects.filter(pk=self.alerts[0].pk).update(status='resolved')
+        with self.assertNumQueries(1):
+            counts = alerts.alert_counts()
+        self.assertEqual((counts['active'], counts['resolved'], counts['total']), (9, 1, 10))
+        self.assertEqual(counts['by_type'], {'warning': 5, 'error': 5, 'info': 0})
+        self.assertEqual(counts['by_severity'], {str(severity): 2 for severity in range(1, 6)})
+
+        # Bulk updates bypass post_save, so the cached counts must be invalidated explicitly
+        self.assertEqual(self.client.get('/api/alerts/count/').json()['active'], 9)
+        self.client.post('/api/alerts/bulk_acknowledge/', {'alert_type': 'error'}, format='json')
+        counts = self.client.get('/api/alerts/count/').json()
+        self.assertEqual((counts['active'], counts['acknowledged']), (4, 5))
+
+
+class RecordingBroker:
+    """Stand-in broker that keeps published events in memory"""
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, event):
+        self.events.append(event)
+
+
+class LiveFeedTests(APITestCase):
+    """Writes fan out to the live feed after commit, filtered by zone"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('viewer')
+        self.zone = WaterZone.objects.create(name='East')
+        self.other = WaterZone.objects.create(name='West')
+
+    @override_settings(LIVE_FEED_BROKER='api.tests.RecordingBroker')
+    def test_writes_publish_events(self):
+        broker = live.get_broker()
+        now = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            WaterUsage.objects.create(zone=self.zone, usage_liters=5, measurement_time=now)
+            alert = Alert.objects.create(zone=self.zone, title='Burst', message='m', alert_type='error')
+        with self.captureOnCommitCallbacks(execute=True):
+            alerts.resolve(Alert.objects.filter(pk=alert.pk), self.user)
+
+        usage, created, resolved = broker.events
+        self.assertEqual((usage['type'], usage['zone'], usage['readings']), ('usage', self.zone.id, 1))
+        self.assertEqual((created['event'], created['alert']), ('created', alert.id))
+        self.assertEqual((resolved['event'], resolved['zone'], resolved['count']), ('bulk_resolved', self.zone.id, 1))
+
+    @override_settings(LIVE_FEED_BROKER='api.tests.RecordingBroker')
+    def test_bulk_updates_publish_per_zone(self):
+        broker = live.get_broker()
+        for zone in (self.zone, self.zone, self.other, None):
+            Alert.objects.create(zone=zone, title='Burst', message='m', alert_type='error')
+        broker.events.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            alerts.acknowledge(Alert.objects.exclude(zone=self.other), self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            alerts.resolve(Alert.objects.all(), self.user)
+
+        events = sorted(((event['event'], event['zone'] or 0, event['count']) for event in broker.events))
+        self.assertEqual(events, [
+            ('bulk_acknowledged', 0, 1), ('bulk_acknowledged', self.zone.id, 2),
+            ('bulk_resolved', 0, 1), ('bulk_resolved', self.zone.id, 2), ('bulk_resolved', self.other.id, 1),
+        ])
+
+        subscription = live.Subscription(None, zones=[self.other.id])
+        wanted = sorted(event['zone'] or 0 for event in broker.events if subscription.wants(event))
+        self.assertEqual(wanted, [0, 0, self.other.id])
+
+    def test_needs_asgi(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/api/live/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertFalse(live.get_broker().subscriptions)
+
+    async def test_stream_filters_by_zone(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(f'/api/live/?zone={self.zone.id}')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        broker = live.get_broker()
+        broker.publish({'type': 'usage', 'zone': self.other.id, 'readings': 1})
+        broker.publish({'type': 'usage', 'zone': self.zone.id, 'readings': 2})
+        chunk = await anext(stream)
+        self.assertIn(b'event: usage', chunk)
+        self.assertIn(f'"zone": {self.zone.id}, "readings": 2'.encode(), chunk)
+        await sync_to_async(response.close)()
+        self.assertFalse(broker.subscriptions)
+
+
+class AsyncDashboardTests(TransactionTestCase):
+    """Async dashboard views return the same data as the sync viewsets
+
+    Their aggregates run on separate connections, which only see committed
+    rows, hence TransactionTestCase.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('async')
+        self.zone = WaterZone.objects.create(name='Central')
+        now = timezone.now()
+        for i in range(10):
+            WaterUsage.objects.create(zone=self.zone, usage_liters=i, measurement_time=now - timedelta(minutes=50 * i))
+        Alert.objects.create(zone=self.zone, title='Low pressure', message='m', alert_type='warning')
+
+    @override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+    async def test_async_matches_sync(self):
+        await self.async_client.aforce_login(self.user)
+        await sync_to_async(self.client.force_login)(self.user)
+        for sync_url, async_url in (
+            ('/api/dashboard/stats/', '/api/async/dashboard/stats/'),
+            ('/api/dashboard/top_zones/', '/api/async/dashboard/top_zones/'),
+            (f'/api/zones/{self.zone.id}/usage_stats/', f'/api/async/zones/{self.zone.id}/usage_stats/'),
+        ):
+            with self.subTest(url=async_url):
+                expected = (await sync_to_async(self.client.get)(sync_url)).json()
+                response = await self.async_client.get(async_url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected)
+
+        response = await self.async_client.get('/api/async/zones/0/usage_stats/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_only_get_and_head(self):
+        await self.async_client.aforce_login(self.user)
+        for url in ('/api/async/dashboard/stats/', '/api/async/dashboard/top_zones/',
+                    f'/api/async/zones/{self.zone.id}/usage_stats/'):
+            for method in ('post', 'put', 'patch', 'delete'):
+                with self.subTest(url=url, method=method):
+                    response = await getattr(self.async_client, method)(url)
+                    self.assertEqual(response.status_code, 405)
+                    self.assertEqual(response['Allow'], 'GET, HEAD')
+            self.assertEqual((await self.async_client.head(url)).status_code, 200)
+
+    async def test_drf_authentication_and_conditional_get(self):
+        await sync_to_async(self.user.set_password)('secret')
+        await self.user.asave()
+        credentials = base64.b64encode(b'async:secret').decode()
+        for authorization, status_code in ((f'Basic {credentials}', 200), ('Basic bm9ib2R5Og==', 403), (None, 403)):
+            headers = {'Authorization': authorization} if authorization else {}
+            with self.subTest(authorization=authorization):
+                sync_response = await sync_to_async(self.client.get)('/api/dashboard/stats/', headers=headers)
+                response = await self.async_client.get('/api/async/dashboard/stats/', headers=headers)
+                self.assertEqual((sync_response.status_code, response.status_code), (status_code, status_code))
+
+        headers = {'Authorization': f'Basic {credentials}'}
+        response = await self.async_client.get('/api/async/dashboard/top_zones/', headers=headers)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        response = await self.async_client.get(
+            '/api/async/dashboard/top_zones/', headers={**headers, 'If-None-Match': response['ETag']},
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class SearchIndexTests(APITestCase):
+    """?search= is answered from the FTS index, best matches first"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('searcher'))
+        zone = WaterZone.objects.create(name='West')
+        for i in range(5):
+            Alert.objects.create(zone=zone, title=f'Reading {i}', message='pressure dropped', alert_type='info')
+        self.leak = Alert.objects.create(zone=zone, title='Leaking valve', message='pressure dropped', alert_type='error')
+
+    def test_ranked_prefix_search_follows_writes(self):
+        response = self.client.get('/api/alerts/', {'search': 'pressure', 'page_size': 4})
+        page = response.json()
+        self.assertEqual(page['results'][0]['title'], 'Leaking valve')
+        rest = self.client.get(page['next']).json()['results']
+        self.assertEqual(len(page['results']) + len(rest), 6)
+
+        self.assertEqual([row['id'] for row in self.client.get('/api/alerts/?search=leak').json()['results']],
+                         [self.leak.id])
+        self.leak.title = 'Burst valve'
+        self.leak.save()
+        self.assertEqual(self.client.get('/api/alerts/?search=leak').json()['results'], [])
+        self.leak.delete()
+        self.assertEqual(self.client.get('/api/alerts/?search=valve').json()['results'], [])
+
+        # Bulk-created rows are indexed through their signals
+        created = Alert.objects.bulk_create([Alert(zone_id=self.leak.zone_id, title='Frozen meter', message='m')])
+        signals.alerts_created.send(sender=Alert, alerts=created)
+        self.assertEqual(len(self.client.get('/api/alerts/?search=frozen').json()['results']), 1)
+
+
+class SyntheticDataTests(APITestCase):
+    """generate_usage_data is deterministic and keeps rollups in step"""
+
+    def test_same_seed_same_readings(self):
+        options = dict(zones=3, days=2, interval=60, end='2026-01-15', seed=7, stdout=StringIO())
+        call_command('generate_usage_data', prefix='First', **options)
+        call_command('generate_usage_data', prefix='Second', raw=True, **options)
+
+        def readings(prefix):
+            return list(
+                WaterUsage.objects.filter(zone__name__startswith=prefix)
+                .order_by('zone__name', 'measurement_time')
+                .values_list('measurement_time', 'usage_liters', 'is_peak', 'quality_percentage')
+            )
+        first = readings('First')
+        self.assertEqual(len(first), 3 * 2 * 24)
+        self.assertEqual(first, readings('Second'))
+        self.assertEqual(first[0][0], datetime(2026, 1, 13, tzinfo=timezone.get_current_timezone()))
+        for prefix in ('First', 'Second'):
+            totals = HourlyUsageRollup.objects.filter(zone__name__startswith=prefix).aggregate(
+                count=Sum('reading_count'), total=Sum('total_liters'),
+            )
+            self.assertEqual(totals['count'], len(first))
+            self.assertAlmostEqual(totals['total'], sum(row[1] for row in first), places=4)
+
+
+@override_settings(CONDITIONAL_GET_WINDOW=0)
+class ConditionalGetTests(APITestCase):
+    """Unchanged polls are answered with 304 from one watermark query"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('poller')
+        self.client.force_authenticate(self.user)
+        self.zone = WaterZone.objects.create(name='North')
+        self.alert = Alert.objects.create(zone=self.zone, title='Leak', message='m', alert_type='warning')
+
+    def test_etag_changes_with_data(self):
+        etag = self.client.get('/api/dashboard/stats/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # QuerySet.update() bypasses auto_now; the bulk operations set updated_at
+        alerts.resolve(Alert.objects.filter(pk=self.alert.pk), self.user)
+        response = self.client.get('/api/dashboard/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = self.client.get('/api/usage/')['ETag']
+        WaterUsage.objects.create(zone=self.zone, usage_liters=5, measurement_time=timezone.now())
+        self.assertEqual(self.client.get('/api/usage/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_usage_edits_and_deletes_change_etag_across_processes(self):
+        reading = WaterUsage.objects.create(zone=self.zone, usage_liters=5, measurement_time=timezone.now())
+        # Writes made by another process leave this process's cache generations alone
+        with mock.patch.object(cache, 'invalidate'):
+            for write in (lambda: reading.save(), reading.delete):
+                etag = self.client.get('/api/usage/')['ETag']
+                with self.captureOnCommitCallbacks(execute=True):
+                    write()
+                response = self.client.get('/api/usage/', HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(DataGeneration.objects.get(pk=cache.USAGE).value, 2)
+
+        # Appends are caught by the newest-row watermark and leave the shared row alone
+        with self.captureOnCommitCallbacks(execute=True):
+            WaterUsage.objects.create(zone=self.zone, usage_liters=5, measurement_time=timezone.now())
+            signals.usage_ingested.send(sender=WaterUsage, readings=[])
+        self.assertEqual(DataGeneration.objects.get(pk=cache.USAGE).value, 2)
+
+    def test_alert_delete_changes_etag_across_processes(self):
+        # The newer alert keeps max(updated_at) where it was
+        newer = Alert.objects.create(zone=self.zone, title='Burst', message='m', alert_type='error')
+        etag = self.client.get('/api/alerts/')['ETag']
+        with mock.patch.object(cache, 'invalidate'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.alert.delete()
+        response = self.client.get('/api/alerts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['results']], [newer.id])
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/alerts/')['Last-Modified']
+        response = self.client.get('/api/alerts/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        Alert.objects.filter(pk=self.alert.pk).update(updated_at=timezone.now() + timedelta(seconds=5))
+        response = self.client.get('/api/alerts/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024)
+class RenderingTests(APITestCase):
+    """orjson output matches DRF's renderer; large responses are compressed"""
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'when': timezone.make_aware(datetime(2026, 1, 2, 3, 4, 5, 678)), 'day': date(2026, 1, 2),
+            'amount': Decimal('1.50'), 'lazy': timedelta(seconds=90), 1: ['caf\u00e9', None, 2.5, '\u2028'],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render({'big': 2 ** 70}), b'{"big":1180591620717411303424}')
+
+    def test_non_finite_floats_rejected_like_drf(self):
+        for data in ({'rate': float('nan')}, [None, {'peak': float('inf')}], {'series': np.array([1.0, -np.inf])},
+                     {'mean': np.float32('nan')}):
+            with self.subTest(data=data):
+                with self.assertRaisesMessage(ValueError, 'Out of range float values are not JSON compliant'):
+                    ORJSONRenderer().render(data)
+        self.assertEqual(ORJSONRenderer().render({'rate': None, 'series': np.array([1.5])}),
+                         b'{"rate":null,"series":[1.5]}')
+
+    def test_gzip_above_threshold(self):
+        self.client.force_authenticate(User.objects.create_user('reader'))
+        zone = WaterZone.objects.create(name='North')
+        now = timezone.now()
+        WaterUsage.objects.bulk_create([
+            WaterUsage(zone=zone, usage_liters=i, measurement_time=now - timedelta(minutes=i)) for i in range(50)
+        ])
+        response = self.client.get('/api/usage/?page_size=50', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(len(orjson.loads(gzip.decompress(response.content))['results']), 50)
+
+        response = self.client.get('/api/dashboard/stats/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/api/usage/export/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class SeriesTests(APITestCase):
+    """Chart series are downsampled to the requested points and keep spikes"""
+
+    def test_downsampling_keeps_spike(self):
+        x = list(range(1000))
+        y = [1.0] * 1000
+        y[437] = 50.0
+        indices = series.lttb(x, y, 50)
+        self.assertEqual(len(indices), 50)
+        self.assertIn(437, indices)
+        self.assertEqual(list(indices), sorted(indices))
+        indices, is_high = series.minmax(y, y, 50)
+        self.assertLessEqual(len(indices), 50)
+        self.assertIn(437, indices)
+        self.assertEqual(len(series.lttb(x[:10], y[:10], 50)), 10)
+
+    @override_settings(WATER_USAGE_RAW_RETENTION_DAYS=365, WATER_USAGE_READING_INTERVAL_MINUTES=15)
+    def test_source_bounded_by_points(self):
+        now = timezone.now()
+        # 180 days is fewer hours than points, but 17280 raw readings per zone
+        self.assertEqual(series.choose_source(now - timedelta(days=180), now, 5000), 'hourly')
+        self.assertEqual(series.choose_source(now - timedelta(days=100), now, 5000), 'raw')
+        self.assertEqual(series.choose_source(now - timedelta(days=1), now, 40), 'hourly')
+        self.assertEqual(series.choose_source(now - timedelta(days=400), now, 500), 'hourly')
+        self.assertEqual(series.choose_source(now - timedelta(days=600), now, 500), 'daily')
+        with override_settings(WATER_USAGE_READING_INTERVAL_MINUTES=60):
+            self.assertEqual(series.choose_source(now - timedelta(days=180), now, 5000), 'raw')
+
+    @override_settings(WATER_USAGE_READING_INTERVAL_MINUTES=5)
+    def test_parallel_arrays(self):
+        self.client.force_authenticate(User.objects.create_user('charts'))
+        zone = WaterZone.objects.create(name='North')
+        empty = WaterZone.objects.create(name='South')
+        now = timezone.now()
+        WaterUsage.objects.bulk_create([
+            WaterUsage(zone=zone, usage_liters=i % 7, quality_percentage=90,
+                       measurement_time=now - timedelta(minutes=5 * i))
+            for i in range(1, 200)
+        ])
+        response = self.client.get(f'/api/usage/series/?zones={zone.id},{empty.id}&days=1&points=150&method=minmax')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['source'], 'raw')
+        north, south = data['zones']
+        self.assertEqual(north['count'], 199)
+        self.assertLessEqual(len(north['timestamps']), 150)
+        self.assertEqual(len(north['timestamps']), len(north['usage']))
+        self.assertEqual(north['timestamps'], sorted(north['timestamps']))
+        self.assertEqual((min(north['usage']), max(north['usage'])), (0, 6))
+        self.assertEqual(south, {'zone': empty.id, 'zone_name': 'South', 'count': 0,
+                                 'timestamps': [], 'usage': [], 'quality': []})
+
+        for query in ('', f'zone={zone.id}&method=mean', f'zone={zone.id}&points=2', 'zones=x',
+                      f'zone={zone.id}&days=4000'):
+            self.assertEqual(self.client.get(f'/api/usage/series/?{query}').status_code, 400, query)
+
+
+class DistributionTests(APITestCase):
+    """Percentiles come from a mergeable sketch within its relative accuracy"""
+
+    def test_sketch_quantiles_and_merge(self):
+        values = np.random.default_rng(7).lognormal(3, 1, 20000)
+        rows = np.arange(20000) % 2
+        sketch = distribution.UsageSketch(2)
+        for start in range(0, 20000, 3000):
+            sketch.add(rows[start:start + 3000], values[start:start + 3000])
+        for row in (0, 1):
+            exact = np.percentile(values[rows == row], [50, 90, 99], method='lower')
+            np.testing.assert_allclose(sketch.quantiles([0.5, 0.9, 0.99])[row], exact, rtol=0.011)
+        merged = sketch.merged()
+        np.testing.assert_allclose(merged.quantiles([0.5])[0], np.percentile(values, [50]), rtol=0.011)
+        edges, counts = merged.histogram(0, 10)
+        self.assertEqual((len(edges), counts.sum()), (11, 20000))
+        self.assertEqual((edges[0], edges[-1]), (values.min(), values.max()))
+
+    def test_endpoint(self):
+        self.client.force_authenticate(User.objects.create_user('planner'))
+        zone = WaterZone.objects.create(name='North')
+        idle = WaterZone.objects.create(name='South')
+        now = timezone.now()
+        WaterUsage.objects.bulk_create([
+            WaterUsage(zone=zone, usage_liters=i, measurement_time=now - timedelta(minutes=10 * i))
+            for i in range(1, 101)
+        ])
+        rollups.rebuild()
+        response = self.client.get(f'/api/usage/distribution/?zones={zone.id},{idle.id}&days=2&percentiles=50,90&bins=4')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        north, south = data['zones']
+        self.assertEqual((north['count'], north['min'], north['max']), (100, 1, 100))
+        self.assertAlmostEqual(north['percentiles']['p50'], 50, delta=0.5)
+        self.assertAlmostEqual(north['percentiles']['p90'], 90, delta=1)
+        self.assertEqual(sum(north['histogram']['counts']), 100)
+        self.assertEqual(len(north['hours']['average']), 24)
+        self.assertEqual(north['peak_hour'], north['hours']['average'].index(max(filter(None, north['hours']['average']))))
+        self.assertEqual(south['count'], 0)
+        self.assertEqual((south['percentiles'], south['peak_hour']), ({'p50': None, 'p90': None}, None))
+        self.assertEqual(data['overall']['count'], 100)
+
+        for query in ('percentiles=101', 'bins=0', 'zones=x', 'days=4000'):
+            self.assertEqual(self.client.get(f'/api/usage/distribution/?{query}').status_code, 400, query)
+
+    @override_settings(WATER_USAGE_RAW_RETENTION_DAYS=30)
+    def test_window_clamped_to_raw_retention(self):
+        self.client.force_authenticate(User.objects.create_user('planner'))
+        zone = WaterZone.objects.create(name='North')
+        now = timezone.now()
+        for when, liters in ((now - timedelta(days=40), 1000), (now - timedelta(hours=2), 4), (now - timedelta(hours=1), 6)):
+            WaterUsage.objects.create(zone=zone, usage_liters=liters, measurement_time=when)
+        self.assertEqual(retention.purge_raw(rollups.raw_retention_cutoff()), 1)
+
+        response = self.client.get(f'/api/usage/distribution/?zones={zone.id}&days=60')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        cutoff = rollups.raw_retention_cutoff()
+        self.assertEqual(datetime.fromisoformat(data['start']), cutoff)
+        self.assertLess(datetime.fromisoformat(data['requested_start']), cutoff)
+        north, = data['zones']
+        # The purged reading is in neither the percentiles nor the hour profile
+        self.assertEqual((north['count'], north['max']), (2, 6))
+        self.assertEqual(max(filter(None, north['hours']['peak'])), 6)
+
+        end = (cutoff - timedelta(days=1)).isoformat()
+        response = self.client.get('/api/usage/distribution/', {'zones': zone.id, 'end': end, 'days': 5})
+        self.assertEqual(response.status_code, 400)
+
+
+class ZoneHierarchyTests(APITestCase):
+    """Materialized paths follow moves and drive subtree aggregates"""
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user('facilities'))
+        self.site = WaterZone.objects.create(name='Campus', zone_type='site')
+        self.north = WaterZone.objects.create(name='North', parent=self.site)
+        self.south = WaterZone.objects.create(name='South', parent=self.site)
+        self.floor = WaterZone.objects.create(name='North 1', zone_type='floor', parent=self.north)
+        self.meter = WaterZone.objects.create(name='Meter', zone_type='meter', parent=self.floor)
+        when = timezone.now() - timedelta(hours=2)
+        for zone, liters in ((self.site, 1), (self.meter, 30), (self.floor, 5), (self.south, 20)):
+            WaterUsage.objects.create(zone=zone, usage_liters=liters, measurement_time=when)
+
+    def test_paths_follow_moves(self):
+        self.meter.refresh_from_db()
+        self.assertEqual(hierarchy.path_ids(self.meter.path), [self.site.id, self.north.id, self.floor.id, self.meter.id])
+        self.assertEqual(self.client.get(f'/api/zones/{self.meter.id}/').json()['depth'], 3)
+        self.assertEqual(
+            {zone['id'] for zone in self.client.get('/api/zones/?parent=none').json()['results']}, {self.site.id}
+        )
+
+        # Moving a zone rewrites its subtree; a stale copy of a descendant keeps the new path
+        response = self.client.patch(f'/api/zones/{self.floor.id}/', {'parent': self.south.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.meter.name = 'Meter 1'
+        self.meter.save()
+        self.meter.refresh_from_db()
+        self.assertEqual(hierarchy.path_ids(self.meter.path), [self.site.id, self.south.id, self.floor.id, self.meter.id])
+
+        response = self.client.patch(f'/api/zones/{self.site.id}/', {'parent': self.meter.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_subtree_aggregates(self):
+        stats = self.client.get(f'/api/zones/{self.north.id}/subtree_stats/').json()
+        self.assertEqual((stats['zones'], stats['total_usage'], stats['measurements']), (3, 35, 2))
+        self.assertEqual(self.client.get(f'/api/zones/{self.site.id}/subtree_stats/').json()['total_usage'], 56)
+
+        top = self.client.get(f'/api/zones/{self.site.id}/top_children/?days=1').json()
+        self.assertEqual(top['own_usage'], 1)
+        self.assertEqual(
+            [(child['zone_name'], child['usage']) for child in top['children']], [('North', 35), ('South', 20)]
+        )
+
+        trend = self.client.get(f'/api/zones/{self.north.id}/subtree_trend/?days=1&granularity=hour').json()
+        self.assertEqual(sum(point['usage'] for point in trend), 35)
+
+
+@override_settings(DASHBOARD_CACHE_TIMEOUT=0)
+class QueryBudgetTests(APITestCase):
+    """Every router GET endpoint answers within its declared query budget"""
+
+    def test_endpoints_within_budget(self):
+        from first.urls import router
+
+        names = {name for name, _, _ in benchmarks.discover_endpoints(router)}
+        self.assertEqual(names, set(benchmarks.QUERY_BUDGETS))
+        context = benchmarks.seed(zones=3, days=3, interval=60)
+        results = benchmarks.run(router, context, repeat=1)
+        self.assertEqual(benchmarks.check(results), [])
+
+    def test_p95_regression_against_baseline(self):
+        result = {'status': 200, 'queries': 1, 'budget': 1, 'p95_ms': 30.0}
+        baseline = {'endpoints': {'alert-list': {'p95_ms': 10.0}, 'alert-detail': {'p95_ms': 29.0}}}
+        failures = benchmarks.check({'alert-list': result, 'alert-detail': result}, baseline, threshold=1.5)
+        self.assertEqual(failures, ['alert-list: p95 30.0 ms, baseline 10.0 ms'])
+
+
+@override_settings(ACTIVITY_LOG_ENABLED=True, ACTIVITY_LOG_FLUSH_INTERVAL=60)
+class ActivityLogTests(TransactionTestCase):
+    """Mutating API requests are logged through the buffered writer"""
+
+    def test_requests_are_buffered_then_bulk_inserted(self):
+        user = User.objects.create_user('auditor')
+        zone = WaterZone.objects.create(name='East')
+        Alert.objects.create(zone=zone, title='Burst', message='m', alert_type='error')
+        self.client.force_login(user)
+
+        self.client.get('/api/alerts/')
+        self.client.post('/api/alerts/bulk_resolve/', {'zone': zone.id}, REMOTE_ADDR='10.0.0.5')
+        self.assertFalse(ActivityLog.objects.exists())
+
+        activity.get_writer().flush()
+        entry = ActivityLog.objects.get()
+        self.assertEqual((entry.user, entry.action, entry.ip_address), (user, 'alert.bulk_resolve', '10.0.0.5'))
+        self.assertEqual(entry.description, 'POST /api/alerts/bulk_resolve/ -> 200')
+
+    def test_overflow_policies(self):
+        for overflow, kept in (('drop_oldest', ['b', 'c']), ('drop_newest', ['a', 'b'])):
+            writer = activity.ActivityLogWriter(capacity=2, flush_interval=60, overflow=overflow)
+            accepted = [writer.record({'action': action}) for action in 'abc']
+            pending = list(writer.buffer)
+            writer.buffer.clear()
+            writer.stop()
+            self.assertEqual(pending, [{'action': action} for action in kept])
+            self.assertEqual((accepted[2], writer.stats()['dropped']), (overflow == 'drop_oldest', 1))
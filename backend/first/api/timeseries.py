@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+
+def truncate(value, granularity):
+    """Truncate an aware datetime to the start of its bucket (local time)"""
+    value = timezone.localtime(value)
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'week':
+        return value - timedelta(days=value.weekday())
+    if granularity == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def next_bucket(value, granularity):
+    """Return the start of the bucket following ``value``"""
+    if granularity == 'hour':
+        return value + timedelta(hours=1)
+    if granularity == 'day':
+        return truncate(value + timedelta(days=1, hours=12), 'day')
+    if granularity == 'week':
+        return truncate(value + timedelta(days=7, hours=12), 'week')
+    return truncate(value + timedelta(days=32), 'month')
+
+
+def bucket_range(start, end, granularity):
+    """List bucket starts covering ``start`` up to and including ``end``"""
+    buckets = []
+    current = truncate(start, granularity)
+    while current <= end:
+        buckets.append(current)
+        current = next_bucket(current, granularity)
+    return buckets
+
+
+def bucket_key(value, granularity):
+    """Key used in API responses: datetimes for hours, dates otherwise"""
+    if not isinstance(value, datetime):
+        return value
+    value = timezone.localtime(value)
+    return value if granularity == 'hour' else value.date()
+
+
+def window_start(now, days, granularity):
+    """Start of a trend window ending now and spanning ``days`` days"""
+    if granularity == 'hour':
+        return truncate(now, 'hour') - timedelta(hours=days * 24 - 1)
+    return truncate(truncate(now, 'day') - timedelta(days=days - 1), granularity)
+
+
+def fill_series(totals, buckets, granularity):
+    """Turn sparse bucket totals into a dense list of ``{date, usage}``"""
+    lookup = {bucket_key(bucket, granularity): total for bucket, total in totals.items()}
+    series = []
+    for bucket in buckets:
+        key = bucket_key(bucket, granularity)
+        series.append({'date': key, 'usage': lookup.get(key, 0)})
+    return series
@@ -1,12 +1,12 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import timedelta
-from django.db.models import Sum, Avg, Max, Min, Count
-from django.utils.dateparse import parse_date
+from datetime import datetime, timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import StreamingHttpResponse
 
 from .models import (
     UserProfile, WaterZone, WaterUsage, Alert, Report,
@@ -16,8 +16,109 @@ from .serializers import (
     UserSerializer, UserProfileSerializer, WaterZoneSerializer,
     WaterUsageSerializer, AlertSerializer, ReportSerializer,
     SystemSettingsSerializer, ActivityLogSerializer, ComplianceSerializer,
-    DashboardStatsSerializer, UsageReportSerializer
+    DashboardStatsSerializer, UsageReportSerializer,
+    WATER_USAGE_VALUES, ALERT_VALUES, REPORT_VALUES, ACTIVITY_LOG_VALUES
 )
+from .parsers import ORJSONParser, NDJSONParser, CSVParser
+from .export import iter_rows, csv_stream, ndjson_stream, gzip_stream
+from .pagination import UsageCursorPagination, AlertCursorPagination, ActivityCursorPagination
+from .ingest import ingest_readings, get_max_rows
+from .timeseries import GRANULARITIES, bucket_range, fill_series, window_start
+from . import alerts, cache, dashboard, distribution, hierarchy, leaks, rollups, series
+from .conditional import conditional, respond
+from .db_router import replica_reads
+from .search import IndexedSearchFilter
+
+
+def _parse_id_list(value):
+    """Parse a comma-separated list of ids, preserving order"""
+    if not value:
+        return []
+    ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if part and int(part) not in ids:
+            ids.append(int(part))
+    return ids
+
+
+def _parse_time(value):
+    """Parse an ISO datetime or date (midnight) into an aware datetime"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_trend_params(params, max_days, max_hourly_days):
+    """``(days, granularity)`` of a trend request; raises ValueError with a message"""
+    granularity = params.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    try:
+        days = int(params.get('days', 7))
+    except ValueError:
+        raise ValueError('days must be an integer')
+    limit = max_hourly_days if granularity == 'hour' else max_days
+    if not 1 <= days <= limit:
+        raise ValueError(f'days must be between 1 and {limit} for {granularity} granularity')
+    return days, granularity
+
+
+class ReplicaReadMixin:
+    """Serve safe requests for ``replica_actions`` from the read replica
+
+    ``replica_actions = None`` routes every safe action. Writes made while
+    handling the request pin the rest of it to the primary.
+    """
+    replica_actions = None
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get(request.method.lower()) if hasattr(self, 'action_map') else None
+        if request.method in SAFE_METHODS and (self.replica_actions is None or action in self.replica_actions):
+            with replica_reads():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ValuesListMixin:
+    """Serve list responses from ``QuerySet.values()`` via ``values_serializer``
+
+    Skips model instantiation and per-field DRF serialization for read-only
+    lists; the output is identical to ``serializer_class``.
+    """
+    values_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        return self.values_response(self.filter_queryset(self.get_queryset()))
+
+    def values_response(self, queryset):
+        rows = self.values_serializer.values(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.values_serializer.to_representation(page))
+        return Response(self.values_serializer.to_representation(rows))
+
+
+class ConditionalGetMixin:
+    """ETag/Last-Modified on list and retrieve, from ``conditional_groups`` watermarks
+
+    Unchanged resources get a 304 before the queryset is evaluated.
+    """
+    conditional_groups = ()
+
+    def list(self, request, *args, **kwargs):
+        parent = super().list
+        return respond(request, self.conditional_groups, lambda: parent(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super().retrieve
+        return respond(request, self.conditional_groups, lambda: parent(request, *args, **kwargs))
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -32,7 +133,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
 class UserProfileViewSet(viewsets.ModelViewSet):
     """API endpoint for user profiles"""
-    queryset = UserProfile.objects.all()
+    queryset = UserProfile.objects.select_related('user')
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
@@ -61,8 +162,10 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class WaterZoneViewSet(viewsets.ModelViewSet):
+class WaterZoneViewSet(ReplicaReadMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """API endpoint for water zones"""
+    replica_actions = ['usage_stats', 'subtree_stats', 'top_children', 'subtree_trend']
+    conditional_groups = (cache.ZONES,)
     queryset = WaterZone.objects.filter(is_active=True)
     serializer_class = WaterZoneSerializer
     permission_classes = [IsAuthenticated]
@@ -70,42 +173,118 @@ class WaterZoneViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
 
+    def get_queryset(self):
+        """Filter by parent if provided (?parent=none for top-level zones)"""
+        queryset = super().get_queryset()
+        parent = self.request.query_params.get('parent')
+        if parent == 'none':
+            queryset = queryset.filter(parent=None)
+        elif parent:
+            queryset = queryset.filter(parent_id=parent)
+        return queryset
+
     @action(detail=True, methods=['get'])
+    @conditional(cache.USAGE, cache.ZONES, windowed=True)
     def usage_stats(self, request, pk=None):
         """Get usage statistics for a specific zone"""
         zone = self.get_object()
         last_24h = timezone.now() - timedelta(days=1)
-        
-        usage_data = WaterUsage.objects.filter(
-            zone=zone,
-            measurement_time__gte=last_24h
-        ).aggregate(
-            total=Sum('usage_liters'),
-            peak=Max('usage_liters'),
-            low=Min('usage_liters'),
-            avg=Avg('usage_liters'),
-            count=Count('id')
-        )
-        
+        usage_data = rollups.window_totals(last_24h, zone_ids=[zone.id])
+        return Response(dashboard.build_zone_usage({'id': zone.id, 'name': zone.name}, usage_data))
+
+    @action(detail=True, methods=['get'])
+    @conditional(cache.USAGE, cache.ZONES, windowed=True)
+    def subtree_stats(self, request, pk=None):
+        """Usage statistics for a zone and all zones below it (?days=1)"""
+        zone = self.get_object()
+        try:
+            days = int(request.query_params.get('days', 1))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= dashboard.TOP_ZONES_MAX_DAYS:
+            return Response(
+                {'error': f'days must be between 1 and {dashboard.TOP_ZONES_MAX_DAYS}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        start = timezone.now() - timedelta(days=days)
+        usage_data = rollups.window_totals(start, zone_ids=hierarchy.subtree_ids(zone.path))
+        count = usage_data['count']
         return Response({
             'zone_id': zone.id,
             'zone_name': zone.name,
-            'total_usage_24h': usage_data['total'] or 0,
+            'depth': hierarchy.depth(zone.path),
+            'zones': hierarchy.subtree(zone.path).count(),
+            'days': days,
+            'total_usage': usage_data['total'],
             'peak_usage': usage_data['peak'] or 0,
             'low_usage': usage_data['low'] or 0,
-            'average_usage': usage_data['avg'] or 0,
-            'measurements': usage_data['count'] or 0
+            'average_usage': usage_data['total'] / count if count else 0,
+            'measurements': count,
         })
 
+    @action(detail=True, methods=['get'])
+    @conditional(cache.USAGE, cache.ZONES, windowed=True)
+    def top_children(self, request, pk=None):
+        """Child zones ranked by the usage of their whole subtree (?limit=4&days=7&zone_type=floor)"""
+        zone = self.get_object()
+        try:
+            limit, days, zone_type = dashboard.parse_top_zones_params(request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        totals = hierarchy.branch_totals(zone.path, timezone.now() - timedelta(days=days))
+        children = zone.children.filter(is_active=True)
+        if zone_type:
+            children = children.filter(zone_type=zone_type)
+        # Most used first, then by name as in top_zones
+        ranked = sorted(
+            ((totals.get(child_id, 0), name, child_id) for child_id, name in children.values_list('id', 'name')),
+            key=lambda item: (-item[0], item[1]),
+        )[:limit]
+        return Response({
+            'zone_id': zone.id,
+            'zone_name': zone.name,
+            'own_usage': totals.get(zone.id, 0),
+            'children': [{'zone': child_id, 'zone_name': name, 'usage': usage} for usage, name, child_id in ranked],
+        })
 
-class WaterUsageViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    @conditional(cache.USAGE, cache.ZONES, windowed=True)
+    def subtree_trend(self, request, pk=None):
+        """Usage trend of a zone and all zones below it (?days=7&granularity=day)"""
+        zone = self.get_object()
+        try:
+            days, granularity = _parse_trend_params(
+                request.query_params, WaterUsageViewSet.TREND_MAX_DAYS, WaterUsageViewSet.TREND_MAX_HOURLY_DAYS
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        now = timezone.now()
+        start_date = window_start(now, days, granularity)
+        totals = rollups.trend_totals(start_date, granularity, zone_ids=hierarchy.subtree_ids(zone.path))
+        return Response(fill_series(totals, bucket_range(start_date, now, granularity), granularity))
+
+
+class WaterUsageViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     """API endpoint for water usage records"""
-    queryset = WaterUsage.objects.all()
+    replica_actions = ['trend', 'series', 'distribution']
+    queryset = WaterUsage.objects.select_related('zone')
     serializer_class = WaterUsageSerializer
+    values_serializer = WATER_USAGE_VALUES
+    pagination_class = UsageCursorPagination
+    TREND_MAX_DAYS = 3660
+    TREND_MAX_HOURLY_DAYS = 92
+    SERIES_MAX_POINTS = 5000
+    SERIES_MAX_ZONES = 50
+    DISTRIBUTION_MAX_ZONES = 1000
+    DISTRIBUTION_MAX_BINS = 200
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     ordering_fields = ['measurement_time', 'usage_liters']
 
+    @conditional(cache.USAGE, cache.ZONES)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         """Filter by zone if provided"""
         queryset = super().get_queryset()
@@ -114,43 +293,235 @@ class WaterUsageViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(zone_id=zone_id)
         return queryset
 
+    @action(detail=False, methods=['post'], parser_classes=[ORJSONParser, NDJSONParser, CSVParser])
+    def bulk(self, request):
+        """Ingest many readings at once (JSON array, NDJSON or CSV)"""
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = rows.get('readings')
+        if not isinstance(rows, list):
+            return Response(
+                {'error': 'Expected a list of readings'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        max_rows = get_max_rows()
+        if len(rows) > max_rows:
+            return Response(
+                {'error': f'Too many readings in one request (max {max_rows})'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        created, errors = ingest_readings(rows)
+        return Response({
+            'received': len(rows),
+            'created': len(created),
+            'failed': len(errors),
+            'errors': errors
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
     @action(detail=False, methods=['get'])
-    def trend(self, request):
-        """Get usage trend for last 7 days"""
-        days = int(request.query_params.get('days', 7))
-        start_date = timezone.now() - timedelta(days=days)
-        
-        zone_id = request.query_params.get('zone')
-        if zone_id:
-            usages = WaterUsage.objects.filter(
-                zone_id=zone_id,
-                measurement_time__gte=start_date
+    def export(self, request):
+        """Stream readings as CSV or NDJSON (?output=csv&zone=1,2&start=...&end=...&compress=gzip)"""
+        output = request.query_params.get('output', 'csv')
+        if output not in ('csv', 'ndjson'):
+            return Response({'error': 'output must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            zone_ids = _parse_id_list(request.query_params.get('zone'))
+            start = request.query_params.get('start')
+            end = request.query_params.get('end')
+            start = _parse_time(start) if start else None
+            end = _parse_time(end) if end else None
+        except ValueError:
+            return Response(
+                {'error': 'zone must be a list of ids; start and end must be ISO dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+
+        usages = WaterUsage.objects.all()
+        if zone_ids:
+            usages = usages.filter(zone_id__in=zone_ids)
+        if start:
+            usages = usages.filter(measurement_time__gte=start)
+        if end:
+            usages = usages.filter(measurement_time__lt=end)
+
+        if output == 'csv':
+            stream, content_type = csv_stream(iter_rows(usages)), 'text/csv'
         else:
-            usages = WaterUsage.objects.filter(measurement_time__gte=start_date)
-        
-        trend_data = []
-        for i in range(days):
-            date = start_date + timedelta(days=i)
-            daily_usage = usages.filter(
-                measurement_time__date=date.date()
-            ).aggregate(total=Sum('usage_liters'))['total'] or 0
-            trend_data.append({
-                'date': date.date(),
-                'usage': daily_usage
-            })
-        
-        return Response(trend_data)
-
-
-class AlertViewSet(viewsets.ModelViewSet):
+            stream, content_type = ndjson_stream(iter_rows(usages)), 'application/x-ndjson'
+        gzipped = request.query_params.get('compress') == 'gzip'
+        if gzipped:
+            stream = gzip_stream(stream)
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="water_usage.{output}"'
+        if gzipped:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+    @action(detail=False, methods=['get'])
+    @conditional(cache.USAGE, windowed=True)
+    def trend(self, request):
+        """Get usage trend (?days=7&granularity=day&zone=1 or &zones=1,2,3)"""
+        try:
+            days, granularity = _parse_trend_params(
+                request.query_params, self.TREND_MAX_DAYS, self.TREND_MAX_HOURLY_DAYS
+            )
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            zone_ids = _parse_id_list(request.query_params.get('zones'))
+            zone_filter = _parse_id_list(request.query_params.get('zone'))
+        except ValueError:
+            return Response({'error': 'zone and zones must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        start_date = window_start(now, days, granularity)
+        buckets = bucket_range(start_date, now, granularity)
+
+        if zone_ids:
+            totals = rollups.trend_totals(start_date, granularity, zone_ids=zone_ids, by_zone=True)
+            return Response([
+                {'zone': zid, 'trend': fill_series(totals.get(zid, {}), buckets, granularity)}
+                for zid in zone_ids
+            ])
+
+        totals = rollups.trend_totals(start_date, granularity, zone_ids=zone_filter or None)
+        return Response(fill_series(totals, buckets, granularity))
+
+    @action(detail=False, methods=['get'])
+    @conditional(cache.USAGE, cache.ZONES, windowed=True)
+    def series(self, request):
+        """Chart series per zone as parallel arrays (?zones=1,2&days=30&points=500&method=lttb|minmax)"""
+        params = request.query_params
+        method = params.get('method', 'lttb')
+        if method not in series.METHODS:
+            return Response(
+                {'error': f"method must be one of {', '.join(series.METHODS)}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            zone_ids = _parse_id_list(params.get('zones') or params.get('zone'))
+            points = int(params.get('points', 500))
+            days = int(params.get('days', 7))
+            end = _parse_time(params['end']) if params.get('end') else timezone.now()
+            start = _parse_time(params['start']) if params.get('start') else end - timedelta(days=days)
+        except ValueError:
+            return Response(
+                {'error': 'zones must be a list of ids, points and days integers, start and end ISO dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 1 <= len(zone_ids) <= self.SERIES_MAX_ZONES:
+            return Response(
+                {'error': f'zones must list 1 to {self.SERIES_MAX_ZONES} zone ids'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not 3 <= points <= self.SERIES_MAX_POINTS:
+            return Response(
+                {'error': f'points must be between 3 and {self.SERIES_MAX_POINTS}'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not start < end or end - start > timedelta(days=self.TREND_MAX_DAYS):
+            return Response(
+                {'error': f'start must be before end and the range at most {self.TREND_MAX_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        source = series.choose_source(start, end, points)
+        data = series.load(zone_ids, start, end, source)
+        names = dict(WaterZone.objects.filter(id__in=zone_ids).values_list('id', 'name'))
+        zones = []
+        for zone_id in zone_ids:
+            arrays = data.get(zone_id)
+            zone = {'zone': zone_id, 'zone_name': names.get(zone_id), 'count': len(arrays['usage']) if arrays else 0}
+            if arrays:
+                zone.update(series.downsample(arrays, points, method))
+            else:
+                zone.update({'timestamps': [], 'usage': [], 'quality': []})
+            zones.append(zone)
+        return Response({
+            'start': start, 'end': end, 'points': points, 'method': method, 'source': source, 'zones': zones,
+        })
+
+    @action(detail=False, methods=['get'])
+    @conditional(cache.USAGE, cache.ZONES, windowed=True)
+    def distribution(self, request):
+        """Usage percentiles, histogram and hour-of-day profile per zone (?zones=1,2&days=30&percentiles=50,90,99)
+
+        Windows reaching past the raw retention cutoff are clamped to it;
+        ``start`` is the effective start and ``requested_start`` the asked one.
+        """
+        params = request.query_params
+        try:
+            zone_ids = _parse_id_list(params.get('zones') or params.get('zone'))
+            bins = int(params.get('bins', distribution.DEFAULT_BINS))
+            days = int(params.get('days', 30))
+            end = _parse_time(params['end']) if params.get('end') else timezone.now()
+            start = _parse_time(params['start']) if params.get('start') else end - timedelta(days=days)
+            percentiles = [float(value) for value in params['percentiles'].split(',')] \
+                if params.get('percentiles') else list(distribution.DEFAULT_PERCENTILES)
+        except ValueError:
+            return Response(
+                {'error': 'zones must be a list of ids, percentiles numbers, bins and days integers, '
+                          'start and end ISO dates or datetimes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not all(0 <= value <= 100 for value in percentiles):
+            return Response({'error': 'percentiles must be between 0 and 100'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= bins <= self.DISTRIBUTION_MAX_BINS:
+            return Response(
+                {'error': f'bins must be between 1 and {self.DISTRIBUTION_MAX_BINS}'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not start < end or end - start > timedelta(days=self.TREND_MAX_DAYS):
+            return Response(
+                {'error': f'start must be before end and the range at most {self.TREND_MAX_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Without zones, every active zone
+        zones = WaterZone.objects.filter(id__in=zone_ids) if zone_ids else WaterZone.objects.filter(is_active=True)
+        names = dict(zones.order_by('id').values_list('id', 'name')[:self.DISTRIBUTION_MAX_ZONES + 1])
+        if len(names) > self.DISTRIBUTION_MAX_ZONES:
+            return Response(
+                {'error': f'at most {self.DISTRIBUTION_MAX_ZONES} zones; pass zones'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        zone_ids = zone_ids or list(names)
+        # Percentiles need raw readings; the whole payload covers the same retained range
+        requested_start = start
+        cutoff = rollups.raw_retention_cutoff()
+        if cutoff is not None and start < cutoff:
+            if end <= cutoff:
+                return Response(
+                    {'error': f'raw readings are kept from {cutoff.isoformat()}; end must be after it'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            start = cutoff
+
+        sketch = distribution.sketch_usage(zone_ids, start, end)
+        fractions = [value / 100 for value in percentiles]
+        summaries = distribution.summarize(sketch, fractions, bins)
+        profiles = distribution.hour_profile(zone_ids, start, end)
+        return Response({
+            'start': start, 'end': end, 'requested_start': requested_start,
+            # Merged zone sketches: the distribution of all readings together
+            'overall': distribution.summarize(sketch.merged(), fractions, bins)[0],
+            'zones': [
+                {'zone': zone_id, 'zone_name': names.get(zone_id), **summary,
+                 **distribution.summarize_hours(profiles.get(zone_id))}
+                for zone_id, summary in zip(zone_ids, summaries)
+            ],
+        })
+
+
+class AlertViewSet(ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """API endpoint for alerts"""
-    queryset = Alert.objects.all()
+    conditional_groups = (cache.ALERTS, cache.ZONES)
+    queryset = Alert.objects.select_related('zone', 'resolved_by', 'acknowledged_by')
     serializer_class = AlertSerializer
+    values_serializer = ALERT_VALUES
+    pagination_class = AlertCursorPagination
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [IndexedSearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'message']
     ordering_fields = ['created_at', 'severity']
+    BULK_FILTERS = ('ids', 'zone', 'alert_type', 'severity', 'min_severity', 'title', 'created_before')
 
     def get_queryset(self):
         """Filter by status if provided"""
@@ -171,35 +542,80 @@ class AlertViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(alert)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['post'])
+    def acknowledge(self, request, pk=None):
+        """Acknowledge an active alert"""
+        alert = self.get_object()
+        if alert.status == 'active':
+            alert.status = 'acknowledged'
+            alert.acknowledged_at = timezone.now()
+            alert.acknowledged_by = request.user
+            alert.save()
+        serializer = self.get_serializer(alert)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def bulk_resolve(self, request):
+        """Resolve all open alerts matching ids or a filter in one UPDATE"""
+        return self._bulk_update(request, alerts.resolve)
+
+    @action(detail=False, methods=['post'])
+    def bulk_acknowledge(self, request):
+        """Acknowledge all active alerts matching ids or a filter in one UPDATE"""
+        return self._bulk_update(request, alerts.acknowledge)
+
+    def _bulk_update(self, request, operation):
+        try:
+            queryset = self._bulk_queryset(request.data)
+        except (TypeError, ValueError) as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'updated': operation(queryset, request.user)})
+
+    def _bulk_queryset(self, data):
+        """Build the target queryset from ``ids`` and/or filter fields in the body"""
+        if not hasattr(data, 'get') or not any(data.get(key) not in (None, '', []) for key in self.BULK_FILTERS):
+            raise ValueError(f'Provide ids or at least one filter: {", ".join(self.BULK_FILTERS)}')
+        queryset = Alert.objects.all()
+        if data.get('ids'):
+            ids = data['ids']
+            if not isinstance(ids, list):
+                raise ValueError('ids must be a list')
+            queryset = queryset.filter(id__in=[int(pk) for pk in ids])
+        if data.get('zone') not in (None, ''):
+            queryset = queryset.filter(zone_id=int(data['zone']))
+        if data.get('alert_type'):
+            queryset = queryset.filter(alert_type=data['alert_type'])
+        if data.get('severity') not in (None, ''):
+            queryset = queryset.filter(severity=int(data['severity']))
+        if data.get('min_severity') not in (None, ''):
+            queryset = queryset.filter(severity__gte=int(data['min_severity']))
+        if data.get('title'):
+            queryset = queryset.filter(title=data['title'])
+        if data.get('created_before'):
+            queryset = queryset.filter(created_at__lt=_parse_time(data['created_before']))
+        return queryset
+
     @action(detail=False, methods=['get'])
+    @conditional(cache.ALERTS, cache.ZONES)
     def active(self, request):
         """Get all active alerts"""
-        alerts = self.queryset.filter(status='active')
-        page = self.paginate_queryset(alerts)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(alerts, many=True)
-        return Response(serializer.data)
+        queryset = self.queryset.filter(status='active')
+        return self.values_response(queryset)
 
     @action(detail=False, methods=['get'])
+    @conditional(cache.ALERTS)
     def count(self, request):
-        """Get count of active alerts"""
-        active_count = self.queryset.filter(status='active').count()
-        resolved_count = self.queryset.filter(status='resolved').count()
-        return Response({
-            'active': active_count,
-            'resolved': resolved_count,
-            'total': active_count + resolved_count
-        })
+        """Get alert counts by status, type and severity"""
+        return Response(alerts.cached_alert_counts())
 
 
-class ReportViewSet(viewsets.ModelViewSet):
+class ReportViewSet(ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     """API endpoint for reports"""
-    queryset = Report.objects.all()
+    queryset = Report.objects.select_related('generated_by')
     serializer_class = ReportSerializer
+    values_serializer = REPORT_VALUES
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [IndexedSearchFilter, filters.OrderingFilter]
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'report_type']
 
@@ -213,54 +629,79 @@ class ReportViewSet(viewsets.ModelViewSet):
         report_type = request.query_params.get('type')
         if report_type:
             reports = self.queryset.filter(report_type=report_type)
-            page = self.paginate_queryset(reports)
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-            serializer = self.get_serializer(reports, many=True)
-            return Response(serializer.data)
+            return self.values_response(reports)
         return Response({'error': 'type parameter required'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
     def monthly(self, request):
-        """Generate monthly usage report"""
-        now = timezone.now()
-        start_date = now.replace(day=1)
-        end_date = now
-
-        total_usage = WaterUsage.objects.filter(
-            measurement_time__date__gte=start_date.date(),
-            measurement_time__date__lte=end_date.date()
-        ).aggregate(Sum('usage_liters'))['usage_liters__sum'] or 0
-
-        zone_breakdown = []
-        zones = WaterZone.objects.filter(is_active=True)
+        """Generate monthly usage report (?month=YYYY-MM, default current month)"""
+        today = timezone.localdate()
+        month = request.query_params.get('month')
+        if month:
+            try:
+                start_date = datetime.strptime(month, '%Y-%m').date()
+            except ValueError:
+                return Response({'error': 'month must be in YYYY-MM format'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            start_date = today.replace(day=1)
+        next_month = (start_date + timedelta(days=32)).replace(day=1)
+        end_date = min(today, next_month - timedelta(days=1))
+
+        zones = rollups.annotate_zone_usage(
+            WaterZone.objects.all(), start_date, next_month, daily=True
+        ).values('name', 'is_active', 'usage')
+        total_usage = 0
+        active_zones = []
         for zone in zones:
-            zone_usage = WaterUsage.objects.filter(
-                zone=zone,
-                measurement_time__date__gte=start_date.date()
-            ).aggregate(Sum('usage_liters'))['usage_liters__sum'] or 0
-            zone_breakdown.append({
-                'zone': zone.name,
-                'usage': zone_usage,
-                'percentage': (zone_usage / total_usage * 100) if total_usage > 0 else 0
-            })
+            total_usage += zone['usage']
+            if zone['is_active']:
+                active_zones.append(zone)
+
+        zone_breakdown = [
+            {
+                'zone': zone['name'],
+                'usage': zone['usage'],
+                'percentage': (zone['usage'] / total_usage * 100) if total_usage > 0 else 0
+            }
+            for zone in active_zones
+        ]
 
         return Response({
             'report_type': 'monthly',
-            'period': f"{start_date.date()} to {end_date.date()}",
+            'period': f"{start_date} to {end_date}",
             'total_usage': total_usage,
             'zone_breakdown': zone_breakdown
         })
 
+    @action(detail=False, methods=['post'])
+    def leak_detection(self, request):
+        """Run leak detection over all zones (?days=90&recent_days=7&alerts=false)"""
+        try:
+            days = int(request.query_params.get('days', leaks.DEFAULTS['days']))
+            recent_days = int(request.query_params.get('recent_days', leaks.DEFAULTS['recent_days']))
+        except ValueError:
+            return Response({'error': 'days and recent_days must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 1 <= recent_days < days <= leaks.MAX_DAYS:
+            return Response(
+                {'error': f'recent_days must be at least 1 and below days, days at most {leaks.MAX_DAYS}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        create_alerts = request.query_params.get('alerts', 'true').lower() not in ('0', 'false', 'no')
+        report = leaks.detect_leaks(
+            days=days, recent_days=recent_days, create_alerts=create_alerts, user=request.user
+        )
+        return Response(ReportSerializer(report).data, status=status.HTTP_201_CREATED)
 
-class SystemSettingsViewSet(viewsets.ModelViewSet):
+
+class SystemSettingsViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """API endpoint for system settings"""
+    conditional_groups = (cache.SETTINGS,)
     queryset = SystemSettings.objects.all()
     serializer_class = SystemSettingsSerializer
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=['get', 'put'])
+    @conditional(cache.SETTINGS)
     def current(self, request):
         """Get or update current system settings"""
         try:
@@ -287,12 +728,14 @@ class SystemSettingsViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+class ActivityLogViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """API endpoint for activity logs"""
-    queryset = ActivityLog.objects.all()
+    queryset = ActivityLog.objects.select_related('user')
     serializer_class = ActivityLogSerializer
+    values_serializer = ACTIVITY_LOG_VALUES
+    pagination_class = ActivityCursorPagination
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [IndexedSearchFilter, filters.OrderingFilter]
     search_fields = ['user__username', 'action', 'description']
     ordering_fields = ['timestamp', 'user']
 
@@ -308,69 +751,40 @@ class ComplianceViewSet(viewsets.ModelViewSet):
 
 
 # Dashboard API Views
-class DashboardViewSet(viewsets.ViewSet):
+class DashboardViewSet(ReplicaReadMixin, viewsets.ViewSet):
     """Dashboard statistics and overview"""
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=['get'])
+    @conditional(cache.USAGE, cache.ALERTS, cache.ZONES, windowed=True)
     def stats(self, request):
         """Get dashboard statistics"""
-        now = timezone.now()
-        last_24h = now - timedelta(days=1)
-        
-        # Calculate total and daily usage
-        total_usage = WaterUsage.objects.filter(
-            measurement_time__gte=last_24h
-        ).aggregate(Sum('usage_liters'))['usage_liters__sum'] or 0
-        
-        daily_avg = WaterUsage.objects.aggregate(
-            Avg('usage_liters')
-        )['usage_liters__avg'] or 0
-        
-        # Get water quality and system health
-        quality = WaterUsage.objects.filter(
-            measurement_time__gte=last_24h
-        ).aggregate(Avg('quality_percentage'))['quality_percentage__avg'] or 100
-        
-        # System health based on active alerts
-        active_alerts = Alert.objects.filter(status='active').count()
-        system_health = max(100 - (active_alerts * 5), 0)
-        
-        stats = {
-            'total_usage': total_usage,
-            'daily_average': daily_avg,
-            'water_quality': int(quality),
-            'system_health': int(system_health),
-            'active_alerts': active_alerts,
-            'total_zones': WaterZone.objects.filter(is_active=True).count(),
-        }
-        
+        stats = cache.cached('stats', [cache.USAGE, cache.ALERTS, cache.ZONES], dashboard.stats)
         serializer = DashboardStatsSerializer(stats)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @conditional(cache.USAGE, cache.ZONES, windowed=True)
     def top_zones(self, request):
-        """Get top consuming zones"""
-        last_7d = timezone.now() - timedelta(days=7)
-        
-        zones = WaterZone.objects.filter(is_active=True)
-        zone_usage = []
-        
-        for zone in zones:
-            usage = WaterUsage.objects.filter(
-                zone=zone,
-                measurement_time__gte=last_7d
-            ).aggregate(Sum('usage_liters'))['usage_liters__sum'] or 0
-            zone_usage.append({'zone': zone.name, 'usage': usage})
-        
-        # Sort and return top 4
-        zone_usage.sort(key=lambda x: x['usage'], reverse=True)
-        return Response(zone_usage[:4])
+        """Get top consuming zones (?limit=4&days=7&zone_type=building)"""
+        try:
+            limit, days, zone_type = dashboard.parse_top_zones_params(request.query_params)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(cache.cached(
+            'top_zones', [cache.USAGE, cache.ZONES],
+            lambda: dashboard.top_zones(limit, days, zone_type),
+            params=(limit, days, zone_type)
+        ))
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Get dashboard cache hit/miss counters for this process"""
+        return Response(cache.stats())
 
     @action(detail=False, methods=['get'])
     def activity_log(self, request):
         """Get recent activity"""
-        activities = ActivityLog.objects.all()[:20]
-        serializer = ActivityLogSerializer(activities, many=True)
-        return Response(serializer.data)
+        activities = ACTIVITY_LOG_VALUES.values(ActivityLog.objects.all())[:20]
+        return Response(ACTIVITY_LOG_VALUES.to_representation(activities))
 
@@ -3,6 +3,10 @@ ASGI config for first project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn first.asgi:application``) so
+long-lived streams such as the live feed at /api/live/ are held by the event
+loop instead of a worker thread each.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
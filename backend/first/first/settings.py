@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.activity.ActivityLogMiddleware',
 ]
 
 ROOT_URLCONF = 'first.urls'
@@ -92,6 +96,23 @@ DATABASES = {
     }
 }
 
+# Optional read replica for dashboard, report, trend and zone statistics reads.
+# Locally a second SQLite file can stand in for it, e.g.
+#   cp db.sqlite3 replica.sqlite3 && WATER_REPLICA_DB=replica.sqlite3 python manage.py runserver
+if os.environ.get('WATER_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ['WATER_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_DATABASE_ALIAS = 'replica'
+# Only these models are read from the replica; auth and sessions stay on default
+REPLICA_MODELS = [
+    'api.waterzone', 'api.waterusage', 'api.hourlyusagerollup', 'api.dailyusagerollup', 'api.alert', 'api.report',
+]
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -122,6 +143,15 @@ TIME_ZONE = 'UTC'
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -130,6 +160,96 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Swap the 'dashboard' backend for FileBasedCache/Redis to share it between processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dashboard': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard',
+    },
+}
+
+# GET /api/metrics/ is served to staff users, to scrapers sending
+# `Authorization: Bearer <METRICS_TOKEN>` and to METRICS_ALLOWED_IPS (resolved
+# like ACTIVITY_LOG_IP_HEADER below). Everyone else gets 403.
+METRICS_TOKEN = os.environ.get('WATER_METRICS_TOKEN')
+METRICS_ALLOWED_IPS = []
+
+# Dashboard stats, top zones and alert counts are cached and invalidated when
+# usage, alerts or zones change; the timeout (seconds) is a backstop. 0 disables.
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Conditional GET (ETag / Last-Modified) on dashboard and list endpoints,
+# validated against per-resource change watermarks. Endpoints aggregating over
+# a window ending now also change their validators every WINDOW seconds.
+CONDITIONAL_GET_ENABLED = True
+CONDITIONAL_GET_WINDOW = 60
+
+# Response compression (api.compression.CompressionMiddleware): responses of at
+# least MIN_SIZE bytes are sent as brotli when the optional 'brotli' package is
+# installed and the client accepts it, else gzip.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI = True
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Bulk ingest of water usage readings (POST /api/usage/bulk/)
+WATER_USAGE_INGEST_BATCH_SIZE = 1000
+WATER_USAGE_INGEST_MAX_ROWS = 50000
+
+# Raw readings older than this many days are downsampled into the usage rollups
+# and deleted by `manage.py purge_old_usage`. None keeps raw readings forever.
+WATER_USAGE_RAW_RETENTION_DAYS = 365
+
+# Typical minutes between a zone's readings; chart series use it to estimate
+# how many raw rows a range holds before choosing raw readings over rollups.
+WATER_USAGE_READING_INTERVAL_MINUTES = 15
+
+# Streaming anomaly detection on new readings: per-zone EWMA mean/variance
+# (smoothing factor ALPHA) and a P-square sketch of the QUANTILE. After
+# MIN_READINGS, a reading more than Z_THRESHOLD standard deviations from the
+# mean raises an alert, at most one per zone every COOLDOWN_MINUTES.
+WATER_ANOMALY_EWMA_ALPHA = 0.05
+WATER_ANOMALY_Z_THRESHOLD = 4.0
+WATER_ANOMALY_MIN_READINGS = 30
+WATER_ANOMALY_QUANTILE = 0.99
+WATER_ANOMALY_ALERT_COOLDOWN_MINUTES = 60
+
+# Live feed (GET /api/live/, server-sent events). The broker fans events out
+# within one process; point LIVE_FEED_BROKER at a shared implementation when
+# running several ASGI workers. QUEUE_SIZE is per client.
+LIVE_FEED_BROKER = 'api.live.InProcessBroker'
+LIVE_FEED_QUEUE_SIZE = 1000
+LIVE_FEED_HEARTBEAT_SECONDS = 15
+
+# Mutating API requests are logged to ActivityLog through an in-process buffer
+# that a background thread bulk-inserts every FLUSH_SIZE entries or
+# FLUSH_INTERVAL seconds. When BUFFER_SIZE entries are pending, OVERFLOW
+# decides: 'drop_oldest', 'drop_newest', or 'block' the request for up to
+# BLOCK_SECONDS before dropping it. Set IP_HEADER (e.g. 'HTTP_X_FORWARDED_FOR')
+# only behind a proxy that sets it. WATER_ACTIVITY_LOG=0 turns logging off; the
+# test runner (TEST_RUNNER below) does too, and tests that need it enable it.
+ACTIVITY_LOG_ENABLED = os.environ.get('WATER_ACTIVITY_LOG', '1') != '0'
+ACTIVITY_LOG_BUFFER_SIZE = 10000
+ACTIVITY_LOG_FLUSH_SIZE = 500
+ACTIVITY_LOG_FLUSH_INTERVAL = 2.0
+ACTIVITY_LOG_OVERFLOW = 'drop_oldest'
+ACTIVITY_LOG_BLOCK_SECONDS = 0.05
+ACTIVITY_LOG_IP_HEADER = None
+
+# ?search= on alerts, reports and activity logs is answered from a full-text
+# index kept in sync on write (SQLite FTS5, api.search). None picks FTS5 when
+# SQLite supports it and otherwise falls back to LIKE queries; set a dotted
+# path to plug in a SearchBackend for another database.
+SEARCH_BACKEND = None
+
+TEST_RUNNER = 'api.test_runner.TestRunner'
+
 # Default Primary Key Field Type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 USE_I18N = True
@@ -5,6 +5,9 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from api import views
+from api.metrics import metrics_view
+from api.live import live_feed
+from api import async_views
 
 # Create router and register viewsets
 router = DefaultRouter()
@@ -21,6 +24,11 @@ router.register(r'dashboard', views.DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/metrics/', metrics_view, name='metrics'),
+    path('api/live/', live_feed, name='live-feed'),
+    path('api/async/dashboard/stats/', async_views.dashboard_stats, name='async-dashboard-stats'),
+    path('api/async/dashboard/top_zones/', async_views.top_zones, name='async-dashboard-top-zones'),
+    path('api/async/zones/<int:pk>/usage_stats/', async_views.zone_usage_stats, name='async-zone-usage-stats'),
     path('api/', include(router.urls)),
     path('api-auth/', include('rest_framework.urls')),
 ]